@@ -0,0 +1,93 @@
+# InsureDocsProject/backend/app/admission.py
+# Admission control for uploads: refuse new work (429 + Retry-After) while the processing
+# queue is over its configured limits, instead of letting disk and memory grow without bound.
+# Limits count uploads, not jobs: documents with an active OCR (or legacy process) job, i.e. the
+# work an upload adds. Extract/NER follow-up jobs of already admitted documents do not count.
+import math
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from .config import settings
+from . import job_queue
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TTL_SECONDS = 1.0 # Queue stats are shared by all requests for this long (load balancers poll often)
+
+class AdmissionRejected(Exception):
+    """Raised when an upload would exceed a queue limit."""
+
+    def __init__(self, reason: str, retry_after_seconds: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+# --- Cached queue snapshot ---
+_snapshot: Optional[Dict] = None
+_snapshot_at = 0.0
+_snapshot_lock = threading.Lock()
+
+def _compute_snapshot(db: Session) -> Dict:
+    queue_depth = job_queue.get_queue_depth(db)
+    inflight_bytes = job_queue.get_inflight_bytes(db)
+    return {
+        "queue_depth": queue_depth,
+        "max_queue_depth": settings.ADMISSION_MAX_QUEUE_DEPTH,
+        "inflight_bytes": inflight_bytes,
+        "max_inflight_bytes": settings.ADMISSION_MAX_INFLIGHT_MB * 1024 * 1024,
+        "drain_rate_per_minute": round(job_queue.get_drain_rate(db, settings.ADMISSION_DRAIN_WINDOW_SECONDS) * 60, 2),
+        "accepting": _under_limits(queue_depth, inflight_bytes),
+    }
+
+def queue_snapshot(db: Session) -> Dict:
+    """Documents waiting for OCR, their bytes and the OCR drain rate, cached for SNAPSHOT_TTL_SECONDS (for polling endpoints)."""
+    global _snapshot, _snapshot_at
+    if _snapshot is not None and time.monotonic() - _snapshot_at < SNAPSHOT_TTL_SECONDS:
+        return _snapshot
+    with _snapshot_lock:
+        if _snapshot is None or time.monotonic() - _snapshot_at >= SNAPSHOT_TTL_SECONDS:
+            _snapshot = _compute_snapshot(db)
+            _snapshot_at = time.monotonic()
+    return _snapshot
+
+def _under_limits(queue_depth: int, inflight_bytes: int) -> bool:
+    if settings.ADMISSION_MAX_QUEUE_DEPTH and queue_depth >= settings.ADMISSION_MAX_QUEUE_DEPTH:
+        return False
+    if settings.ADMISSION_MAX_INFLIGHT_MB and inflight_bytes >= settings.ADMISSION_MAX_INFLIGHT_MB * 1024 * 1024:
+        return False
+    return True
+
+def _retry_after(excess_jobs: float, drain_rate_per_minute: float) -> int:
+    """Seconds until ~excess_jobs jobs have drained at the current rate (capped; max when nothing is draining)."""
+    cap = settings.ADMISSION_MAX_RETRY_AFTER_SECONDS
+    if drain_rate_per_minute <= 0:
+        return cap
+    return max(1, min(cap, int(math.ceil(max(1.0, excess_jobs) / (drain_rate_per_minute / 60.0)))))
+
+def check_upload(db: Session, owner_id: int, incoming_bytes: int = 0, incoming_documents: int = 1):
+    """Raises AdmissionRejected if accepting incoming_documents more uploads (incoming_bytes in total) would exceed a limit."""
+    snap = _compute_snapshot(db) # Uncached: a burst must not slip through on a stale count
+    rate = snap["drain_rate_per_minute"]
+    queue_depth = snap["queue_depth"]
+
+    if settings.ADMISSION_MAX_QUEUE_DEPTH and queue_depth + incoming_documents > settings.ADMISSION_MAX_QUEUE_DEPTH:
+        excess = queue_depth + incoming_documents - settings.ADMISSION_MAX_QUEUE_DEPTH
+        raise AdmissionRejected(f"Processing queue is full ({queue_depth} documents waiting).", _retry_after(excess, rate))
+
+    max_bytes = settings.ADMISSION_MAX_INFLIGHT_MB * 1024 * 1024
+    if settings.ADMISSION_MAX_INFLIGHT_MB and snap["inflight_bytes"] + incoming_bytes > max_bytes:
+        # Express the byte overshoot as a number of average-sized queued documents
+        avg_bytes = snap["inflight_bytes"] / queue_depth if queue_depth else max(1, incoming_bytes)
+        excess = (snap["inflight_bytes"] + incoming_bytes - max_bytes) / max(1.0, avg_bytes)
+        raise AdmissionRejected("Too much uploaded data is waiting to be processed.", _retry_after(excess, rate))
+
+    if settings.ADMISSION_MAX_PENDING_PER_USER:
+        pending = job_queue.get_queue_depth(db, owner_id=owner_id)
+        if pending + incoming_documents > settings.ADMISSION_MAX_PENDING_PER_USER:
+            excess = pending + incoming_documents - settings.ADMISSION_MAX_PENDING_PER_USER
+            raise AdmissionRejected(f"You already have {pending} documents waiting to be processed.", _retry_after(excess, rate))
@@ -1,5 +1,6 @@
 # InsureDocsProject/backend/app/config.py
 import os
+from typing import Dict, List
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -18,6 +19,88 @@ class Settings(BaseSettings):
 
     UPLOAD_DIR: str = "uploaded_documents" # Relative to backend/ when running Uvicorn there
     # TEXT_OUTPUT_SUBDIR is now defined within ocr_utils using UPLOAD_DIR as base
+    MAX_UPLOAD_MB: int = 100 # Single-file upload limit, 413 above it (0 = no limit; bulk uploads use BULK_MAX_MEMBER_MB)
+
+    # --- Processing job queue (consumed by `python -m app.worker`) ---
+    RUN_INPROCESS_WORKER: bool = False # Also run one queue worker thread inside the API process (dev / single-node setups)
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0 # Idle workers poll the queue this often
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300 # A leased job becomes visible to other workers if not heartbeated within this
+    JOB_HEARTBEAT_INTERVAL_SECONDS: int = 60 # Lease extension interval while a job runs (keep well below the timeout)
+    JOB_MAX_ATTEMPTS: int = 3 # Leases per job before it is given up
+    JOB_RETRY_DELAY_SECONDS: int = 30 # Delay before a failed / abandoned job is retried; doubles with every attempt
+    JOB_RETRY_MAX_DELAY_SECONDS: int = 3600 # Cap on that exponential backoff
+    JOB_REAPER_INTERVAL_SECONDS: float = 60.0 # API process re-queues expired leases / orphaned documents this often (0 = off)
+    # Scheduling: shortest estimated job first, with per-owner fair share and aging (see job_scheduler.py)
+    JOB_COST_SCANNED_PAGE: float = 1.0 # Estimated cost of a page that needs OCR
+    JOB_COST_DIGITAL_PAGE: float = 0.05 # Estimated cost of a page served from the text layer
+    JOB_COST_EXTRACT: float = 0.01 # Estimated cost of an extraction job (regex over stored text; runs ahead of OCR)
+    JOB_COST_NER: float = 0.1 # Estimated cost of a NER job (spaCy over stored text)
+    JOB_AGING_SECONDS: float = 300.0 # A waiting job's effective cost halves after this long (prevents starvation)
+    JOB_FAIR_SHARE_WINDOW_SECONDS: int = 900 # Owner's recently leased cost counts against their next jobs for this long
+    JOB_SCHEDULER_PER_OWNER: int = 4 # Cheapest (plus oldest) queued jobs per owner considered at each lease
+    JOB_ROLE_PRIORITIES: Dict[str, int] = {"admin": 1, "user": 0} # Priority tier by uploader role (JSON in env)
+
+    # --- Upload admission control (0 disables a limit) ---
+    ADMISSION_MAX_QUEUE_DEPTH: int = 1000 # Documents waiting for / in processing, across all users
+    ADMISSION_MAX_INFLIGHT_MB: int = 4096 # Total size of uploaded-but-unprocessed PDFs
+    ADMISSION_MAX_PENDING_PER_USER: int = 300 # Unprocessed documents per uploader
+    ADMISSION_DRAIN_WINDOW_SECONDS: int = 600 # Window for the jobs-finished rate used to compute Retry-After
+    ADMISSION_MAX_RETRY_AFTER_SECONDS: int = 3600 # Retry-After cap (also used when nothing is draining)
+
+    # --- Bulk upload (POST /documents/bulk: many PDFs and/or ZIP archives of PDFs) ---
+    BULK_MAX_FILES: int = 5000 # PDFs accepted per request (after unpacking ZIPs)
+    BULK_MAX_MEMBER_MB: int = 512 # Largest uncompressed PDF accepted from a ZIP (guards against zip bombs)
+
+    # --- Text layer vs OCR routing ---
+    TEXT_LAYER_SAMPLE_PAGES: int = 5 # Pages sampled to classify a PDF as digital / scanned / mixed before extraction
+
+    # --- OCR Worker Pool ---
+    OCR_POOL_WORKERS: int = 0 # 0 = OCR in-process with the shared reader; >0 = size of the OCR process pool
+    OCR_TORCH_THREADS_PER_WORKER: int = 1 # torch intra-op threads per pool worker (keep workers x threads <= cores)
+    OCR_POOL_START_METHOD: str = "spawn" # multiprocessing start method for pool workers; "fork" shares the parent's loaded weights copy-on-write
+    OCR_PRELOAD_MODELS: bool = False # Load (and warm up) OCR models at startup; /ready reports 503 until done
+    OCR_BATCHED: bool = False # Batch OCR pages of identical size (across the documents being OCR'd) through EasyOCR's detector/recognizer (in-process OCR only)
+    OCR_BATCH_MEMORY_MB: int = 1024 # Estimated memory ceiling for rendered pages queued for / inside a batch
+    OCR_BATCH_MAX_WAIT_SECONDS: float = 2.0 # Longest a page waits for more pages of its size before its batch runs anyway
+    OCR_CONCURRENT_DOCS: int = 0 # OCR jobs a worker runs at once with an OCR pool or in batched mode (one thread each; pages share the pool / batches); 0 = OCR_POOL_WORKERS with a pool, else 4
+    OCR_RECOGNIZER_BATCH_SIZE: int = 16 # Text crops per recognizer forward pass in batched mode
+    OCR_RENDER_GRAYSCALE: bool = False # Opt-in: render OCR pages as 1-channel arrays (zero-copy); False = RGB as before (one BGR copy for EasyOCR)
+    # Adaptive rendering: probe each page at 72 DPI, crop blank margins, pick the lowest DPI that keeps text legible
+    OCR_ADAPTIVE_RENDER: bool = False # False = always render the full page at 300 DPI
+    OCR_MIN_DPI: int = 150
+    OCR_MAX_DPI: int = 300
+    OCR_TARGET_TEXT_HEIGHT_PX: int = 30 # Desired rendered height of a text line (ink, ascender to descender)
+    OCR_MAX_PAGE_MEGAPIXELS: int = 35 # Hard cap per rendered page (~letter at 300 DPI = 8.4 MP); big drawings get a lower DPI
+
+    # --- OCR Result Cache (content-addressed: whole-file SHA-256 and rendered-page hashes) ---
+    OCR_CACHE_MAX_MB: int = 512 # 0 disables the cache; LRU eviction above this size
+    OCR_CACHE_DIR: str = "" # Default: <UPLOAD_DIR>/ocr_cache
+
+    # --- Resumable extraction ---
+    OCR_CHECKPOINTS_ENABLED: bool = True # Per-page checkpoints so a retry resumes at the first unfinished page
+
+    # --- Time budgets / cancellation (OCR stage) ---
+    OCR_PAGE_TIMEOUT_SECONDS: float = 120.0 # Wall-clock limit per page (text layer read or OCR); 0 = no limit
+    OCR_DOCUMENT_TIMEOUT_SECONDS: float = 3600.0 # Wall-clock limit for a document's whole OCR stage; 0 = no limit
+    JOB_CANCEL_POLL_SECONDS: float = 5.0 # How often a busy worker checks whether its job was cancelled by an admin
+
+    # --- Memory budget / worker recycling ---
+    OCR_WORKER_RSS_LIMIT_MB: int = 3072 # RSS budget per worker process (and per OCR pool process); 0 = no limit
+    WORKER_MAX_TASKS: int = 0 # Standalone worker exits for a restart after this many jobs (fresh heap); 0 = never
+    OCR_POOL_MAX_TASKS_PER_CHILD: int = 0 # Pages an OCR pool process handles before it is replaced (not with "fork"); 0 = never
+
+    # --- Entity index (document_entities table, filled by the extraction stage) ---
+    ENTITY_INSERT_BATCH_SIZE: int = 1000 # Rows per executemany INSERT when a document's entities are stored
+
+    # --- NER stage (spaCy, after regex extraction; needs `pip install spacy` + a model, else regex patterns only) ---
+    NER_ENABLED: bool = True # Queue a NER job for every document whose extraction succeeded
+    NER_MODEL_NAME: str = "en_core_web_sm" # spaCy model per deployment, e.g. en_core_web_md / en_core_web_lg / en_core_web_trf
+    NER_PRELOAD_MODEL: bool = True # Standalone workers that take ner jobs load the model at start-up (others load it on first use)
+    NER_BATCH_DOCS: int = 16 # Queued NER jobs a worker leases at once and runs through one nlp.pipe call
+    NER_BATCH_SIZE: int = 32 # Chunks (pages) per nlp.pipe batch
+    NER_CHUNK_CHARS: int = 20000 # Max characters per spaCy Doc; pages longer than this are split at sentence/line breaks
+    NER_N_PROCESS: int = 1 # nlp.pipe worker processes (each loads its own copy of the model)
+    NER_PIPES: List[str] = ["ner", "entity_ruler"] # Components kept enabled (plus the tok2vec/transformer they listen to)
 
     # Pydantic V2 configuration to read from .env file
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
@@ -1,11 +1,13 @@
 # InsureDocsProject/backend/app/crud.py
+import uuid
 import logging # Use logging instead of print
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_ # For combining filter conditions
+from sqlalchemy import func, or_, insert, select, literal # For combining filter conditions
 from typing import List, Optional, Dict, Any # Added Dict, Any
 from datetime import datetime, timedelta
 
 from . import models, schemas, security # Import local modules
+from .config import settings
 
 # --- Get Logger ---
 logger = logging.getLogger(__name__)
@@ -81,7 +83,7 @@ def delete_user(db: Session, user_id: int) -> Optional[models.User]:
 # =====================================
 # Document CRUD Operations
 # =====================================
-def create_document_db(db: Session, doc: schemas.DocumentCreate, owner_id: int, stored_filename: str, file_path_on_disk: str) -> models.Document:
+def create_document_db(db: Session, doc: schemas.DocumentCreate, owner_id: int, stored_filename: str, file_path_on_disk: str, content_sha256: Optional[str] = None) -> models.Document:
     """Creates a new document record with initial UPLOADED status."""
     logger.info(f"Creating document DB record for original_filename='{doc.original_filename}', owner_id={owner_id}")
     db_doc = models.Document(
@@ -91,6 +93,7 @@ def create_document_db(db: Session, doc: schemas.DocumentCreate, owner_id: int,
         owner_id=owner_id,
         stored_filename=stored_filename,
         file_path_on_disk=file_path_on_disk, # Store relative path/filename
+        content_sha256=content_sha256,
         status=models.DocumentStatus.UPLOADED,
         extracted_metadata={} # Initialize JSON field as empty dict
     )
@@ -100,6 +103,141 @@ def create_document_db(db: Session, doc: schemas.DocumentCreate, owner_id: int,
     logger.info(f"Document record created with id={db_doc.id}, status={db_doc.status}")
     return db_doc
 
+def create_documents_bulk(db: Session, docs: List[Dict[str, Any]], owner_id: int, status: models.DocumentStatus = models.DocumentStatus.OCR_PENDING) -> List[models.Document]:
+    """
+    Adds many document records in one flush without committing (the caller commits, e.g. together with their jobs).
+    Each dict needs original_filename, content_type, size_kb and stored_filename (also used as file_path_on_disk),
+    and may carry content_sha256.
+    """
+    logger.info(f"Creating {len(docs)} document DB records for owner_id={owner_id}")
+    db_docs = [
+        models.Document(
+            original_filename=doc["original_filename"],
+            content_type=doc["content_type"],
+            size_kb=doc["size_kb"],
+            owner_id=owner_id,
+            stored_filename=doc["stored_filename"],
+            file_path_on_disk=doc["stored_filename"],
+            content_sha256=doc.get("content_sha256"),
+            status=status,
+            extracted_metadata={},
+        )
+        for doc in docs
+    ]
+    db.add_all(db_docs)
+    db.flush() # Assigns ids (batched INSERTs) inside the caller's transaction
+    return db_docs
+
+# --- Upload Deduplication ---
+# A canonical document (duplicate_of_id NULL) owns the PDF and text file for its content hash;
+# duplicates reference the same files and copy its results, without any processing of their own.
+DEDUP_RESULT_STATUSES = {models.DocumentStatus.EXTRACT_COMPLETED, models.DocumentStatus.APPROVED, models.DocumentStatus.REJECTED}
+DEDUP_FAILED_STATUSES = {
+    models.DocumentStatus.OCR_FAILED, models.DocumentStatus.EXTRACT_FAILED,
+    models.DocumentStatus.OCR_TIMEOUT, models.DocumentStatus.CANCELLED,
+}
+DEDUP_NO_RETRY_STATUSES = {models.DocumentStatus.OCR_TIMEOUT} # Re-uploading the same bytes would only hit the time budget again
+DUPLICATE_WAITING_STATUSES = [models.DocumentStatus.OCR_PENDING] + sorted(DEDUP_FAILED_STATUSES)
+
+def get_canonical_document_by_sha256(db: Session, content_sha256: str) -> Optional[models.Document]:
+    """The document that owns the stored file for this content hash, if any."""
+    return db.query(models.Document).filter(
+        models.Document.content_sha256 == content_sha256,
+        models.Document.duplicate_of_id.is_(None),
+    ).first()
+
+def create_duplicate_document(db: Session, canonical: models.Document, original_filename: str, content_type: Optional[str], owner_id: int) -> models.Document:
+    """
+    Adds a document that shares canonical's files (no commit). Finished results are copied now;
+    otherwise it waits in OCR_PENDING and copy_results_to_duplicates fills it in later.
+    """
+    db_doc = models.Document(
+        original_filename=original_filename,
+        content_type=content_type,
+        size_kb=canonical.size_kb,
+        owner_id=owner_id,
+        stored_filename=f"{uuid.uuid4()}.pdf", # Unique name only; nothing is written under it
+        file_path_on_disk=canonical.file_path_on_disk,
+        content_sha256=canonical.content_sha256,
+        duplicate_of_id=canonical.id,
+        status=models.DocumentStatus.OCR_PENDING,
+        extracted_metadata={},
+    )
+    if canonical.status in DEDUP_RESULT_STATUSES:
+        db_doc.status = models.DocumentStatus.EXTRACT_COMPLETED # Review state (approved/rejected) is per document
+        db_doc.extracted_text_path = canonical.extracted_text_path
+        db_doc.extracted_metadata = dict(canonical.extracted_metadata or {})
+        db_doc.ner_entities = canonical.ner_entities
+        db_doc.ner_mentions = canonical.ner_mentions
+        db_doc.pages_total, db_doc.pages_done = canonical.pages_total, canonical.pages_done
+    elif canonical.status in DEDUP_NO_RETRY_STATUSES:
+        db_doc.status = canonical.status
+    db.add(db_doc)
+    db.flush()
+    if db_doc.status == models.DocumentStatus.EXTRACT_COMPLETED:
+        copy_document_entities(db, canonical.id, [db_doc.id])
+    logger.info(f"Document id={db_doc.id} is a duplicate of id={canonical.id} (status {db_doc.status})")
+    return db_doc
+
+def copy_results_to_duplicates(db: Session, canonical_id: int) -> int:
+    """Copies a finished (or failed) canonical document's outcome to its waiting duplicates. Returns rows updated."""
+    canonical = get_document_by_id(db, canonical_id)
+    if not canonical:
+        return 0
+    waiting = db.query(models.Document).filter(
+        models.Document.duplicate_of_id == canonical_id,
+        models.Document.status.in_(DUPLICATE_WAITING_STATUSES),
+    )
+    if canonical.status in DEDUP_RESULT_STATUSES:
+        copy_document_entities(db, canonical_id, [doc_id for (doc_id,) in waiting.with_entities(models.Document.id)])
+        updated = waiting.update({
+            models.Document.status: models.DocumentStatus.EXTRACT_COMPLETED,
+            models.Document.extracted_text_path: canonical.extracted_text_path,
+            models.Document.extracted_metadata: canonical.extracted_metadata,
+            models.Document.ner_entities: canonical.ner_entities,
+            models.Document.ner_mentions: canonical.ner_mentions,
+            models.Document.pages_total: canonical.pages_total,
+            models.Document.pages_done: canonical.pages_done,
+        }, synchronize_session=False)
+    elif canonical.status in DEDUP_FAILED_STATUSES:
+        updated = waiting.filter(models.Document.status != canonical.status).update(
+            {models.Document.status: canonical.status}, synchronize_session=False)
+    else:
+        return 0 # Still in progress
+    db.commit()
+    if updated:
+        logger.info(f"Copied doc_id={canonical_id} outcome ({canonical.status}) to {updated} duplicate(s)")
+    return updated
+
+def detach_duplicates(db: Session, canonical: models.Document) -> Optional[models.Document]:
+    """
+    Before deleting a canonical document: promotes its oldest duplicate to canonical (it inherits the
+    shared files) and re-points the other duplicates to it. No commit. Returns the new canonical, if any.
+    """
+    duplicates = db.query(models.Document).filter(models.Document.duplicate_of_id == canonical.id).order_by(models.Document.id).all()
+    if not duplicates:
+        return None
+    successor = duplicates[0]
+    canonical.content_sha256 = None
+    db.flush() # Free the hash in the unique index before the successor takes it
+    successor.duplicate_of_id = None
+    for other in duplicates[1:]:
+        other.duplicate_of_id = successor.id
+    db.flush()
+    logger.info(f"Document id={successor.id} replaces id={canonical.id} as canonical for its content ({len(duplicates) - 1} other duplicate(s))")
+    return successor
+
+def is_file_referenced(db: Session, file_path_on_disk: Optional[str] = None, extracted_text_path: Optional[str] = None) -> bool:
+    """True if any document still points at this PDF or text file (shared by deduplicated uploads)."""
+    query = db.query(models.Document.id)
+    if file_path_on_disk is not None:
+        query = query.filter(models.Document.file_path_on_disk == file_path_on_disk)
+    elif extracted_text_path is not None:
+        query = query.filter(models.Document.extracted_text_path == extracted_text_path)
+    else:
+        return False
+    return query.first() is not None
+
 def get_document_by_id(db: Session, doc_id: int) -> Optional[models.Document]:
     """Retrieves a single document by its ID."""
     logger.debug(f"Querying document by id={doc_id}")
@@ -154,6 +292,15 @@ def update_document_ocr_results(db: Session, doc_id: int, text_path: Optional[st
         logger.warning(f"Attempted to update OCR results for non-existent doc_id={doc_id}")
     return db_doc
 
+def update_document_progress(db: Session, doc_id: int, pages_done: int, pages_total: int) -> None:
+    """Records text extraction progress with a single UPDATE (no row load), cheap enough to call per page."""
+    logger.debug(f"Progress for doc_id={doc_id}: {pages_done}/{pages_total} pages")
+    db.query(models.Document).filter(models.Document.id == doc_id).update(
+        {models.Document.pages_done: pages_done, models.Document.pages_total: pages_total},
+        synchronize_session=False
+    )
+    db.commit()
+
 def update_document_extraction_results(
     db: Session,
     doc_id: int,
@@ -172,11 +319,81 @@ def update_document_extraction_results(
         logger.warning(f"Attempted to update extraction results for non-existent doc_id={doc_id}")
     return db_doc
 
+def store_ner_entities(db: Session, entities_by_doc: Dict[int, Dict[str, List[str]]],
+                       mentions_by_doc: Optional[Dict[int, List[Dict[str, Any]]]] = None) -> int:
+    """
+    Writes NER results for several documents (and their duplicates, which share the text) in one commit:
+    the {label: [values]} summary and, when given, the mentions with page numbers and offsets. Returns rows updated.
+    """
+    updated = 0
+    for doc_id, entities in entities_by_doc.items():
+        values = {models.Document.ner_entities: entities}
+        if mentions_by_doc is not None:
+            values[models.Document.ner_mentions] = mentions_by_doc.get(doc_id, [])
+        updated += db.query(models.Document).filter(
+            or_(models.Document.id == doc_id, models.Document.duplicate_of_id == doc_id)
+        ).update(values, synchronize_session=False)
+    db.commit()
+    return updated
+
+# =====================================
+# Document Entity Operations (document_entities table)
+# =====================================
+def replace_document_entities(db: Session, doc_id: int, rows: List[Dict[str, Any]]) -> int:
+    """
+    Replaces a document's entity rows (no commit): one DELETE, then executemany INSERTs of
+    ENTITY_INSERT_BATCH_SIZE rows. rows are extraction_utils.entity_rows() dicts. Returns rows inserted.
+    """
+    db.query(models.DocumentEntity).filter(models.DocumentEntity.document_id == doc_id).delete(synchronize_session=False)
+    batch_size = max(settings.ENTITY_INSERT_BATCH_SIZE, 1)
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(models.DocumentEntity), [dict(row, document_id=doc_id) for row in rows[start:start + batch_size]])
+    logger.debug(f"Stored {len(rows)} entity rows for doc_id={doc_id}")
+    return len(rows)
+
+def copy_document_entities(db: Session, source_doc_id: int, target_doc_ids: List[int]) -> None:
+    """Gives duplicate uploads a copy of their canonical document's entity rows (INSERT ... SELECT, no commit)."""
+    if not target_doc_ids:
+        return
+    entity = models.DocumentEntity
+    db.query(entity).filter(entity.document_id.in_(target_doc_ids)).delete(synchronize_session=False)
+    columns = [entity.label, entity.normalized_value, entity.raw_value, entity.page]
+    for target_id in target_doc_ids:
+        db.execute(insert(entity).from_select(
+            ["document_id", "label", "normalized_value", "raw_value", "page"],
+            select(literal(target_id), *columns).where(entity.document_id == source_doc_id),
+        ))
+
+def find_entity_matches(
+    db: Session,
+    label: str,
+    normalized_value: str,
+    owner_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 50
+) -> List[Any]:
+    """
+    Entity rows with this label and normalized value, joined to their documents (newest document first).
+    Resolved through ix_document_entities_label_normalized_value, not by reading extracted_metadata.
+    """
+    logger.debug(f"Querying entities: label={label}, value='{normalized_value}', owner={owner_id}, skip={skip}, limit={limit}")
+    entity = models.DocumentEntity
+    query = db.query(
+        entity.document_id, entity.label, entity.normalized_value, entity.raw_value, entity.page,
+        models.Document.original_filename, models.Document.status,
+    ).join(models.Document, models.Document.id == entity.document_id).filter(
+        entity.label == label, entity.normalized_value == normalized_value,
+    )
+    if owner_id is not None:
+        query = query.filter(models.Document.owner_id == owner_id)
+    return query.order_by(entity.document_id.desc(), entity.page).offset(skip).limit(limit).all()
+
 def delete_document_db(db: Session, doc_id: int) -> bool:
     """Deletes a document record from the database. Returns True if successful."""
     db_doc = get_document_by_id(db, doc_id)
     if db_doc:
         logger.info(f"Deleting document record for doc_id={doc_id}")
+        db.query(models.DocumentEntity).filter(models.DocumentEntity.document_id == doc_id).delete(synchronize_session=False)
         db.delete(db_doc)
         db.commit()
         return True
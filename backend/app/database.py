@@ -1,5 +1,5 @@
 # InsureDocsProject/backend/app/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 import logging # Use logging instead of print
@@ -18,6 +18,15 @@ if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
 
 try:
     engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_args)
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        # API and queue workers share the file: WAL lets readers proceed during writes,
+        # busy_timeout makes concurrent writers wait instead of failing with "database is locked"
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA busy_timeout=30000")
+            cursor.close()
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     logger.info(f"Database engine created for URL: {SQLALCHEMY_DATABASE_URL}")
 except Exception as e:
@@ -1,7 +1,13 @@
 # InsureDocsProject/backend/app/extraction_utils.py
 import re
 import logging
-from typing import Dict, List, Any
+import datetime
+from bisect import bisect_right
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Any, Optional, Tuple
+
+from .ner_utils import PAGE_MARKER
+from .regex_engine import RegexScanner, ScanMatch
 
 logger = logging.getLogger(__name__)
 
@@ -17,14 +23,85 @@ DATE_PATTERN = r'\b(?:\d{1,2}[/-]\d{1,2}[/-]\d{4}|\d{4}[/-]\d{1,2}[/-]\d{1,2})\b
 # Amounts: Matches $1,234.56 or $567 or $ 123.45 (handles optional space and comma)
 AMOUNT_PATTERN = r'\$\s?(\d{1,3}(?:[,]?\d{3})*(?:\.\d{2})?)' # Capture group 1 gets the number part
 
+# All patterns above in one compiled scan (same matches as one re.findall per pattern, see regex_engine.py)
+SCANNER = RegexScanner([
+    ("policy_numbers", POLICY_NUMBER_PATTERN),
+    ("dates", DATE_PATTERN),
+    ("amounts", AMOUNT_PATTERN),
+])
+
+# --- Entity rows (document_entities table) ---
+# Scanner label -> entity label stored in the table (same names as ner_utils' regex labels where they overlap)
+ENTITY_LABELS = {
+    "policy_numbers": "POLICY_NUMBER",
+    "dates": "DATE",
+    "amounts": "AMOUNT",
+}
+
+_US_DATE = re.compile(r"^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$")
+_ISO_DATE = re.compile(r"^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$")
+
+def normalize_entity_value(label: str, value: str) -> str:
+    """
+    Canonical form used for storage and lookups, so e.g. 'abc_123456' finds 'ABC-123456'.
+    Policy numbers: upper case without separators. Dates: YYYY-MM-DD (MM/DD/YYYY read as US).
+    Amounts: plain decimal with 2 places. Anything else: upper case, whitespace collapsed.
+    """
+    value = " ".join(value.split())
+    if label == "POLICY_NUMBER":
+        return re.sub(r"[\s_-]", "", value).upper()
+    if label == "DATE":
+        us, iso = _US_DATE.match(value), _ISO_DATE.match(value)
+        try:
+            if us:
+                return datetime.date(int(us.group(3)), int(us.group(1)), int(us.group(2))).isoformat()
+            if iso:
+                return datetime.date(int(iso.group(1)), int(iso.group(2)), int(iso.group(3))).isoformat()
+        except ValueError:
+            pass # Not a real date (e.g. 13/45/2024): keep the text
+        return value
+    if label == "AMOUNT":
+        try:
+            return f"{Decimal(value.replace('$', '').replace(',', '').replace(' ', '')):.2f}"
+        except InvalidOperation:
+            return value
+    return value.upper()
+
+def _page_of(text: str):
+    """offset -> page number from the "--- Page N ---" markers before it (None before the first one)."""
+    starts, pages = [], []
+    for marker in PAGE_MARKER.finditer(text):
+        starts.append(marker.end())
+        pages.append(int(marker.group(1)))
+    def page(offset: int) -> Optional[int]:
+        index = bisect_right(starts, offset)
+        return pages[index - 1] if index else None
+    return page
+
+def entity_rows(text: str, matches: List[ScanMatch]) -> List[Dict[str, Any]]:
+    """document_entities rows (without document_id) for SCANNER matches: one per label, normalized value and page."""
+    page_of = _page_of(text)
+    rows: Dict[Tuple[str, str, Optional[int]], Dict[str, Any]] = {}
+    for match in matches:
+        label = ENTITY_LABELS.get(match.label)
+        if not label or not match.value.strip():
+            continue
+        normalized = normalize_entity_value(label, match.value)
+        page = page_of(match.start)
+        rows.setdefault((label, normalized, page), {
+            "label": label, "normalized_value": normalized, "raw_value": match.value.strip(), "page": page,
+        })
+    return list(rows.values())
+
 # --- Extraction Function ---
 
-def extract_information_with_regex(text: str) -> Dict[str, List[Any]]:
+def extract_information_with_regex(text: str, matches: Optional[List[ScanMatch]] = None) -> Dict[str, List[Any]]:
     """
     Applies predefined regex patterns to extract information from text.
 
     Args:
         text: The input text string (likely from OCR).
+        matches: SCANNER.scan(text), if the caller already has it.
 
     Returns:
         A dictionary where keys are entity types (e.g., 'policy_numbers')
@@ -37,20 +114,23 @@ def extract_information_with_regex(text: str) -> Dict[str, List[Any]]:
     extracted_data: Dict[str, List[Any]] = {}
 
     try:
-        # Extract Policy Numbers
-        # findall returns a list of all matching strings (or captured groups if defined)
-        policy_numbers = re.findall(POLICY_NUMBER_PATTERN, text)
+        # One pass over the text for every pattern; values come back per label (captured group 1 where defined)
+        if matches is None:
+            found = SCANNER.values_by_label(text)
+        else:
+            found = {label: [] for label in SCANNER.labels}
+            for match in matches:
+                found[match.label].append(match.value)
+
         # Store unique values, filter out potential empty matches if pattern allows
-        extracted_data["policy_numbers"] = sorted(list(set(filter(None, policy_numbers))))
+        extracted_data["policy_numbers"] = sorted(list(set(filter(None, found["policy_numbers"]))))
         logger.info(f"Found {len(extracted_data['policy_numbers'])} policy numbers.")
 
-        # Extract Dates
-        dates = re.findall(DATE_PATTERN, text)
-        extracted_data["dates"] = sorted(list(set(filter(None, dates))))
+        extracted_data["dates"] = sorted(list(set(filter(None, found["dates"]))))
         logger.info(f"Found {len(extracted_data['dates'])} dates.")
 
-        # Extract Amounts (only the number part from capture group 1)
-        amounts_str = re.findall(AMOUNT_PATTERN, text)
+        # Amounts: only the number part from capture group 1
+        amounts_str = found["amounts"]
         # Convert amount strings to numbers (optional, depends on desired output)
         amounts_numeric = []
         for amount_s in amounts_str:
@@ -72,4 +152,16 @@ def extract_information_with_regex(text: str) -> Dict[str, List[Any]]:
         # Return partially extracted data or empty dict depending on requirements
         # return {}
 
-    return extracted_data
\ No newline at end of file
+    return extracted_data
+
+def extract_information_from_file(text_file_path: str) -> Dict[str, List[Any]]:
+    """Reads a stored OCR/text-layer output file and runs extract_information_with_regex on it."""
+    with open(text_file_path, "r", encoding="utf-8") as f:
+        return extract_information_with_regex(f.read())
+
+def extract_information_and_entities_from_file(text_file_path: str) -> Tuple[Dict[str, List[Any]], List[Dict[str, Any]]]:
+    """extract_information_from_file plus the file's document_entities rows, from one scan of the text."""
+    with open(text_file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    matches = SCANNER.scan(text) if text else []
+    return extract_information_with_regex(text, matches), entity_rows(text, matches)
@@ -0,0 +1,279 @@
+# InsureDocsProject/backend/app/job_queue.py
+# Durable work queue stored in the application database (processing_jobs table).
+#
+# Jobs survive API restarts and are consumed by `python -m app.worker`. Claiming a job is a
+# conditional UPDATE (status/lease re-checked in the WHERE clause), so any number of worker
+# processes can poll the same table without double-processing. A leased job carries a visibility
+# timeout: if its worker stops heartbeating (crash, OOM kill), the lease expires and the reaper
+# (reaper.py) re-queues the job with exponential backoff, until max_attempts is reached.
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from . import models, job_scheduler
+from .config import settings
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+JOB_KIND_OCR = "ocr"         # Text layer / OCR -> text file (then queues an extract job)
+JOB_KIND_EXTRACT = "extract" # Stored text file -> regex extraction
+JOB_KIND_NER = "ner"         # Stored text file -> spaCy NER (queued after a successful extraction; leased in batches)
+JOB_KIND_PROCESS = "process" # Legacy combined job (queued before the stages were split); runs as OCR
+UPLOAD_JOB_KINDS = (JOB_KIND_OCR, JOB_KIND_PROCESS) # The first stage of an upload: one active job per unprocessed document
+LEASE_CANDIDATES = 8 # Ranked rows tried per lease attempt; losing a race just moves on to the next one
+
+ACTIVE_JOB_STATUSES = (models.JobStatus.QUEUED, models.JobStatus.LEASED)
+
+def _utcnow() -> datetime:
+    return datetime.utcnow()
+
+def _leasable(now: datetime):
+    """SQL condition: queued, due and with attempts left (expired leases go back to QUEUED via the reaper)."""
+    return and_(
+        models.ProcessingJob.status == models.JobStatus.QUEUED,
+        models.ProcessingJob.available_at <= now,
+        models.ProcessingJob.attempts < models.ProcessingJob.max_attempts,
+    )
+
+def retry_backoff_seconds(attempts: int) -> int:
+    """Delay before retry number `attempts` (1-based): JOB_RETRY_DELAY_SECONDS doubled per attempt, capped."""
+    delay = settings.JOB_RETRY_DELAY_SECONDS * (2 ** max(0, attempts - 1))
+    return int(min(delay, settings.JOB_RETRY_MAX_DELAY_SECONDS))
+
+# =====================================
+# Producer side (API)
+# =====================================
+def enqueue(
+    db: Session,
+    document_id: int,
+    kind: str = JOB_KIND_OCR,
+    owner_id: Optional[int] = None,
+    estimated_cost: Optional[float] = None,
+    priority: int = 0,
+    max_attempts: Optional[int] = None,
+    commit: bool = True,
+) -> models.ProcessingJob:
+    """
+    Queues a job for a document; returns the existing one if the document already has an active job of this kind.
+    owner_id / estimated_cost / priority feed the scheduler (see job_scheduler.py).
+    """
+    existing = db.query(models.ProcessingJob).filter(
+        models.ProcessingJob.document_id == document_id,
+        models.ProcessingJob.kind == kind,
+        models.ProcessingJob.status.in_(ACTIVE_JOB_STATUSES),
+    ).first()
+    if existing:
+        logger.info(f"Job {existing.id} ({kind}) already active for doc_id={document_id}; not queueing another.")
+        return existing
+    job = models.ProcessingJob(
+        document_id=document_id, kind=kind, status=models.JobStatus.QUEUED,
+        owner_id=owner_id, estimated_cost=estimated_cost, priority=priority,
+        attempts=0, max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS, available_at=_utcnow(),
+    )
+    db.add(job)
+    if commit:
+        db.commit()
+        db.refresh(job)
+    logger.info(f"Queued {kind} job for doc_id={document_id} (owner={owner_id}, cost={estimated_cost}, priority={priority})")
+    return job
+
+def enqueue_many(db: Session, jobs: List[Dict], kind: str = JOB_KIND_OCR, commit: bool = True) -> List[models.ProcessingJob]:
+    """
+    Queues jobs for freshly created documents in one flush (no per-document duplicate check).
+    Each dict needs document_id and may carry owner_id, estimated_cost and priority.
+    """
+    now = _utcnow()
+    new_jobs = [
+        models.ProcessingJob(
+            document_id=job["document_id"], kind=kind, status=models.JobStatus.QUEUED,
+            owner_id=job.get("owner_id"), estimated_cost=job.get("estimated_cost"), priority=job.get("priority", 0),
+            attempts=0, max_attempts=settings.JOB_MAX_ATTEMPTS, available_at=now,
+        )
+        for job in jobs
+    ]
+    db.add_all(new_jobs)
+    if commit:
+        db.commit()
+    logger.info(f"Queued {len(new_jobs)} {kind} jobs in one batch")
+    return new_jobs
+
+def get_queue_depth(db: Session, owner_id: Optional[int] = None, kinds: Optional[Sequence[str]] = UPLOAD_JOB_KINDS) -> int:
+    """Documents with a job of these kinds (None = any) waiting for or held by a worker (optionally only one owner's)."""
+    query = db.query(func.count(func.distinct(models.ProcessingJob.document_id))).filter(models.ProcessingJob.status.in_(ACTIVE_JOB_STATUSES))
+    if kinds:
+        query = query.filter(models.ProcessingJob.kind.in_(kinds))
+    if owner_id is not None:
+        query = query.filter(models.ProcessingJob.owner_id == owner_id)
+    return query.scalar() or 0
+
+def get_job_status_counts(db: Session) -> Dict[str, int]:
+    """Number of jobs per status (all kinds)."""
+    rows = db.query(models.ProcessingJob.status, func.count(models.ProcessingJob.id)).group_by(models.ProcessingJob.status).all()
+    counts = {status.value: 0 for status in models.JobStatus}
+    counts.update({status.value: count for status, count in rows})
+    return counts
+
+def get_inflight_bytes(db: Session, kinds: Optional[Sequence[str]] = UPLOAD_JOB_KINDS) -> int:
+    """Total size of the documents that still have an active job of these kinds (None = any): uploaded but not yet processed."""
+    active = db.query(models.ProcessingJob.document_id).filter(models.ProcessingJob.status.in_(ACTIVE_JOB_STATUSES))
+    if kinds:
+        active = active.filter(models.ProcessingJob.kind.in_(kinds))
+    size_kb = db.query(func.sum(models.Document.size_kb)).filter(models.Document.id.in_(active)).scalar() # Each document once
+    return int(size_kb or 0) * 1024
+
+def get_drain_rate(db: Session, window_seconds: int, kinds: Optional[Sequence[str]] = UPLOAD_JOB_KINDS) -> float:
+    """Jobs of these kinds (None = any) finished per second over the last window_seconds (succeeded or failed for good)."""
+    since = _utcnow() - timedelta(seconds=window_seconds)
+    query = db.query(func.count(models.ProcessingJob.id)).filter(models.ProcessingJob.finished_at >= since)
+    if kinds:
+        query = query.filter(models.ProcessingJob.kind.in_(kinds))
+    return (query.scalar() or 0) / float(window_seconds)
+
+# =====================================
+# Consumer side (workers)
+# =====================================
+def _candidate_jobs(db: Session, now: datetime, kinds: Optional[List[str]]) -> List[job_scheduler.JobCandidate]:
+    """
+    Leasable jobs worth ranking: each owner's JOB_SCHEDULER_PER_OWNER cheapest jobs plus their oldest one.
+    Bounded by the number of owners with queued work, not by queue length.
+    """
+    job = models.ProcessingJob
+    conditions = [_leasable(now)]
+    if kinds:
+        conditions.append(job.kind.in_(kinds))
+    ranked = db.query(
+        job.id, job.owner_id, job.estimated_cost, job.priority, job.available_at,
+        func.row_number().over(partition_by=job.owner_id, order_by=(job.priority.desc(), job.estimated_cost, job.id)).label("cost_rank"),
+        func.row_number().over(partition_by=job.owner_id, order_by=(job.available_at, job.id)).label("age_rank"),
+    ).filter(*conditions).subquery()
+    rows = db.query(ranked).filter(or_(ranked.c.cost_rank <= settings.JOB_SCHEDULER_PER_OWNER, ranked.c.age_rank == 1)).all()
+    return [job_scheduler.JobCandidate(r.id, r.owner_id, r.estimated_cost, r.priority, r.available_at) for r in rows]
+
+def _recent_owner_usage(db: Session, now: datetime) -> Dict[Optional[int], float]:
+    """Estimated cost of jobs each owner had leased within the fair-share window."""
+    since = now - timedelta(seconds=settings.JOB_FAIR_SHARE_WINDOW_SECONDS)
+    rows = db.query(
+        models.ProcessingJob.owner_id,
+        func.sum(func.coalesce(models.ProcessingJob.estimated_cost, settings.JOB_COST_SCANNED_PAGE)),
+    ).filter(models.ProcessingJob.started_at >= since).group_by(models.ProcessingJob.owner_id).all()
+    return {owner_id: float(usage or 0.0) for owner_id, usage in rows}
+
+def lease_next(db: Session, worker_id: str, visibility_timeout_seconds: int, kinds: Optional[List[str]] = None) -> Optional[models.ProcessingJob]:
+    """
+    Claims the best leasable job for worker_id (see job_scheduler.rank_candidates), or returns None if there is nothing to do.
+
+    The claim is an UPDATE guarded by the same leasability condition it was selected with;
+    if another worker won the row in between, rowcount is 0 and the next candidate is tried.
+    """
+    now = _utcnow()
+    candidates = _candidate_jobs(db, now, kinds)
+    if not candidates:
+        return None
+    ranked = job_scheduler.rank_candidates(candidates, _recent_owner_usage(db, now), now)
+    for candidate in ranked[:LEASE_CANDIDATES]:
+        job_id = candidate.job_id
+        claimed = db.query(models.ProcessingJob).filter(models.ProcessingJob.id == job_id, _leasable(now)).update(
+            {
+                models.ProcessingJob.status: models.JobStatus.LEASED,
+                models.ProcessingJob.lease_owner: worker_id,
+                models.ProcessingJob.lease_expires_at: now + timedelta(seconds=visibility_timeout_seconds),
+                models.ProcessingJob.started_at: now,
+                models.ProcessingJob.attempts: models.ProcessingJob.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+        if claimed == 1:
+            job = db.query(models.ProcessingJob).filter(models.ProcessingJob.id == job_id).first()
+            logger.info(f"Worker {worker_id} leased job {job_id} (doc_id={job.document_id}, owner={job.owner_id}, "
+                        f"cost={job.estimated_cost}, attempt {job.attempts}/{job.max_attempts})")
+            return job
+    return None
+
+def heartbeat(db: Session, job_id: int, worker_id: str, visibility_timeout_seconds: int) -> bool:
+    """Extends a held lease. Returns False if the lease was lost (expired and taken by another worker)."""
+    extended = db.query(models.ProcessingJob).filter(
+        models.ProcessingJob.id == job_id,
+        models.ProcessingJob.status == models.JobStatus.LEASED,
+        models.ProcessingJob.lease_owner == worker_id,
+    ).update(
+        {models.ProcessingJob.lease_expires_at: _utcnow() + timedelta(seconds=visibility_timeout_seconds)},
+        synchronize_session=False,
+    )
+    db.commit()
+    return extended == 1
+
+def _finish(db: Session, job_id: int, worker_id: str, values: dict) -> bool:
+    finished = db.query(models.ProcessingJob).filter(
+        models.ProcessingJob.id == job_id,
+        models.ProcessingJob.lease_owner == worker_id,
+        models.ProcessingJob.status == models.JobStatus.LEASED,
+    ).update(values, synchronize_session=False)
+    db.commit()
+    if finished != 1:
+        logger.warning(f"Worker {worker_id} no longer holds the lease on job {job_id}; result not recorded.")
+    return finished == 1
+
+def complete(db: Session, job_id: int, worker_id: str) -> bool:
+    """Marks a leased job as succeeded."""
+    return _finish(db, job_id, worker_id, {
+        models.ProcessingJob.status: models.JobStatus.SUCCEEDED,
+        models.ProcessingJob.lease_expires_at: None,
+        models.ProcessingJob.finished_at: _utcnow(),
+    })
+
+def fail(db: Session, job_id: int, worker_id: str, error: str, retry: bool = False) -> bool:
+    """
+    Records a failed attempt. With retry=True the job is re-queued (if attempts remain) and becomes
+    leasable again after retry_backoff_seconds(attempts); otherwise it is failed for good.
+    """
+    job = db.query(models.ProcessingJob).filter(models.ProcessingJob.id == job_id).first()
+    if job is not None and retry and job.attempts < job.max_attempts:
+        retry_delay_seconds = retry_backoff_seconds(job.attempts)
+        logger.info(f"Job {job_id} attempt {job.attempts}/{job.max_attempts} failed; retrying in {retry_delay_seconds}s.")
+        return _finish(db, job_id, worker_id, {
+            models.ProcessingJob.status: models.JobStatus.QUEUED,
+            models.ProcessingJob.lease_owner: None,
+            models.ProcessingJob.lease_expires_at: None,
+            models.ProcessingJob.available_at: _utcnow() + timedelta(seconds=retry_delay_seconds),
+            models.ProcessingJob.last_error: error[:2000],
+        })
+    return _finish(db, job_id, worker_id, {
+        models.ProcessingJob.status: models.JobStatus.FAILED,
+        models.ProcessingJob.lease_expires_at: None,
+        models.ProcessingJob.last_error: error[:2000],
+        models.ProcessingJob.finished_at: _utcnow(),
+    })
+
+# --- Cancellation (admin) ---
+def request_cancel(db: Session, document_id: int) -> Dict[str, int]:
+    """
+    Cancels a document's active jobs: queued jobs are failed right away, leased jobs are flagged
+    and stopped by their worker at its next cancellation poll. Returns {"queued_cancelled", "running_flagged"}.
+    """
+    now = _utcnow()
+    queued_cancelled = db.query(models.ProcessingJob).filter(
+        models.ProcessingJob.document_id == document_id,
+        models.ProcessingJob.status == models.JobStatus.QUEUED,
+    ).update({
+        models.ProcessingJob.status: models.JobStatus.FAILED,
+        models.ProcessingJob.last_error: "Cancelled by admin",
+        models.ProcessingJob.cancel_requested_at: now,
+        models.ProcessingJob.finished_at: now,
+    }, synchronize_session=False)
+    running_flagged = db.query(models.ProcessingJob).filter(
+        models.ProcessingJob.document_id == document_id,
+        models.ProcessingJob.status == models.JobStatus.LEASED,
+    ).update({models.ProcessingJob.cancel_requested_at: now}, synchronize_session=False)
+    db.commit()
+    return {"queued_cancelled": queued_cancelled, "running_flagged": running_flagged}
+
+def is_cancel_requested(db: Session, job_id: int) -> bool:
+    """True if an admin asked to cancel this job."""
+    return db.query(models.ProcessingJob.cancel_requested_at).filter(
+        models.ProcessingJob.id == job_id,
+    ).scalar() is not None
@@ -0,0 +1,71 @@
+# InsureDocsProject/backend/app/job_scheduler.py
+# Decides which queued job a worker leases next (used by job_queue.lease_next).
+#
+# Ordering, per candidate job:
+#   1. priority tier (from the uploader's role, JOB_ROLE_PRIORITIES) - higher first
+#   2. score = aged cost + owner's recent usage - lower first
+#      - aged cost: estimated cost (page-equivalents of OCR) shrunk by how long the job has waited,
+#        so small documents jump the queue but a large one is never starved forever
+#      - recent usage: estimated cost of the owner's jobs leased within JOB_FAIR_SHARE_WINDOW_SECONDS,
+#        so one user's 300-document drop is interleaved with everyone else's work
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import fitz                 # PyMuPDF - page count and layout sampling for cost estimates
+
+from .config import settings
+from . import text_layer
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+# =====================================
+# Cost estimation (at enqueue time)
+# =====================================
+def estimate_processing_cost(pdf_full_path: str) -> float:
+    """
+    Estimated processing cost of a PDF in page-equivalents of OCR work:
+    pages needing OCR cost JOB_COST_SCANNED_PAGE, text-layer pages JOB_COST_DIGITAL_PAGE.
+    The OCR share comes from the same page sampling the pipeline uses (text_layer.classify_document).
+    """
+    try:
+        with fitz.open(pdf_full_path) as doc:
+            num_pages = len(doc)
+            layout = text_layer.classify_document(doc, settings.TEXT_LAYER_SAMPLE_PAGES, text_layer.MIN_TEXT_LAYER_CHARS)
+    except Exception as est_err: # Unreadable PDF: it will fail fast in the pipeline anyway
+        logger.warning(f"Could not estimate processing cost for {pdf_full_path}: {est_err}")
+        return settings.JOB_COST_SCANNED_PAGE
+    ocr_fraction = layout.ocr_fraction
+    per_page = settings.JOB_COST_DIGITAL_PAGE + ocr_fraction * (settings.JOB_COST_SCANNED_PAGE - settings.JOB_COST_DIGITAL_PAGE)
+    return round(max(1, num_pages) * per_page, 3)
+
+def priority_for_role(role) -> int:
+    """Priority tier for jobs uploaded by a user with this role (JOB_ROLE_PRIORITIES, default 0)."""
+    role_name = getattr(role, "value", role)
+    return int(settings.JOB_ROLE_PRIORITIES.get(str(role_name), 0))
+
+# =====================================
+# Ranking (at lease time)
+# =====================================
+class JobCandidate:
+    """The columns of a leasable job that ranking needs."""
+
+    def __init__(self, job_id: int, owner_id: Optional[int], estimated_cost: Optional[float], priority: Optional[int], available_at: datetime):
+        self.job_id = job_id
+        self.owner_id = owner_id
+        self.estimated_cost = estimated_cost if estimated_cost is not None else settings.JOB_COST_SCANNED_PAGE
+        self.priority = priority or 0
+        self.available_at = available_at
+
+def aged_cost(candidate: JobCandidate, now: datetime) -> float:
+    """Estimated cost divided by (1 + wait / JOB_AGING_SECONDS): halves after one aging period of waiting."""
+    waited = max(0.0, (now - candidate.available_at).total_seconds())
+    return candidate.estimated_cost / (1.0 + waited / settings.JOB_AGING_SECONDS)
+
+def rank_candidates(candidates: Iterable[JobCandidate], owner_usage: Dict[Optional[int], float], now: datetime) -> List[JobCandidate]:
+    """Orders candidates best-first: priority tier, then aged cost plus owner's recent usage, then id (FIFO)."""
+    return sorted(
+        candidates,
+        key=lambda c: (-c.priority, aged_cost(c, now) + owner_usage.get(c.owner_id, 0.0), c.job_id),
+    )
@@ -4,10 +4,12 @@
 import os
 import sys      # For logging handler
 import logging  # For setting up logging
+import threading # For background model warm-up
 
 # --- FastAPI Imports ---
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 # --- Application Specific Imports ---
 # Use relative imports - ensure these files exist and are correct
@@ -16,9 +18,13 @@ try:
     from .database import SessionLocal # For startup event's DB session
     from . import crud                # For initial user creation
     from . import models              # For UserRole enum in startup
+    from . import ocr_utils           # For OCR model warm-up / readiness
+    from . import worker              # Optional in-process queue worker
+    from . import admission           # Queue depth / load shedding endpoint
+    from . import reaper              # Periodic recovery of stuck jobs
     from .schemas import UserCreate    # For initial user schema
     # Import your routers
-    from .routers import auth, users, documents # Add others as needed
+    from .routers import auth, users, documents, admin # Add others as needed
 except ImportError as import_err:
     print(f"CRITICAL IMPORT ERROR in main.py: {import_err}")
     print("Check if all necessary files exist and imports are correct.")
@@ -77,6 +83,30 @@ app.add_middleware(
 )
 
 
+# --- Upload Size Limit ---
+# Reject oversized single-file uploads from the Content-Length header, before any of the body
+# is read (the endpoint streams the body and enforces the limit on the actual bytes too).
+UPLOAD_PATH = "/api/v1/documents/"
+MULTIPART_OVERHEAD_BYTES = 64 * 1024 # Boundaries and part headers around the file
+
+class UploadSizeLimitMiddleware:
+    """Plain ASGI middleware (no per-request wrapping cost for other endpoints)."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (settings.MAX_UPLOAD_MB and scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == UPLOAD_PATH):
+            declared = dict(scope["headers"]).get(b"content-length", b"")
+            if declared.isdigit() and int(declared) > settings.MAX_UPLOAD_MB * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES:
+                logger.warning(f"Upload rejected before reading: Content-Length {int(declared)} exceeds {settings.MAX_UPLOAD_MB} MB")
+                response = JSONResponse(status_code=413, content={"detail": f"File too large (limit {settings.MAX_UPLOAD_MB} MB)."})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
+
 # --- Include API Routers ---
 # Mount the routers defined in the routers/ directory
 # Prefixes ensure endpoints are grouped under /api/v1/...
@@ -84,9 +114,7 @@ app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 # Use the router from the potentially simplified documents.py for now
 app.include_router(documents.router, prefix="/api/v1/documents", tags=["Documents"])
-# Example for future admin router:
-# from .routers import admin
-# app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
 
 
 # --- Application Startup Event ---
@@ -159,6 +187,20 @@ async def startup_event():
         if db:
             db.close() # Ensure the session is closed after use
 
+    # Opt-in: load OCR models before traffic arrives. Runs in a thread so the event loop
+    # starts serving immediately; /ready stays 503 until the models are loaded.
+    if settings.OCR_PRELOAD_MODELS:
+        threading.Thread(target=ocr_utils.warm_up_ocr_models, name="ocr-warm-up", daemon=True).start()
+        logger.info("OCR model warm-up started in background.")
+
+    # Uploads are processed by `python -m app.worker`; optionally run one worker in this process too
+    if settings.RUN_INPROCESS_WORKER:
+        worker.start_inprocess_worker()
+        logger.info("In-process queue worker started.")
+
+    # Re-queue jobs whose worker died (expired lease) and documents left without a job
+    reaper.start_reaper_thread()
+
     logger.info("Application startup complete.")
 
 
@@ -171,8 +213,36 @@ async def read_root():
     logger.info("Root endpoint '/' accessed.")
     return {"message": f"Welcome to {settings.PROJECT_NAME} v{settings.PROJECT_VERSION}"}
 
+# --- Readiness Endpoint ---
+@app.get("/ready", tags=["Root"], summary="Readiness Probe")
+async def read_readiness():
+    """
+    Readiness probe for load balancers / orchestrators: 503 until OCR models are loaded
+    (only when OCR_PRELOAD_MODELS is enabled), 200 afterwards.
+    """
+    ready, state = ocr_utils.ocr_readiness()
+    return JSONResponse(status_code=200 if ready else 503, content={"status": state})
+
+# --- Queue Depth Endpoint ---
+@app.get("/queue", tags=["Root"], summary="Processing Queue Depth")
+def read_queue_depth():
+    """
+    Processing backlog for load balancers: queue depth, in-flight upload bytes and drain rate
+    against the admission limits. 503 while uploads would be rejected, so plain HTTP checks can shed load.
+    """
+    db = SessionLocal()
+    try:
+        snapshot = admission.queue_snapshot(db)
+    finally:
+        db.close()
+    return JSONResponse(status_code=200 if snapshot["accepting"] else 503, content=snapshot)
+
 # --- Optional Shutdown Event ---
 @app.on_event("shutdown")
 async def shutdown_event():
      logger.info("Application shutting down...")
-     # Add any cleanup tasks here if needed
\ No newline at end of file
+     # Let the in-process worker finish its current job (no-op when not enabled)
+     worker.stop_inprocess_worker()
+     reaper.stop_reaper_thread()
+     # Stop OCR pool worker processes (no-op when OCR runs in-process)
+     ocr_utils.shutdown_ocr_pool()
\ No newline at end of file
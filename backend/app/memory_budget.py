@@ -0,0 +1,129 @@
+# InsureDocsProject/backend/app/memory_budget.py
+# Process memory accounting for OCR workers: RSS readings, per-document peak, and trimming.
+#
+# A worker's RSS is checked after every page against OCR_WORKER_RSS_LIMIT_MB. Over the limit,
+# MuPDF's resource store is emptied and freed heap is returned to the OS; if RSS is still over,
+# the worker is recycled once the current document is done (see worker.py / ocr_utils.py).
+import gc
+import os
+import sys
+import ctypes
+import logging
+from typing import Callable, Iterable, Optional
+
+import fitz                 # PyMuPDF - its resource store caches decoded images across pages
+
+from .config import settings
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Resident set size of a process (default: this one); 0 if it cannot be read (e.g. the process exited)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if pid is None and sys.platform != "win32": # No /proc (macOS): best effort, lifetime peak rather than current
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+    return 0
+
+def _read_high_water_mark() -> Optional[int]:
+    """This process's peak RSS since start or the last reset (Linux VmHWM)."""
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _reset_high_water_mark() -> bool:
+    """Resets VmHWM to the current RSS so the next reading is the peak of one document (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def limit_bytes() -> Optional[int]:
+    """Per-worker RSS budget (None = no limit)."""
+    limit_mb = getattr(settings, "OCR_WORKER_RSS_LIMIT_MB", 0)
+    return limit_mb * MB if limit_mb and limit_mb > 0 else None
+
+# --- Releasing memory ---
+_malloc_trim = None
+try:
+    _malloc_trim = ctypes.CDLL("libc.so.6").malloc_trim # glibc: hand freed arenas back to the OS
+except (OSError, AttributeError):
+    pass
+
+def release_page_caches():
+    """Drops MuPDF's cached decoded images/fonts. Called after each OCR'd page: scanned pages never share
+    their image, so the store would otherwise grow by one decoded scan per page up to its 256 MB default."""
+    fitz.TOOLS.store_shrink(100)
+
+def release_memory():
+    """Empties MuPDF's resource store, collects garbage and trims the C heap."""
+    fitz.TOOLS.store_shrink(100)
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+def over_limit(release: bool = True) -> bool:
+    """True if this process is above its RSS budget (after trying to release memory first)."""
+    limit = limit_bytes()
+    if limit is None or rss_bytes() <= limit:
+        return False
+    if release:
+        release_memory()
+    return rss_bytes() > limit
+
+class MemoryMonitor:
+    """
+    Tracks one document's peak RSS (this process plus, e.g., the OCR pool's worker processes)
+    and enforces the per-worker budget after each page.
+    """
+
+    def __init__(self, doc_id: int, extra_pids: Optional[Callable[[], Iterable[int]]] = None):
+        self.doc_id = doc_id
+        self.limit = limit_bytes()
+        self._extra_pids = extra_pids
+        self._hwm_reset = _reset_high_water_mark()
+        self.peak_own = rss_bytes()
+        self.peak_extra = 0
+        self.over_budget = False # Still above the limit after releasing memory -> recycle after this document
+
+    def sample(self):
+        """Records current RSS; above the budget, releases memory (until that stops helping for this document)."""
+        own = rss_bytes()
+        if self.limit is not None and own > self.limit and not self.over_budget:
+            release_memory()
+            own_after = rss_bytes()
+            if own_after > self.limit:
+                logger.warning(f"[Task {self.doc_id}] Worker RSS {own_after // MB} MB over its {self.limit // MB} MB budget "
+                               f"after releasing memory; it will be recycled after this document.")
+                self.over_budget = True
+        self.peak_own = max(self.peak_own, own)
+        if self._extra_pids is not None:
+            self.peak_extra = max(self.peak_extra, sum(rss_bytes(pid) for pid in self._extra_pids()))
+
+    @property
+    def peak_bytes(self) -> int:
+        """Peak RSS over the document: this process (exact on Linux) plus sampled peak of the extra processes."""
+        own = self.peak_own
+        if self._hwm_reset:
+            own = max(own, _read_high_water_mark() or 0)
+        return own + self.peak_extra
+
+    @property
+    def peak_mb(self) -> int:
+        return int(round(self.peak_bytes / MB))
@@ -1,9 +1,9 @@
 # InsureDocsProject/backend/app/models.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum as SAEnum, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum as SAEnum, Text, Index, Float
 from sqlalchemy.dialects.sqlite import JSON # Using specific import for SQLite JSON type
 # If using PostgreSQL: from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from .database import Base
 import enum
 
@@ -24,8 +24,16 @@ class DocumentStatus(str, enum.Enum):
     EXTRACT_FAILED = "extract_failed"     # Extraction (Regex) process failed
     APPROVED = "approved"             # Optional final status
     REJECTED = "rejected"             # Optional final status
+    OCR_TIMEOUT = "ocr_timeout"       # OCR exceeded its page or document time budget
+    CANCELLED = "cancelled"           # Processing cancelled by an admin
     # PENDING_APPROVAL = "pending_approval" # Evaluate if still needed
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"         # Waiting for a worker (available_at may be in the future for retries)
+    LEASED = "leased"         # Claimed by a worker until lease_expires_at (extended by heartbeats)
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"         # Finished unsuccessfully, or out of attempts
+
 # --- User Model ---
 class User(Base):
     __tablename__ = "users"
@@ -55,6 +63,63 @@ class Document(Base):
     # --- ADDED JSON FIELD ---
     extracted_metadata = Column(JSON, nullable=True) # Stores dict of extracted entities (e.g., {"policy_numbers": [...], "dates": [...]})
     # --- End Added Field ---
+    pages_total = Column(Integer, nullable=True) # Set when text extraction starts
+    pages_done = Column(Integer, nullable=True)  # Pages whose text has been written so far (live progress)
+    peak_rss_mb = Column(Integer, nullable=True) # Peak worker memory while this document was OCR'd (incl. OCR pool processes)
+    ner_entities = Column(JSON, nullable=True) # NER stage output: {label: [unique values]} (spaCy entities + ner_utils regex labels)
+    ner_mentions = Column(JSON, nullable=True) # NER stage output: every occurrence as {label, value, page, start, end} (offsets into the text file)
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     owner_id = Column(Integer, ForeignKey("users.id"), index=True)
-    owner = relationship("User", back_populates="documents")
\ No newline at end of file
+    owner = relationship("User", back_populates="documents")
+    jobs = relationship("ProcessingJob", back_populates="document", cascade="all, delete-orphan")
+    # --- Upload deduplication ---
+    content_sha256 = Column(String(64), nullable=True) # Hex digest of the uploaded bytes
+    duplicate_of_id = Column(Integer, ForeignKey("documents.id"), index=True, nullable=True) # Set when the bytes matched an earlier upload: shares its PDF and text file, copies its results
+
+    __table_args__ = (
+        # One canonical document per content hash; duplicates point at it (partial index, NULL hashes allowed)
+        Index("ix_documents_content_sha256", "content_sha256", unique=True,
+              sqlite_where=text("duplicate_of_id IS NULL"), postgresql_where=text("duplicate_of_id IS NULL")),
+    )
+
+# --- Document Entity Model (extracted values, one row per value and page; see extraction_utils.entity_rows) ---
+class DocumentEntity(Base):
+    __tablename__ = "document_entities"
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True, nullable=False) # Duplicate uploads get their own copies
+    label = Column(String(32), nullable=False) # POLICY_NUMBER, DATE, AMOUNT
+    normalized_value = Column(String, nullable=False) # extraction_utils.normalize_entity_value; what lookups compare
+    raw_value = Column(String, nullable=False) # As found in the text (first occurrence on the page)
+    page = Column(Integer, nullable=True) # From the "--- Page N ---" markers; None for text without markers
+
+    __table_args__ = (
+        # Entity lookups: the trailing document_id makes them index-only
+        Index("ix_document_entities_label_normalized_value", "label", "normalized_value", "document_id"),
+    )
+
+# --- Processing Job Model (durable work queue, see job_queue.py) ---
+class ProcessingJob(Base):
+    __tablename__ = "processing_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True, nullable=False)
+    kind = Column(String, nullable=False, default="process") # What the worker runs for this job
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=True) # Uploader, for fair-share scheduling
+    priority = Column(Integer, nullable=False, default=0) # Tier from the uploader's role; higher leases first
+    estimated_cost = Column(Float, nullable=True) # Page-equivalents of OCR work (job_scheduler.estimate_processing_cost)
+    status = Column(SAEnum(JobStatus, name="jobstatusenum"), default=JobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0) # Incremented on every lease
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False, server_default=func.now()) # Not leasable before this (UTC)
+    lease_owner = Column(String, nullable=True)       # Worker id holding the lease
+    lease_expires_at = Column(DateTime, nullable=True) # Job becomes visible again after this unless heartbeated (UTC)
+    started_at = Column(DateTime, nullable=True) # Last lease time (UTC); drives per-owner recent usage
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime, nullable=True, index=True) # Drain rate for admission control
+    cancel_requested_at = Column(DateTime, nullable=True) # Set by an admin cancel; the leasing worker stops the job (UTC)
+    document = relationship("Document", back_populates="jobs")
+
+    __table_args__ = (
+        Index("ix_processing_jobs_status_available_at", "status", "available_at"), # Leasing scans by these
+        Index("ix_processing_jobs_started_at_owner_id", "started_at", "owner_id"), # Recent usage per owner
+    )
\ No newline at end of file
@@ -1,22 +1,68 @@
 # InsureDocsProject/backend/app/ner_utils.py
-import spacy
 import re
+import time
 import logging
-from typing import Dict, Any, List, Set, Optional
+import threading
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Set, Optional, Tuple
+
+from .config import settings
 
 logger = logging.getLogger(__name__)
 
-# --- Load spaCy Model ---
-NLP_MODEL_NAME = "en_core_web_sm" # Or "en_core_web_md" / "en_core_web_lg"
-NLP = None
-try:
-    logger.info(f"Loading spaCy model '{NLP_MODEL_NAME}' for NER...")
-    NLP = spacy.load(NLP_MODEL_NAME)
-    logger.info("spaCy model loaded successfully for NER.")
-except OSError:
-    logger.error(f"SpaCy model '{NLP_MODEL_NAME}' not found. Please run: python -m spacy download {NLP_MODEL_NAME}")
-except Exception as e:
-    logger.error(f"Unexpected error loading spaCy model: {e}", exc_info=True)
+# --- spaCy Model (Lazy and Thread-Safe) ---
+# Nothing is imported or loaded until the first NER call (or preload_nlp() in a worker), so processes
+# that never run NER - the API, OCR-only workers - don't pay spaCy's import time and the model's memory.
+_nlp = None
+_nlp_lock = threading.Lock()
+_nlp_load_attempted = False # A failed load (spaCy / model missing) is not retried; NER then uses regex only
+
+def _select_ner_pipes(nlp):
+    """
+    Disables every pipeline component entities do not depend on (tagger, parser, lemmatizer, ...).
+    Kept: NER_PIPES plus the shared embedding components (tok2vec / transformer) they listen to.
+    """
+    keep = {name for name in settings.NER_PIPES if name in nlp.pipe_names}
+    for name, pipe in nlp.pipeline:
+        if keep & set(getattr(pipe, "listening_components", None) or []):
+            keep.add(name)
+    disabled = [name for name in nlp.pipe_names if name not in keep]
+    if disabled:
+        nlp.select_pipes(disable=disabled)
+    logger.info(f"spaCy pipeline for NER: {nlp.pipe_names} (disabled: {disabled or 'none'})")
+    return nlp
+
+def _load_nlp(model_name: str):
+    try:
+        import spacy
+    except ImportError:
+        logger.warning("spaCy is not installed; NER will use regex patterns only (pip install spacy).")
+        return None
+    try:
+        logger.info(f"Loading spaCy model '{model_name}' for NER...")
+        started = time.perf_counter()
+        nlp = _select_ner_pipes(spacy.load(model_name))
+        logger.info(f"spaCy model '{model_name}' loaded in {time.perf_counter() - started:.1f}s.")
+        return nlp
+    except OSError:
+        logger.error(f"SpaCy model '{model_name}' not found. Please run: python -m spacy download {model_name}")
+    except Exception as e:
+        logger.error(f"Unexpected error loading spaCy model: {e}", exc_info=True)
+    return None
+
+def get_nlp():
+    """Loads (on first use) and returns the shared spaCy pipeline for NER_MODEL_NAME, or None if it is unavailable."""
+    global _nlp, _nlp_load_attempted
+    if _nlp is None and not _nlp_load_attempted:
+        with _nlp_lock:
+            # Double check if another thread loaded it while waiting for the lock
+            if _nlp is None and not _nlp_load_attempted:
+                _nlp = _load_nlp(settings.NER_MODEL_NAME)
+                _nlp_load_attempted = True
+    return _nlp
+
+def preload_nlp() -> bool:
+    """Worker start-up hook: loads the model now instead of on the first NER job. Returns whether it is available."""
+    return get_nlp() is not None
 
 # --- Define Regex Patterns ---
 # Compile regex patterns for efficiency. Using named groups optional but helpful.
@@ -36,11 +82,161 @@ REGEX_CONFIG = [
     # Add patterns for NPI, ICD, CPT, SSN (handle masking/PII carefully!), etc.
 ]
 
-# --- Main Extraction Function ---
+# --- Throughput metrics (per process, cumulative since start) ---
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, float] = {
+    "batches": 0,
+    "docs": 0,
+    "chars": 0,
+    "seconds": 0.0, # Wall time inside extract_entity_mentions_batch
+}
+
+def get_metrics() -> Dict[str, float]:
+    """NER throughput of this process: totals plus docs/sec and chars/sec over all batches."""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    seconds = metrics["seconds"]
+    metrics["docs_per_sec"] = round(metrics["docs"] / seconds, 2) if seconds else 0.0
+    metrics["chars_per_sec"] = round(metrics["chars"] / seconds, 1) if seconds else 0.0
+    return metrics
+
+# --- Chunking (page markers, then sentence-safe splits) ---
+# OCR output carries "--- Page N (engine) ---" marker lines (ocr_utils._page_section). Every page is
+# run through the model on its own and long pages are cut at sentence / line boundaries, so one Doc
+# never covers more than NER_CHUNK_CHARS characters however long the document is.
+PAGE_MARKER = re.compile(r"^--- Page (\d+)(?: \([^)\n]*\))? ---$", re.MULTILINE)
+_CHUNK_BREAKS = ("\n\n", ". ", "\n", " ") # Preferred cut points, best first
+
+class TextChunk(NamedTuple):
+    """A slice of a document's text: its page (None before the first / without markers) and offset in the text."""
+    page: Optional[int]
+    start: int
+    text: str
+
+class EntityMention(NamedTuple):
+    """One entity occurrence; start/end are character offsets of value in the whole document text."""
+    label: str
+    value: str
+    page: Optional[int]
+    start: int
+    end: int
+
+def _page_spans(text: str) -> Iterator[Tuple[Optional[int], int, int]]:
+    """(page, start, end) of every page's text, marker lines excluded."""
+    page, start = None, 0
+    for marker in PAGE_MARKER.finditer(text):
+        yield page, start, marker.start()
+        page, start = int(marker.group(1)), marker.end()
+    yield page, start, len(text)
+
+def _cut_point(text: str, start: int, end: int, max_chars: int) -> int:
+    """End of the next chunk starting at start: the last preferred break in its second half, else a hard cut."""
+    limit = start + max_chars
+    if end <= limit:
+        return end
+    for separator in _CHUNK_BREAKS:
+        cut = text.rfind(separator, start + max_chars // 2, limit)
+        if cut != -1:
+            return cut + len(separator)
+    return limit
+
+def iter_text_chunks(text: str, max_chars: Optional[int] = None) -> Iterator[TextChunk]:
+    """Yields the non-blank chunks of text: one per page, long pages split into pieces of at most max_chars."""
+    max_chars = max(max_chars or settings.NER_CHUNK_CHARS, 1)
+    for page, start, end in _page_spans(text):
+        while start < end:
+            cut = _cut_point(text, start, end, max_chars)
+            piece = text[start:cut]
+            if not piece.isspace():
+                yield TextChunk(page, start, piece)
+            start = cut
+
+def _chunk_limit(nlp) -> int:
+    return min(settings.NER_CHUNK_CHARS, nlp.max_length) if nlp is not None else settings.NER_CHUNK_CHARS
+
+# --- Extraction helpers ---
+
+def _mention(label: str, chunk: TextChunk, raw: str, start: int) -> Optional[EntityMention]:
+    """Mention for raw found at start within chunk, whitespace-trimmed (offsets follow the trimmed value)."""
+    value = raw.strip()
+    if not value:
+        return None
+    start = chunk.start + start + (len(raw) - len(raw.lstrip()))
+    return EntityMention(label, value, chunk.page, start, start + len(value))
+
+def _spacy_mentions(doc, chunk: TextChunk) -> Iterator[EntityMention]:
+    """Mentions for a processed spaCy Doc of chunk."""
+    for ent in doc.ents:
+        # Standard spaCy labels: PERSON, NORP, FAC, ORG, GPE, LOC, PRODUCT,
+        # EVENT, WORK_OF_ART, LAW, LANGUAGE, DATE, TIME, PERCENT, MONEY, QUANTITY, ORDINAL, CARDINAL
+        mention = _mention(ent.label_, chunk, ent.text, ent.start_char)
+        # Basic filtering/normalization
+        if mention and len(mention.value) > 1: # Ignore single characters
+            # You might add more cleaning here (e.g., remove leading/trailing punctuation)
+            yield mention
+
+def _regex_mentions(chunk: TextChunk) -> Iterator[EntityMention]:
+    """Applies REGEX_CONFIG to one chunk."""
+    for config in REGEX_CONFIG:
+        label = config["label"]
+        pattern = config["pattern"]
+        try:
+            # The patterns capture the specific value in their first group
+            group = 1 if pattern.groups else 0
+            for match in pattern.finditer(chunk.text):
+                if match.start(group) >= 0:
+                    mention = _mention(label, chunk, match.group(group), match.start(group))
+                    if mention:
+                        yield mention
+        except Exception as regex_err:
+             logger.error(f"Error applying regex for '{label}': {regex_err}", exc_info=True)
+
+def _iter_mentions(texts: List[str], batch_size: int, n_process: int) -> Iterator[Tuple[int, EntityMention]]:
+    """
+    (text index, mention) for every text: all chunks of all texts stream through one nlp.pipe, so only
+    about batch_size chunk Docs exist at a time. Regex mentions follow per text, also chunk by chunk.
+    """
+    nlp = get_nlp()
+    max_chars = _chunk_limit(nlp)
+    if nlp:
+        try:
+            chunks = ((chunk.text, (index, chunk)) for index, text in enumerate(texts) if text
+                      for chunk in iter_text_chunks(text, max_chars))
+            for doc, (index, chunk) in nlp.pipe(chunks, as_tuples=True, batch_size=batch_size, n_process=n_process):
+                for mention in _spacy_mentions(doc, chunk):
+                    yield index, mention
+        except Exception as spacy_err: # Regex results are still returned
+             logger.error(f"Error during spaCy NER processing: {spacy_err}", exc_info=True)
+    else:
+         logger.warning("spaCy model not available. Skipping spaCy NER.")
+
+    for index, text in enumerate(texts):
+        if text:
+            for chunk in iter_text_chunks(text, max_chars):
+                for mention in _regex_mentions(chunk):
+                    yield index, mention
+
+def _finalize(entities: Dict[str, Set[str]]) -> Dict[str, List[str]]:
+    # Convert sets to sorted lists for consistent JSON output
+    return {
+        label: sorted(list(values))
+        for label, values in entities.items()
+        if values # Ensure the set is not empty
+    }
+
+# --- Main Extraction Functions ---
+
+def extract_entity_mentions(text: str) -> List[EntityMention]:
+    """Every spaCy and regex entity occurrence in text with its page number and character offsets."""
+    if not text or not isinstance(text, str):
+        logger.warning("extract_entity_mentions received empty or non-string input.")
+        return []
+    return [mention for _, mention in _iter_mentions([text], settings.NER_BATCH_SIZE, 1)]
 
 def extract_entities(text: str) -> Dict[str, List[str]]:
     """
-    Extracts named entities using spaCy and regex from input text.
+    Extracts named entities using spaCy and regex from input text, page by page
+    (see iter_text_chunks), so memory does not grow with the length of the document.
 
     Args:
         text: The text content (e.g., from OCR).
@@ -54,60 +250,48 @@ def extract_entities(text: str) -> Dict[str, List[str]]:
 
     # Use a dictionary where values are sets to automatically handle uniqueness
     entities: Dict[str, Set[str]] = {}
+    count = 0
+    for _, mention in _iter_mentions([text], settings.NER_BATCH_SIZE, 1):
+        entities.setdefault(mention.label, set()).add(mention.value)
+        count += 1
 
-    # 1. spaCy Pre-trained NER (if model loaded)
-    if NLP:
-        try:
-            logger.info("Starting spaCy NER processing...")
-            doc = NLP(text)
-            count = 0
-            for ent in doc.ents:
-                # Standard spaCy labels: PERSON, NORP, FAC, ORG, GPE, LOC, PRODUCT,
-                # EVENT, WORK_OF_ART, LAW, LANGUAGE, DATE, TIME, PERCENT, MONEY, QUANTITY, ORDINAL, CARDINAL
-                label = ent.label_
-                value = ent.text.strip()
-                # Basic filtering/normalization
-                if value and len(value) > 1: # Ignore single characters
-                    # You might add more cleaning here (e.g., remove leading/trailing punctuation)
-                    if label not in entities:
-                        entities[label] = set()
-                    entities[label].add(value)
-                    count += 1
-            logger.info(f"spaCy processing complete. Found {count} entities across {len(entities)} types.")
-        except Exception as spacy_err:
-             logger.error(f"Error during spaCy NER processing: {spacy_err}", exc_info=True)
-    else:
-         logger.warning("spaCy model not available. Skipping spaCy NER.")
+    final_entities = _finalize(entities)
+    logger.info(f"Entity extraction finished. {count} mentions, result keys: {list(final_entities.keys())}")
+    return final_entities
 
-    # 2. Apply Custom Regex Patterns
-    logger.info("Applying custom Regex patterns...")
-    regex_match_count = 0
-    for config in REGEX_CONFIG:
-        label = config["label"]
-        pattern = config["pattern"]
-        try:
-            # findall is good if your pattern captures the specific value in a group
-            matches = pattern.findall(text)
-            if matches:
-                # If pattern had one capture group, matches is list[str]
-                # If multiple groups, list[tuple]. Handle accordingly.
-                # Assuming one capture group based on examples:
-                cleaned_matches = {m.strip() for m in matches if isinstance(m, str) and m.strip()}
-                if cleaned_matches:
-                    if label not in entities: entities[label] = set()
-                    new_finds = len(cleaned_matches - entities[label]) # Count how many are new
-                    entities[label].update(cleaned_matches)
-                    if new_finds > 0: logger.debug(f"Regex found {new_finds} new instance(s) for '{label}'")
-                    regex_match_count += new_finds
-        except Exception as regex_err:
-             logger.error(f"Error applying regex for '{label}': {regex_err}", exc_info=True)
-    logger.info(f"Regex processing complete. Found {regex_match_count} new entity instances.")
+def entities_from_mentions(mentions: Iterable[EntityMention]) -> Dict[str, List[str]]:
+    """{label: sorted unique values} for a document's mentions (the ner_entities summary)."""
+    entities: Dict[str, Set[str]] = {}
+    for mention in mentions:
+        entities.setdefault(mention.label, set()).add(mention.value)
+    return _finalize(entities)
 
-    # Convert sets to sorted lists for consistent JSON output
-    final_entities: Dict[str, List[str]] = {
-        label: sorted(list(values))
-        for label, values in entities.items()
-        if values # Ensure the set is not empty
-    }
-    logger.info(f"Entity extraction finished. Result keys: {list(final_entities.keys())}")
-    return final_entities
\ No newline at end of file
+def extract_entity_mentions_batch(texts: Iterable[str], batch_size: Optional[int] = None, n_process: Optional[int] = None) -> List[List[EntityMention]]:
+    """
+    extract_entity_mentions for many documents: the chunks of all texts stream through nlp.pipe
+    (batch_size chunks per batch, n_process worker processes) with only the NER components enabled.
+    Returns one list of mentions (with page numbers and offsets) per text, in order.
+    """
+    started = time.perf_counter()
+    texts = [text if isinstance(text, str) else "" for text in texts]
+    mentions: List[List[EntityMention]] = [[] for _ in texts]
+    batch_size = batch_size or settings.NER_BATCH_SIZE
+    n_process = n_process or settings.NER_N_PROCESS
+
+    for index, mention in _iter_mentions(texts, batch_size, n_process):
+        mentions[index].append(mention)
+
+    elapsed = time.perf_counter() - started
+    chars = sum(len(text) for text in texts)
+    with _metrics_lock:
+        _metrics["batches"] += 1
+        _metrics["docs"] += len(texts)
+        _metrics["chars"] += chars
+        _metrics["seconds"] += elapsed
+    logger.info(f"NER batch: {len(texts)} docs, {chars} chars in {elapsed:.2f}s "
+                f"({len(texts) / elapsed if elapsed else 0:.1f} docs/sec; batch_size={batch_size}, n_process={n_process}).")
+    return mentions
+
+def extract_entities_batch(texts: Iterable[str], batch_size: Optional[int] = None, n_process: Optional[int] = None) -> List[Dict[str, List[str]]]:
+    """extract_entities for many documents (see extract_entity_mentions_batch). Returns one result per text, in order."""
+    return [entities_from_mentions(found) for found in extract_entity_mentions_batch(texts, batch_size, n_process)]
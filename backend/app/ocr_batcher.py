@@ -0,0 +1,188 @@
+# InsureDocsProject/backend/app/ocr_batcher.py
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from .memory_budget import release_page_caches
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+# A page result is (page_text, error_message); exactly one of the two is meaningful.
+PageResult = Tuple[str, Optional[str]]
+
+DETECTOR_CANVAS_SIZE = 2560 # EasyOCR's default canvas_size: detector input is capped at this long side
+DETECTOR_MEMORY_FACTOR = 8 # Rough float32 activations per detector input value (CRAFT feature maps)
+
+def estimate_page_bytes(shape: Tuple[int, ...]) -> int:
+    """Rough memory a page of this array shape adds to a batch: the array plus the detector's float32 tensors."""
+    h, w = shape[:2]
+    scale = min(1.0, DETECTOR_CANVAS_SIZE / max(h, w))
+    detector_values = int(h * scale) * int(w * scale) * 3
+    return h * w * (shape[2] if len(shape) > 2 else 1) + detector_values * 4 * DETECTOR_MEMORY_FACTOR
+
+class _PendingPage:
+    __slots__ = ("image", "shape", "nbytes", "future", "submitted_at")
+
+    def __init__(self, image):
+        self.image = image # page_render.PageImage, released once OCR'd
+        self.shape = image.array.shape
+        self.nbytes = estimate_page_bytes(self.shape)
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+
+class OCRBatcher:
+    """
+    Forms EasyOCR batches from the rendered pages of every document this process is OCR'ing.
+
+    Each document (one thread per leased OCR job, see OCR_CONCURRENT_DOCS) submits its pages inside
+    producing(); one batching thread groups pending pages of identical array shape - from any
+    document - and runs them through reader.readtext_batched. Only identical shapes share a batch,
+    so EasyOCR stacks them without resizing or padding and the text matches per-page readtext.
+
+    A batch starts once a submitted page does not fit the memory budget any more, once no producer is still
+    rendering, or once the oldest pending page has waited max_wait_seconds. Pending and running
+    pages together stay within budget_bytes (submit() blocks until there is room).
+    """
+
+    def __init__(self, get_reader: Callable, budget_bytes: int, recognizer_batch_size: int = 16, max_wait_seconds: float = 2.0):
+        self._get_reader = get_reader
+        self.budget_bytes = budget_bytes
+        self.recognizer_batch_size = recognizer_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._cond = threading.Condition()
+        self._pending: List[_PendingPage] = []
+        self._pending_bytes = 0
+        self._running_bytes = 0
+        self._rendering = 0 # Producers that may still submit pages
+        self._waiting: List[int] = [] # Sizes of pages whose submit() waits for room in the budget
+        self._closed = False
+        self._stats = {"batches": 0, "pages": 0}
+        self._thread = threading.Thread(target=self._run, name="ocr-batcher", daemon=True)
+        self._thread.start()
+
+    # --- Producer side (document threads) ---
+    @contextmanager
+    def producing(self):
+        """Marks the calling document as still rendering pages, so batches wait for its next page."""
+        with self._cond:
+            self._rendering += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._rendering -= 1
+                self._cond.notify_all()
+
+    def submit(self, image) -> Future:
+        """Queues a rendered page for OCR. Returns a Future of its (page_text, error_message)."""
+        page = _PendingPage(image)
+        with self._cond:
+            # Wait for room in the budget (a page larger than the whole budget goes once nothing else is queued)
+            while not self._closed and self._pending_bytes + self._running_bytes > 0 \
+                    and self._pending_bytes + self._running_bytes + page.nbytes > self.budget_bytes:
+                self._waiting.append(page.nbytes)
+                self._cond.notify_all()
+                try:
+                    self._cond.wait()
+                finally:
+                    self._waiting.remove(page.nbytes)
+            if self._closed:
+                raise RuntimeError("OCR batcher is shut down")
+            self._pending.append(page)
+            self._pending_bytes += page.nbytes
+            self._cond.notify_all()
+        return page.future
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats)
+
+    def close(self):
+        """Stops the batching thread once the pages already submitted have been OCR'd."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    # --- Batching thread ---
+    def _ready_locked(self) -> bool:
+        if not self._pending:
+            return False
+        # Full: a waiting page does not fit even after the running batch (if any) is done
+        full = bool(self._waiting) and self._pending_bytes + self._running_bytes + min(self._waiting) > self.budget_bytes
+        waited = time.monotonic() - self._pending[0].submitted_at
+        return self._closed or full or self._rendering == 0 or waited >= self.max_wait_seconds
+
+    def _take_batch_locked(self) -> List[_PendingPage]:
+        """Removes the oldest pending page and every later one of the same shape (within the budget) from the queue."""
+        shape = self._pending[0].shape
+        batch, rest, batch_bytes = [], [], 0
+        for page in self._pending:
+            if page.shape == shape and (not batch or batch_bytes + page.nbytes <= self.budget_bytes):
+                batch.append(page)
+                batch_bytes += page.nbytes
+            else:
+                rest.append(page)
+        self._pending = rest
+        self._pending_bytes -= batch_bytes
+        self._running_bytes += batch_bytes
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready_locked():
+                    if self._closed and not self._pending:
+                        return
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0.0, self.max_wait_seconds - (time.monotonic() - self._pending[0].submitted_at))
+                    self._cond.wait(timeout)
+                batch = self._take_batch_locked()
+            try:
+                self._run_batch(batch)
+            finally:
+                with self._cond:
+                    self._running_bytes -= sum(page.nbytes for page in batch)
+                    self._stats["batches"] += 1
+                    self._stats["pages"] += len(batch)
+                    self._cond.notify_all()
+
+    def _run_batch(self, batch: List[_PendingPage]):
+        running = []
+        for page in batch:
+            if page.future.set_running_or_notify_cancel():
+                running.append(page)
+            else:
+                page.image.release() # Cancelled: its document stopped
+        batch = running
+        if not batch:
+            return
+        logger.debug(f"Running EasyOCR batch of {len(batch)} pages ({batch[0].shape[1]}x{batch[0].shape[0]}).")
+        try:
+            reader = self._get_reader()
+            try:
+                batch_results = reader.readtext_batched([page.image.as_bgr() for page in batch], detail=0, paragraph=True,
+                                                        batch_size=self.recognizer_batch_size)
+                if len(batch_results) != len(batch):
+                    raise RuntimeError(f"readtext_batched returned {len(batch_results)} results for {len(batch)} pages")
+                results = [("\n".join(page_results), None) for page_results in batch_results]
+            except Exception as batch_err:
+                # Retry one by one so a single bad page only fails itself
+                logger.warning(f"EasyOCR batch of {len(batch)} pages failed ({batch_err}); retrying per page.")
+                results = []
+                for page in batch:
+                    try:
+                        results.append(("\n".join(reader.readtext(page.image.as_bgr(), detail=0, paragraph=True)), None))
+                    except Exception as page_err:
+                        results.append(("", str(page_err)))
+        except Exception as reader_err: # Reader could not be loaded
+            results = [("", str(reader_err))] * len(batch)
+        for page, result in zip(batch, results):
+            page.image.release()
+            page.future.set_result(result)
+        release_page_caches()
@@ -0,0 +1,131 @@
+# InsureDocsProject/backend/app/ocr_budget.py
+# Wall-clock budgets and cooperative cancellation for one document's OCR stage.
+#
+# Native calls (EasyOCR readtext, PyMuPDF get_text) cannot be interrupted from Python, so a page
+# runs on a watchdog thread and the caller stops waiting once its budget is spent. The stuck call
+# is then abandoned: the document fails with a timeout and the process that owns the stuck thread
+# is reclaimed (the OCR pool is restarted; a standalone worker exits so its supervisor restarts it).
+import time
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, List, Optional
+
+from .config import settings
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+REASON_TIMEOUT = "timeout"
+REASON_CANCELLED = "cancelled"
+WAIT_SLICE_SECONDS = 0.5 # How often a waiting caller re-checks the cancellation flag
+
+class ProcessingCancelled(Exception):
+    """Raised when a document's budget is spent or its processing was cancelled."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason # REASON_TIMEOUT or REASON_CANCELLED
+
+class PageTimedOut(ProcessingCancelled):
+    """A single page exceeded its budget; its work was abandoned, still running."""
+
+    def __init__(self, page_index: int, seconds: float):
+        super().__init__(REASON_TIMEOUT, f"Page {page_index + 1} exceeded its {seconds:.0f}s budget")
+        self.page_index = page_index
+
+# --- Abandoned work (process-wide) ---
+_abandoned_lock = threading.Lock()
+_abandoned_threads: List[threading.Thread] = []
+
+def abandoned_thread_count() -> int:
+    """Abandoned page threads of this process that are still running (a call stuck in native code only ends with the process)."""
+    with _abandoned_lock:
+        _abandoned_threads[:] = [t for t in _abandoned_threads if t.is_alive()]
+        return len(_abandoned_threads)
+
+def _note_abandoned(thread: threading.Thread):
+    with _abandoned_lock:
+        _abandoned_threads.append(thread)
+
+class OCRBudget:
+    """Per-document deadline, per-page limit and cancellation flag for one OCR stage run."""
+
+    def __init__(self, doc_id: int, document_seconds: Optional[float] = None, page_seconds: Optional[float] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        self.doc_id = doc_id
+        document_seconds = settings.OCR_DOCUMENT_TIMEOUT_SECONDS if document_seconds is None else document_seconds
+        page_seconds = settings.OCR_PAGE_TIMEOUT_SECONDS if page_seconds is None else page_seconds
+        self.document_seconds = document_seconds if document_seconds and document_seconds > 0 else None
+        self.page_seconds = page_seconds if page_seconds and page_seconds > 0 else None
+        self.cancel_event = cancel_event or threading.Event()
+        self._deadline = time.monotonic() + self.document_seconds if self.document_seconds else None
+        self.abandoned = False # A page thread was left running (its fitz document / reader must not be reused)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left for the document (None = unlimited)."""
+        return None if self._deadline is None else self._deadline - time.monotonic()
+
+    def check(self):
+        """Raises ProcessingCancelled if processing was cancelled or the document budget is spent."""
+        if self.cancel_event.is_set():
+            raise ProcessingCancelled(REASON_CANCELLED, f"Processing of document {self.doc_id} was cancelled")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise ProcessingCancelled(REASON_TIMEOUT, f"Document {self.doc_id} exceeded its {self.document_seconds:.0f}s budget")
+
+    def _page_limit(self) -> Optional[float]:
+        remaining = self.remaining()
+        if remaining is None:
+            return self.page_seconds
+        return remaining if self.page_seconds is None else min(self.page_seconds, remaining)
+
+    def _wait(self, is_done: Callable[[float], bool], page_index: int):
+        """Waits in slices until is_done(slice) is True; raises on cancellation or when the page/document budget runs out."""
+        limit = self._page_limit()
+        started = time.monotonic()
+        while True:
+            waited = time.monotonic() - started
+            slice_seconds = WAIT_SLICE_SECONDS if limit is None else max(0.0, min(WAIT_SLICE_SECONDS, limit - waited))
+            if is_done(slice_seconds):
+                return
+            self.check() # Cancelled, or the document deadline passed first
+            if limit is not None and time.monotonic() - started >= limit:
+                raise PageTimedOut(page_index, limit)
+
+    def run_page(self, page_index: int, fn: Callable, *args):
+        """Runs fn(*args) for one page under the budget. Without any limit it runs inline (cancellation is then seen between pages)."""
+        self.check()
+        if self._page_limit() is None:
+            return fn(*args)
+        outcome = {}
+        def target():
+            try:
+                outcome["result"] = fn(*args)
+            except BaseException as page_err:
+                outcome["error"] = page_err
+        worker = threading.Thread(target=target, name=f"ocr-doc-{self.doc_id}-page-{page_index + 1}", daemon=True)
+        worker.start()
+        try:
+            self._wait(lambda slice_seconds: (worker.join(slice_seconds), not worker.is_alive())[1], page_index)
+        except ProcessingCancelled:
+            _note_abandoned(worker)
+            self.abandoned = True
+            logger.error(f"[Task {self.doc_id}] Abandoning page {page_index + 1}: still running on thread {worker.name}.")
+            raise
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def wait_future(self, page_index: int, future: Future):
+        """Waits for a pool future under the budget (the page limit counts from when waiting starts)."""
+        def done(slice_seconds: float) -> bool:
+            try:
+                future.result(timeout=slice_seconds)
+                return True
+            except FutureTimeoutError:
+                return False
+            except Exception:
+                return True # The error is re-raised by future.result() below
+        self._wait(done, page_index)
+        return future.result()
@@ -0,0 +1,157 @@
+# InsureDocsProject/backend/app/ocr_cache.py
+import os
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024 # Read files 1 MB at a time when hashing
+# Bump when OCR output for identical pixels would change (engine, languages, post-processing)
+PAGE_KEY_VERSION = "easyocr-en-v1"
+
+def sha256_file(path: str) -> str:
+    """Returns the hex SHA-256 of a file, streamed in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class OCRResultCache:
+    """
+    Content-addressed, size-bounded store of extracted text, shared by all processes via the filesystem.
+
+    - Documents are keyed by the SHA-256 of the whole PDF file plus a fingerprint of the render /
+      text-layer settings that produced the output (final output text).
+    - Pages are keyed by the SHA-256 of the rendered pixels handed to the OCR engine,
+      so a repeated page (e.g. standard policy wording) skips OCR even inside a new PDF.
+
+    Entries are plain text files under <root>/documents and <root>/pages. A hit refreshes the
+    file's mtime; when the total size exceeds max_bytes the least recently used entries are evicted.
+    Hit/miss counters are per process.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None # Computed lazily on first write
+        self._counters: Dict[str, int] = {
+            "document_hits": 0, "document_misses": 0,
+            "page_hits": 0, "page_misses": 0,
+            "evictions": 0,
+        }
+
+    # --- Keys ---
+    @staticmethod
+    def page_key(image) -> str:
+        """Hashes a rendered page (page_render.PageImage) by its pixel buffer and geometry."""
+        pix = image.pixmap
+        digest = hashlib.sha256(f"{PAGE_KEY_VERSION}|{pix.width}x{pix.height}x{pix.n}|".encode())
+        digest.update(pix.samples_mv)
+        return digest.hexdigest()
+
+    @staticmethod
+    def document_key(file_sha256: str, settings_fingerprint: str) -> str:
+        """Keys a whole document by its file hash and the settings its text was produced with."""
+        return hashlib.sha256(f"{PAGE_KEY_VERSION}|{settings_fingerprint}|{file_sha256}".encode()).hexdigest()
+
+    # --- Public API ---
+    def get_document(self, document_key: str) -> Optional[str]:
+        return self._get("documents", document_key)
+
+    def put_document(self, document_key: str, text: str):
+        self._put("documents", document_key, text)
+
+    def get_page(self, page_key: str) -> Optional[str]:
+        return self._get("pages", page_key)
+
+    def put_page(self, page_key: str, text: str):
+        self._put("pages", page_key, text)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["total_bytes"] = self._total_bytes if self._total_bytes is not None else -1
+            stats["max_bytes"] = self.max_bytes
+        return stats
+
+    # --- Internals ---
+    def _entry_path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root_dir, kind, key[:2], f"{key}.txt")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _get(self, kind: str, key: str) -> Optional[str]:
+        counter = kind[:-1] # "documents" -> "document"
+        path = self._entry_path(kind, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path) # Mark as recently used for LRU eviction
+        except FileNotFoundError:
+            self._count(f"{counter}_misses")
+            return None
+        except OSError as read_err:
+            logger.warning(f"OCR cache read failed for {kind}/{key}: {read_err}")
+            self._count(f"{counter}_misses")
+            return None
+        self._count(f"{counter}_hits")
+        return text
+
+    def _put(self, kind: str, key: str, text: str):
+        path = self._entry_path(kind, key)
+        data = text.encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path) # Atomic: concurrent readers never see a partial entry
+        except OSError as write_err:
+            logger.warning(f"OCR cache write failed for {kind}/{key}: {write_err}")
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total_bytes()
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _iter_entries(self):
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for name in filenames:
+                if name.endswith(".txt"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue # Evicted by another process meanwhile
+                    yield path, st.st_size, st.st_mtime
+
+    def _scan_total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._iter_entries())
+
+    def _evict_locked(self):
+        """Deletes least recently used entries until the cache is back under 90% of max_bytes."""
+        entries = sorted(self._iter_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries) # Re-sync: other processes share the directory
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size; evicted += 1
+            except OSError:
+                pass
+        self._total_bytes = total
+        self._counters["evictions"] += evicted
+        logger.info(f"OCR cache evicted {evicted} entries; size now {total // 1024} KB (limit {self.max_bytes // 1024} KB).")
@@ -0,0 +1,87 @@
+# InsureDocsProject/backend/app/ocr_checkpoint.py
+import os
+import json
+import logging
+from typing import Dict, Optional
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+class PageCheckpoint:
+    """
+    Append-only per-page checkpoint of extraction output for one document.
+
+    The file is JSON lines: a header {"pdf_sha256": ...} followed by one
+    {"page": index, "section": text} line per completed page. Lines are appended as pages
+    finish, so if the process dies mid-document the next attempt resumes at the first
+    unfinished page. Completed pages are only reused while the PDF's SHA-256 is unchanged.
+    """
+
+    def __init__(self, path: str, pdf_sha256: str):
+        self.path = path
+        self.pdf_sha256 = pdf_sha256
+        self.completed: Dict[int, str] = {} # Pages loaded from a previous attempt (not appended ones)
+        self._f = None
+
+    @classmethod
+    def open(cls, path: str, pdf_sha256: str) -> "PageCheckpoint":
+        """Loads a matching checkpoint (if any) and opens it for appending further pages."""
+        checkpoint = cls(path, pdf_sha256)
+        if os.path.exists(path):
+            checkpoint._load()
+        if checkpoint.completed:
+            checkpoint._f = open(path, "a", encoding="utf-8")
+        else: # Nothing reusable: start a fresh file for this PDF version
+            checkpoint._f = open(path, "w", encoding="utf-8")
+            checkpoint._f.write(json.dumps({"pdf_sha256": pdf_sha256}) + "\n")
+            checkpoint._f.flush()
+        return checkpoint
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("pdf_sha256") != self.pdf_sha256:
+                    logger.info(f"Checkpoint {self.path} is for a different PDF version; discarding it.")
+                    return
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.completed[int(entry["page"])] = entry["section"]
+                    except (ValueError, KeyError):
+                        break # Torn final line from a crash mid-write; everything before it is good
+        except (OSError, ValueError) as load_err:
+            logger.warning(f"Unreadable checkpoint {self.path} ({load_err}); starting over.")
+            self.completed = {}
+
+    def record(self, page_index: int, section: str, durable: bool = True):
+        """Appends a completed page. durable=True fsyncs (worth it for expensive OCR pages)."""
+        if self._f is None:
+            return
+        self._f.write(json.dumps({"page": page_index, "section": section}) + "\n")
+        self._f.flush()
+        if durable:
+            os.fsync(self._f.fileno())
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def discard(self):
+        """Removes the checkpoint once the document's full output has been written."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def checkpoint_path_for(text_output_full_path: str) -> str:
+    """Checkpoint file kept next to the document's output text file."""
+    return f"{text_output_full_path}.ckpt.jsonl"
+
+def open_checkpoint(text_output_full_path: str, pdf_sha256: Optional[str]) -> Optional[PageCheckpoint]:
+    """Opens (or starts) the checkpoint for an output file; None when no PDF hash is available."""
+    if not pdf_sha256:
+        return None
+    return PageCheckpoint.open(checkpoint_path_for(text_output_full_path), pdf_sha256)
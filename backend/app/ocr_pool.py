@@ -0,0 +1,284 @@
+# InsureDocsProject/backend/app/ocr_pool.py
+import os
+import sys
+import queue
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+import fitz                 # PyMuPDF - workers open the PDF themselves (documents are not picklable)
+
+from . import memory_budget
+from .ocr_budget import WAIT_SLICE_SECONDS, ProcessingCancelled
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+# A page result is (page_text, error_message); exactly one of the two is meaningful.
+PageResult = Tuple[str, Optional[str]]
+
+# =====================================
+# Worker-side state and functions
+# (these run inside the pool's child processes)
+# =====================================
+_MAX_OPEN_DOCS_PER_WORKER = 8 # Pages of the documents OCR'd at once (OCR_CONCURRENT_DOCS) interleave in every worker
+PAGES_IN_FLIGHT_PER_WORKER = 2 # Pages per worker submitted ahead, shared by all documents using the pool
+WARM_UP_POLL_SECONDS = 0.1 # How often warm_up() checks for workers that finished their initializer
+_worker_open_docs: "OrderedDict[str, fitz.Document]" = OrderedDict()
+
+def _init_worker(torch_threads: int, pid_queue=None):
+    """
+    Pool initializer: reports this worker's pid to the parent, pins torch threads, preloads this
+    worker's own EasyOCR reader and runs one warm-up inference. With the "fork" start method the
+    reader was already loaded in the parent, so this just picks up the inherited instance (weights
+    shared copy-on-write, no second load); the parent never runs inference, so no torch/OpenMP
+    threads exist at fork time and the first inference happens here, in the child.
+    """
+    if pid_queue is not None:
+        pid_queue.put((os.getpid(), False)) # The parent tracks worker pids itself (RSS sampling, terminate)
+    try:
+        import torch
+        torch.set_num_threads(max(1, torch_threads))
+    except ImportError:
+        logger.warning("torch not importable in OCR worker; cannot set per-worker thread count.")
+    from . import ocr_utils
+    reader = ocr_utils.get_easyocr_reader() # Load the models now rather than on the first page
+    try:
+        ocr_utils.warm_up_reader(reader)
+    except Exception as warm_err: # Not fatal: the first page pays the set-up instead
+        logger.warning(f"OCR pool worker {os.getpid()}: warm-up inference failed: {warm_err}")
+    if pid_queue is not None:
+        pid_queue.put((os.getpid(), True)) # Warm: pool.warm_up() waits for every worker to get here
+    logger.info(f"OCR pool worker {os.getpid()} ready (torch threads={torch_threads}).")
+
+def _worker_ping() -> int:
+    """No-op task used to force worker start-up (model loading and warm-up inference) ahead of real traffic."""
+    return os.getpid()
+
+def _get_worker_doc(pdf_path: str) -> fitz.Document:
+    """Returns an open fitz.Document for pdf_path, reusing recently opened ones."""
+    doc = _worker_open_docs.get(pdf_path)
+    if doc is not None:
+        _worker_open_docs.move_to_end(pdf_path)
+        return doc
+    doc = fitz.open(pdf_path)
+    _worker_open_docs[pdf_path] = doc
+    while len(_worker_open_docs) > _MAX_OPEN_DOCS_PER_WORKER:
+        _, old_doc = _worker_open_docs.popitem(last=False)
+        try: old_doc.close()
+        except Exception: pass
+    return doc
+
+def _ocr_page_in_worker(pdf_path: str, page_index: int) -> PageResult:
+    """Runs OCR for a single page inside a worker. Errors are returned, not raised."""
+    from . import ocr_utils
+    try:
+        doc = _get_worker_doc(pdf_path)
+        return ocr_utils._ocr_page(ocr_utils.get_easyocr_reader(), doc[page_index]), None
+    except Exception as page_err:
+        return "", str(page_err)
+    finally:
+        memory_budget.over_limit() # Over the RSS budget: drop MuPDF's store and trim the heap (the parent recycles the pool if that is not enough)
+
+# =====================================
+# Pool (parent side)
+# =====================================
+class PoolClosed(RuntimeError):
+    """The pool was shut down or terminated (recycled, or another document's page overran its budget) while a document still had pages in it."""
+
+def _pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        return True # os.kill(pid, 0) would terminate it there; exited workers' RSS just reads as 0
+    try:
+        os.kill(pid, 0) # Signal 0: existence check only
+    except ProcessLookupError:
+        return False
+    except OSError: # Exists but not ours to signal (pid reused); treat as gone
+        return False
+    return True
+
+class OCRWorkerPool:
+    """
+    Process-pool OCR engine. Each worker process holds its own preloaded EasyOCR reader;
+    a document's pages are fanned out across workers and yielded back in page order (iter_document).
+
+    Several documents can use the pool at once (one thread each, see ocr_utils.ocr_concurrent_documents),
+    so short documents still keep every worker busy. Pages in flight are capped pool-wide at
+    num_workers * PAGES_IN_FLIGHT_PER_WORKER and split evenly between the documents using the pool.
+    """
+
+    def __init__(self, num_workers: int, torch_threads: int = 1, start_method: str = "spawn", max_tasks_per_child: int = 0):
+        self.num_workers = max(1, num_workers)
+        self.torch_threads = max(1, torch_threads)
+        logger.info(f"Starting OCR worker pool: workers={self.num_workers}, torch_threads/worker={self.torch_threads}, start_method={start_method}, "
+                    f"max_tasks_per_child={max_tasks_per_child or 'unlimited'}")
+        if start_method == "fork":
+            # Load the weights once here; forked children inherit them and share the pages copy-on-write.
+            # (Tensor storage is never written during inference, so the pages stay shared.)
+            # Loading only: the warm-up inference runs in each child (_init_worker), never in this parent.
+            from . import ocr_utils
+            ocr_utils.get_easyocr_reader()
+        executor_kwargs = {}
+        if max_tasks_per_child > 0:
+            if start_method == "fork":
+                logger.warning("OCR pool: max_tasks_per_child is not supported with the 'fork' start method; workers are not replaced.")
+            else:
+                executor_kwargs["max_tasks_per_child"] = max_tasks_per_child # Fresh process (and heap) every N pages
+        self._slots = threading.Semaphore(self.num_workers * PAGES_IN_FLIGHT_PER_WORKER) # Released as each page finishes
+        self._active_documents = 0
+        self._active_lock = threading.Lock()
+        self._closed = False
+        context = multiprocessing.get_context(start_method)
+        # Every worker (including replacements after max_tasks_per_child) announces its pid here
+        self._pid_queue = context.Queue()
+        self._pids: List[int] = []
+        self._ready_pids: Set[int] = set()
+        self._pids_lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.torch_threads, self._pid_queue),
+            **executor_kwargs,
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def iter_document(self, pdf_path: str, page_indices: Iterable[int], budget=None) -> Iterator[Tuple[int, PageResult]]:
+        """
+        OCRs the given pages of one document, yielding (page_index, result) in page order as each page finishes.
+        Only a small window of pages is submitted ahead - this document's share of the pool-wide
+        num_workers * PAGES_IN_FLIGHT_PER_WORKER - so a huge document never has many pages queued or holding results.
+        budget: Optional ocr_budget.OCRBudget; its ProcessingCancelled propagates (terminate() the pool then).
+        Raises PoolClosed if the pool is shut down or terminated under this document (the caller re-dispatches the rest).
+        """
+        remaining = sorted(set(page_indices))
+        next_page = 0
+        futures: "OrderedDict[int, Future]" = OrderedDict()
+        closed: Optional[PoolClosed] = None # Set once the pool closes under us: stop submitting, drain what finished
+        def submit_more():
+            nonlocal next_page, closed
+            with self._active_lock:
+                window = max(1, self.num_workers * PAGES_IN_FLIGHT_PER_WORKER // max(1, self._active_documents))
+            while closed is None and next_page < len(remaining) and len(futures) < window:
+                page_index = remaining[next_page]
+                try:
+                    if not self._acquire_slot(wait=not futures, budget=budget):
+                        return # Other documents' pages fill the pool; top up after the next result
+                    try:
+                        future = self._executor.submit(_ocr_page_in_worker, pdf_path, page_index)
+                    except RuntimeError: # Shut down (or broken) since this document started
+                        self._slots.release()
+                        if not self._closed:
+                            raise
+                        raise PoolClosed(f"OCR pool closed before page index {page_index} was submitted")
+                except PoolClosed as closed_err:
+                    closed = closed_err
+                    return
+                future.add_done_callback(lambda _: self._slots.release())
+                futures[page_index] = future
+                next_page += 1
+
+        with self._active_lock:
+            self._active_documents += 1
+        try:
+            submit_more()
+            while futures:
+                page_index, future = futures.popitem(last=False)
+                try:
+                    result = budget.wait_future(page_index, future) if budget is not None else future.result()
+                except ProcessingCancelled:
+                    for other in futures.values(): other.cancel()
+                    raise
+                except Exception as pool_err: # e.g. BrokenProcessPool if a worker died
+                    if self._closed or isinstance(pool_err, CancelledError):
+                        closed = closed or PoolClosed(f"OCR pool closed while page index {page_index} was in it")
+                        continue # Not yielded: the caller re-dispatches it
+                    logger.error(f"OCR pool failure on page index {page_index}: {pool_err}")
+                    result = ("", f"OCR worker failure: {pool_err}")
+                submit_more()
+                yield page_index, result
+            if closed is not None:
+                raise closed
+        finally:
+            with self._active_lock:
+                self._active_documents -= 1
+
+    def _acquire_slot(self, wait: bool, budget=None) -> bool:
+        """Takes one pool-wide in-flight slot; waits for one (checking the budget) only when wait is set."""
+        if not wait:
+            return self._slots.acquire(blocking=False)
+        while not self._slots.acquire(timeout=WAIT_SLICE_SECONDS):
+            if budget is not None:
+                budget.check()
+            if self._closed:
+                raise PoolClosed("OCR pool closed while waiting to submit pages")
+        return True
+
+    def warm_up(self, timeout: Optional[float] = None) -> List[int]:
+        """
+        Starts every worker (running the initializer: model loading and warm-up inference) and waits
+        until all of them are warm - not just the ones that happened to answer a ping.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pings = [self._executor.submit(_worker_ping) for _ in range(self.num_workers)] # One submit per worker to start
+        for ping in pings:
+            ping.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+        while True:
+            self.worker_pids()
+            with self._pids_lock:
+                pids = sorted(self._ready_pids)
+            if len(pids) >= self.num_workers:
+                break
+            if self._closed:
+                raise PoolClosed("OCR pool closed during warm-up")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Only {len(pids)} of {self.num_workers} OCR pool workers warm after {timeout}s")
+            time.sleep(WARM_UP_POLL_SECONDS)
+        logger.info(f"OCR worker pool warm: worker pids {pids}")
+        return pids
+
+    def worker_pids(self) -> List[int]:
+        """Pids of the pool's live worker processes (as reported by the workers' initializer)."""
+        with self._pids_lock:
+            while True:
+                try:
+                    pid, ready = self._pid_queue.get_nowait()
+                except (queue.Empty, OSError, ValueError): # Nothing new (or the queue is already closed)
+                    break
+                if ready:
+                    self._ready_pids.add(pid)
+                else:
+                    self._pids.append(pid)
+            self._pids = [pid for pid in self._pids if _pid_alive(pid)] # Drop workers that exited / were replaced
+            self._ready_pids.intersection_update(self._pids)
+            return list(self._pids)
+
+    def max_worker_rss(self) -> int:
+        """Largest resident set size among the worker processes, in bytes."""
+        return max((memory_budget.rss_bytes(pid) for pid in self.worker_pids()), default=0)
+
+    def terminate(self):
+        """Kills the worker processes (e.g. one is stuck on a page past its budget) and shuts the pool down."""
+        self._closed = True # Before the kill: documents losing pages re-dispatch them instead of failing them
+        pids = self.worker_pids()
+        logger.warning(f"Terminating OCR worker pool processes {pids}...")
+        if not pids:
+            logger.warning("OCR pool: no worker pids reported; nothing to terminate, shutting the pool down only.")
+        for pid in pids:
+            try: os.kill(pid, signal.SIGTERM)
+            except OSError: pass # Already gone
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = True):
+        logger.info("Shutting down OCR worker pool...")
+        self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._pid_queue.close()
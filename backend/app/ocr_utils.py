@@ -1,13 +1,22 @@
 # InsureDocsProject/backend/app/ocr_utils.py
 import os
 import fitz                 # PyMuPDF - For opening PDF and rendering pages
-from PIL import Image         # Pillow - For handling image data from PyMuPDF
-import io                   # For handling image bytes in memory
 import traceback            # For error logging
 import logging              # Use standard logging
 import easyocr              # <<<--- USING EasyOCR, NOT pytesseract
 import threading            # For lazy init lock
-from typing import Optional
+import numpy as np          # Pages are handed to EasyOCR as pixel arrays
+from collections import OrderedDict
+from concurrent.futures import Future, wait as futures_wait
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .ocr_cache import OCRResultCache, sha256_file
+from .ocr_checkpoint import open_checkpoint
+from .ocr_budget import OCRBudget, PageTimedOut, ProcessingCancelled, WAIT_SLICE_SECONDS
+from .ocr_batcher import OCRBatcher
+from .memory_budget import MB, MemoryMonitor, release_page_caches
+from . import text_layer
+from .page_render import DEFAULT_OCR_DPI, plan_render, render_page
 
 # --- Get Logger ---
 logger = logging.getLogger(__name__)
@@ -52,6 +61,195 @@ def get_easyocr_reader():
         raise RuntimeError("EasyOCR Reader is unavailable (failed initialization).")
     return _easyocr_reader
 
+# --- Startup Warm-up / Readiness ---
+_ocr_models_ready = threading.Event()
+_ocr_warm_up_error: Optional[str] = None
+
+WARM_UP_IMAGE_SHAPE = (64, 256) # Blank strip: exercises the detector once
+
+def warm_up_reader(reader):
+    """Runs one tiny inference so lazy kernel/allocator set-up happens now, not on page 1."""
+    reader.readtext(np.full(WARM_UP_IMAGE_SHAPE, 255, dtype=np.uint8), detail=0)
+
+def warm_up_ocr_models():
+    """
+    Loads the OCR models before traffic arrives (opt-in via OCR_PRELOAD_MODELS).
+
+    - In-process OCR: the reader is loaded here and warmed up with one tiny inference (warm_up_reader).
+    - An OCR pool: every worker loads (spawn) or inherits (fork) the reader and runs the warm-up inference
+      itself (ocr_pool._init_worker); we wait until the workers are up. With "fork" the parent only loads
+      the weights for the children to share - running inference here first would start torch's OpenMP
+      threads before the fork, which can deadlock the children.
+    Readiness (ocr_models_ready) is only signalled once this has finished.
+    """
+    global _ocr_warm_up_error
+    try:
+        logger.info("Warming up OCR models...")
+        pool = get_ocr_pool() # A "fork" pool loads the weights in this process first (no inference)
+        if pool is None:
+            warm_up_reader(get_easyocr_reader())
+        else:
+            pool.warm_up()
+        _ocr_warm_up_error = None
+        _ocr_models_ready.set()
+        logger.info("OCR models loaded and warm.")
+    except Exception as warm_err:
+        _ocr_warm_up_error = str(warm_err)
+        logger.critical(f"OCR model warm-up failed: {warm_err}", exc_info=True)
+
+def ocr_readiness() -> Tuple[bool, str]:
+    """Returns (ready, state) for readiness probes: ready immediately unless warm-up is enabled."""
+    if not getattr(settings, "OCR_PRELOAD_MODELS", False) or _ocr_models_ready.is_set():
+        return True, "ready"
+    if _ocr_warm_up_error is not None:
+        return False, f"warm_up_failed: {_ocr_warm_up_error}"
+    return False, "warming_up"
+
+# --- OCR Worker Pool (Lazy and Thread-Safe) ---
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool():
+    """Returns the shared OCR process pool, or None when OCR_POOL_WORKERS is 0 (in-process OCR)."""
+    global _ocr_pool
+    workers = getattr(settings, "OCR_POOL_WORKERS", 0)
+    if workers <= 0:
+        return None
+    if _ocr_pool is None or _ocr_pool.closed:
+        with _ocr_pool_lock: # Waits out a terminate/recycle in progress
+            if _ocr_pool is None or _ocr_pool.closed:
+                from .ocr_pool import OCRWorkerPool # Local import: ocr_pool imports this module
+                _ocr_pool = OCRWorkerPool(
+                    num_workers=workers,
+                    torch_threads=getattr(settings, "OCR_TORCH_THREADS_PER_WORKER", 1),
+                    start_method=getattr(settings, "OCR_POOL_START_METHOD", "spawn"),
+                    max_tasks_per_child=getattr(settings, "OCR_POOL_MAX_TASKS_PER_CHILD", 0),
+                )
+    return _ocr_pool
+
+def discard_easyocr_reader():
+    """Drops the shared reader (a page thread abandoned past its budget may still be using it); the next OCR task loads a fresh one."""
+    global _easyocr_reader
+    with _easyocr_lock:
+        _easyocr_reader = None
+
+def terminate_ocr_pool():
+    """Kills the OCR pool's processes (a page overran its budget or was cancelled); the next OCR task starts a new pool."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None:
+            _ocr_pool.terminate()
+            _ocr_pool = None
+
+def ocr_pool_worker_pids() -> List[int]:
+    """Pids of the OCR pool's worker processes (empty if no pool is running)."""
+    pool = _ocr_pool
+    return pool.worker_pids() if pool is not None else []
+
+def recycle_ocr_pool_if_needed(limit_bytes: Optional[int]) -> bool:
+    """Replaces the OCR pool (between documents) if a worker grew past limit_bytes. Returns True if it was recycled."""
+    global _ocr_pool
+    if limit_bytes is None:
+        return False
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            return False
+        worker_rss = _ocr_pool.max_worker_rss()
+        if worker_rss <= limit_bytes:
+            return False
+        logger.warning(f"OCR pool worker RSS {worker_rss // MB} MB over the {limit_bytes // MB} MB budget; recycling the pool.")
+        _ocr_pool.shutdown()
+        _ocr_pool = None
+    return True
+
+def shutdown_ocr_pool():
+    """Stops the OCR process pool (if it was started)."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown()
+            _ocr_pool = None
+
+# --- OCR Batcher (Lazy and Thread-Safe; OCR_BATCHED) ---
+DEFAULT_BATCHED_CONCURRENT_DOCS = 4 # OCR_CONCURRENT_DOCS=0 in batched mode: documents whose pages can share batches
+_ocr_batcher = None
+_ocr_batcher_lock = threading.Lock()
+
+def get_ocr_batcher() -> OCRBatcher:
+    """Returns the process-wide batcher that groups pages of all documents OCR'd in batched mode."""
+    global _ocr_batcher
+    if _ocr_batcher is None:
+        with _ocr_batcher_lock:
+            if _ocr_batcher is None:
+                _ocr_batcher = OCRBatcher(
+                    get_easyocr_reader,
+                    budget_bytes=getattr(settings, "OCR_BATCH_MEMORY_MB", 1024) * MB,
+                    recognizer_batch_size=getattr(settings, "OCR_RECOGNIZER_BATCH_SIZE", 16),
+                    max_wait_seconds=getattr(settings, "OCR_BATCH_MAX_WAIT_SECONDS", 2.0),
+                )
+    return _ocr_batcher
+
+def shutdown_ocr_batcher():
+    """Stops the batching thread (if it was started) after the pages already submitted."""
+    global _ocr_batcher
+    with _ocr_batcher_lock:
+        if _ocr_batcher is not None:
+            _ocr_batcher.close()
+            _ocr_batcher = None
+
+def ocr_concurrent_documents() -> int:
+    """
+    OCR jobs a worker runs at once (one thread each). Several documents only help when their pages
+    share something - the OCR process pool, or the batcher in OCR_BATCHED mode - so plain in-process
+    OCR runs one at a time. With a pool the default is one document per pool process, so even
+    single-page documents keep every process busy.
+    """
+    pool_workers = getattr(settings, "OCR_POOL_WORKERS", 0)
+    if pool_workers <= 0 and not getattr(settings, "OCR_BATCHED", False):
+        return 1
+    configured = getattr(settings, "OCR_CONCURRENT_DOCS", 0)
+    if configured > 0:
+        return configured
+    return pool_workers if pool_workers > 0 else DEFAULT_BATCHED_CONCURRENT_DOCS
+
+# --- OCR Result Cache (Lazy and Thread-Safe) ---
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+def get_ocr_cache() -> Optional[OCRResultCache]:
+    """Returns the content-addressed OCR result cache, or None when OCR_CACHE_MAX_MB is 0."""
+    global _ocr_cache
+    max_mb = getattr(settings, "OCR_CACHE_MAX_MB", 0)
+    if max_mb <= 0:
+        return None
+    if _ocr_cache is None:
+        with _ocr_cache_lock:
+            if _ocr_cache is None:
+                cache_dir = getattr(settings, "OCR_CACHE_DIR", "") or os.path.join(UPLOAD_DIRECTORY, "ocr_cache")
+                _ocr_cache = OCRResultCache(cache_dir, max_mb * 1024 * 1024)
+    return _ocr_cache
+
+def get_ocr_cache_metrics() -> Dict[str, object]:
+    """Hit/miss/eviction counters of this process's OCR cache (plus its size limit), or disabled."""
+    cache = get_ocr_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+def _document_settings_fingerprint() -> str:
+    """
+    Settings that change a document's output text for the same PDF bytes: rendering (mode, DPI,
+    crop planning) and the text layer / OCR page split. Part of the document cache key, so changing
+    any of them re-extracts instead of serving text produced under the old settings.
+    """
+    if getattr(settings, "OCR_ADAPTIVE_RENDER", False):
+        render = (f"adaptive:{settings.OCR_MIN_DPI}-{settings.OCR_MAX_DPI}dpi:"
+                  f"{settings.OCR_TARGET_TEXT_HEIGHT_PX}px:{settings.OCR_MAX_PAGE_MEGAPIXELS}mp")
+    else:
+        render = f"fixed:{DEFAULT_OCR_DPI}dpi"
+    return (f"{render}|gray={getattr(settings, 'OCR_RENDER_GRAYSCALE', False)}"
+            f"|layer={text_layer.MIN_TEXT_LAYER_CHARS}:{getattr(settings, 'TEXT_LAYER_SAMPLE_PAGES', 5)}")
+
 # --- Helper Functions ---
 def get_full_pdf_path(stored_filename: str) -> str:
     """Constructs the full path to the stored PDF file."""
@@ -74,76 +272,304 @@ def get_output_text_path(stored_pdf_filename: str) -> str:
     return os.path.join(TEXT_OUTPUT_DIR, txt_filename)
 
 
-# --- Internal function to try text layer extraction ---
-def _try_text_layer_extraction(doc_id: int, doc: fitz.Document) -> Optional[str]:
-    """Attempts text layer extraction using PyMuPDF."""
+# --- Per-page engine labels (written into the "--- Page N (...) ---" markers) ---
+ENGINE_TEXT_LAYER = "Text Layer"
+ENGINE_EASYOCR = "EasyOCR"
+
+def _page_section(page_num: int, engine: str, text: str = "") -> str:
+    """Formats one page of output text with a marker recording the engine that produced it."""
+    return f"\n--- Page {page_num} ({engine}) ---\n{text}\n" if text else f"\n--- Page {page_num} ({engine}) ---\n"
+
+def _is_error_section(section: str) -> bool:
+    """True if a formatted page section is an error marker rather than extracted text."""
+    return " ERROR" in section.split(" ---", 1)[0]
+
+# --- Internal function for per-page text layer extraction ---
+def _try_text_layer_extraction(
+    doc_id: int,
+    doc: fitz.Document,
+    page_indices: Optional[Sequence[int]] = None,
+    known_texts: Optional[Dict[int, str]] = None,
+    check_fonts: bool = True,
+    budget: Optional[OCRBudget] = None,
+) -> Dict[int, Optional[str]]:
+    """
+    Extracts the PyMuPDF text layer page by page.
+
+    Args:
+        page_indices: 0-based pages to examine (default: every page).
+        known_texts: Text already extracted for some pages (e.g. while sampling); not re-read.
+        check_fonts: Skip get_text on pages without fonts (worth it unless the doc is known digital).
+        budget: Time budget / cancellation; ProcessingCancelled propagates.
+
+    Returns: {page_index: page text} if its text layer is usable,
+             or None if the page is deficient (or errored) and must be OCR'd.
+    """
     logger.info(f"[Task {doc_id}] Attempting PyMuPDF text layer extraction...")
-    full_text = ""
-    try:
-        num_pages = len(doc)
-        sufficient_pages = 0
-        min_chars_heuristic = 30 # Adjust heuristic as needed
-        for i, page in enumerate(doc):
-            try:
+    if page_indices is None:
+        page_indices = range(len(doc))
+    known_texts = known_texts or {}
+    page_texts: Dict[int, Optional[str]] = {}
+    for i in page_indices:
+        try:
+            if i in known_texts:
+                text = known_texts[i]
+            else:
+                page = doc[i]
+                if check_fonts and not text_layer.page_has_fonts(page): # No fonts -> no text layer; skip extraction
+                    page_texts[i] = None
+                    continue
                 # Extract text - using "text" preserves basic layout
-                text = page.get_text("text").strip()
-                if len(text) > min_chars_heuristic:
-                    sufficient_pages += 1
-                full_text += f"\n--- Page {i+1} (Text Layer) ---\n{text}\n"
-            except Exception as page_err:
-                 logger.warning(f"[Task {doc_id}] Error extracting text layer from page {i+1}: {page_err}")
-                 full_text += f"\n--- Page {i+1} (TEXT EXTRACT ERROR) ---\n"
-
-        # Determine if enough text was likely found
-        if num_pages > 0 and (sufficient_pages / num_pages) > 0.5:
-            logger.info(f"[Task {doc_id}] Text layer deemed sufficient ({sufficient_pages}/{num_pages} pages).")
-            return full_text
-        else:
-            logger.info(f"[Task {doc_id}] Text layer insufficient ({sufficient_pages}/{num_pages} pages). Will attempt OCR.")
-            return None
-    except Exception as e:
-        logger.warning(f"[Task {doc_id}] Error during overall text layer extraction: {e}. Will attempt OCR.", exc_info=False)
-        return None
+                text = (budget.run_page(i, page.get_text, "text") if budget is not None else page.get_text("text")).strip()
+            page_texts[i] = text if len(text) > text_layer.MIN_TEXT_LAYER_CHARS else None
+        except ProcessingCancelled:
+            raise
+        except Exception as page_err:
+            logger.warning(f"[Task {doc_id}] Error extracting text layer from page {i+1}: {page_err}. Page will be OCR'd.")
+            page_texts[i] = None
+    sufficient_pages = sum(1 for t in page_texts.values() if t is not None)
+    logger.info(f"[Task {doc_id}] Text layer usable on {sufficient_pages}/{len(page_texts)} pages.")
+    return page_texts
+
+# --- Page rendering for OCR (fixed 300 DPI, or adaptive DPI + content crop) ---
+def _render_for_ocr(page: fitz.Page):
+    """Renders a page for OCR, planning DPI and crop first when OCR_ADAPTIVE_RENDER is on."""
+    grayscale = getattr(settings, "OCR_RENDER_GRAYSCALE", False)
+    if not getattr(settings, "OCR_ADAPTIVE_RENDER", False):
+        return render_page(page, dpi=DEFAULT_OCR_DPI, grayscale=grayscale)
+    plan = plan_render(
+        page,
+        min_dpi=settings.OCR_MIN_DPI,
+        max_dpi=settings.OCR_MAX_DPI,
+        target_text_px=settings.OCR_TARGET_TEXT_HEIGHT_PX,
+        max_pixels=settings.OCR_MAX_PAGE_MEGAPIXELS * 1_000_000,
+    )
+    logger.info(f"  [Page {page.number + 1}] Render plan: {plan.describe()}")
+    return render_page(page, dpi=plan.dpi, grayscale=grayscale, clip=plan.clip)
+
+# --- Single page OCR (shared by the in-process loop and the OCR worker pool) ---
+def _ocr_page(reader, page: fitz.Page) -> str:
+    """Renders one PDF page and returns the EasyOCR text for it."""
+    # Render straight to a NumPy view over the pixmap samples (no PNG encode/decode round trip)
+    image = _render_for_ocr(page)
+    try:
+        # Identical rendered pixels -> identical OCR text: consult the page cache first
+        cache = get_ocr_cache()
+        page_key = cache.page_key(image) if cache is not None else None
+        if page_key is not None:
+            cached_text = cache.get_page(page_key)
+            if cached_text is not None:
+                logger.debug(f"  [Page {page.number + 1}] OCR cache hit.")
+                return cached_text
+        # Read text, joining into paragraphs if possible, detail=0 just gets text list
+        results = reader.readtext(image.as_bgr(), detail=0, paragraph=True)
+    finally:
+        image.release() # Free the pixmap now rather than whenever the array view is collected
+        release_page_caches()
+    page_text = "\n".join(results) # Combine results into a single string for the page
+    if page_key is not None:
+        cache.put_page(page_key, page_text)
+    return page_text
+
+# --- Batched OCR (detector and recognizer see many pages per forward pass) ---
+def _iter_ocr_pages_batched(pages: Iterable[Tuple[Hashable, fitz.Page]], budget: Optional[OCRBudget] = None) -> Iterator[Tuple[Hashable, Tuple[str, Optional[str]]]]:
+    """
+    OCRs pages through the process-wide OCRBatcher (get_ocr_batcher), whose batches also take pages
+    of other documents being OCR'd at the same time. Only pages of identical rendered size share a
+    batch, so the text is the same as on the per-page path.
+
+    budget: Cancellation / document deadline, checked between pages and while waiting for results.
+
+    Yields: (key, (page_text, error_message)) as soon as each page's result is known
+            (not necessarily in input order).
+    """
+    batcher = get_ocr_batcher()
+    cache = get_ocr_cache()
+    submitted: "OrderedDict[Hashable, Tuple[Future, Optional[str]]]" = OrderedDict() # key -> (future, OCR cache key)
+
+    def collect(wait: bool):
+        """Pops finished pages (with wait=True, first waits for the oldest one) and stores their text in the cache."""
+        if wait:
+            oldest, _ = next(iter(submitted.values()))
+            while not futures_wait([oldest], timeout=WAIT_SLICE_SECONDS).done:
+                if budget is not None:
+                    budget.check()
+        for key in [key for key, (future, _) in submitted.items() if future.done()]:
+            future, page_key = submitted.pop(key)
+            result = future.result()
+            if page_key is not None and result[1] is None:
+                cache.put_page(page_key, result[0])
+            yield key, result
+
+    try:
+        with batcher.producing():
+            for key, page in pages:
+                if budget is not None:
+                    budget.check()
+                try:
+                    image = _render_for_ocr(page)
+                except Exception as render_err:
+                    yield key, ("", str(render_err))
+                    continue
+                page_key = cache.page_key(image) if cache is not None else None
+                if page_key is not None:
+                    cached_text = cache.get_page(page_key)
+                    if cached_text is not None: # Repeated page: no OCR needed
+                        image.release()
+                        yield key, (cached_text, None)
+                        continue
+                submitted[key] = (batcher.submit(image), page_key) # Blocks while the batch memory budget is full
+                yield from collect(wait=False)
+        while submitted:
+            yield from collect(wait=True)
+    finally:
+        for future, _ in submitted.values():
+            future.cancel() # Stopped early: pages not yet in a batch are dropped
 
 # --- Internal function for EasyOCR processing ---
-def _perform_easyocr_on_doc(doc_id: int, doc: fitz.Document) -> str:
-    """Performs EasyOCR on images extracted from PDF pages via PyMuPDF."""
+def _ocr_result_section(doc_id: int, page_index: int, page_text: str, page_error: Optional[str]) -> str:
+    """Formats an OCR (text, error) result as a page section, logging failures."""
+    if page_error is not None:
+        logger.warning(f"[Task {doc_id} EasyOCR] WARNING: Error processing page {page_index + 1} with EasyOCR: {page_error}")
+        return _page_section(page_index + 1, f"EASYOCR ERROR: {page_error}")
+    return _page_section(page_index + 1, ENGINE_EASYOCR, page_text)
+
+def _iter_easyocr_on_doc(doc_id: int, doc: fitz.Document, page_indices: Optional[Sequence[int]] = None, batched: bool = False,
+                         budget: Optional[OCRBudget] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Performs EasyOCR on images rendered from PDF pages via PyMuPDF.
+
+    Args:
+        page_indices: 0-based pages to OCR (default: every page).
+        batched: Run pages through EasyOCR in memory-bounded batches instead of one at a time.
+        budget: Time budget / cancellation. A page over its limit is yielded as an error section,
+                then PageTimedOut is raised (batched mode only checks the budget between pages).
+
+    Yields: (page_index, formatted page section) for each OCR'd page as soon as it is done
+            (not necessarily in page order).
+    """
+    if page_indices is None:
+        page_indices = range(len(doc))
+    page_indices = sorted(page_indices)
     logger.info(f"[Task {doc_id}] Starting EasyOCR processing...")
-    full_text_ocr = ""
+    logger.info(f"[Task {doc_id} EasyOCR] Processing {len(page_indices)} of {len(doc)} pages.")
+
+    # Fan pages out across the OCR process pool when one is configured
+    pool = get_ocr_pool()
+    if pool is not None:
+        from .ocr_pool import PoolClosed # Local import: ocr_pool imports this module
+        remaining = list(page_indices)
+        redispatched = False
+        while remaining:
+            pool = get_ocr_pool() # A fresh pool after a PoolClosed
+            logger.info(f"[Task {doc_id} EasyOCR] Dispatching {len(remaining)} pages to OCR pool ({pool.num_workers} workers).")
+            try:
+                for page_index, (page_text, page_error) in pool.iter_document(doc.name, remaining, budget=budget):
+                    remaining.remove(page_index)
+                    yield page_index, _ocr_result_section(doc_id, page_index, page_text, page_error)
+            except ProcessingCancelled as cancel:
+                terminate_ocr_pool() # Pool processes may still be busy on the abandoned pages (other documents re-dispatch theirs)
+                if isinstance(cancel, PageTimedOut):
+                    yield cancel.page_index, _page_section(cancel.page_index + 1, f"EASYOCR ERROR: {cancel}")
+                raise
+            except PoolClosed as closed:
+                # Recycled, or terminated for another document's page: re-dispatch once to the new pool
+                if redispatched:
+                    for page_index in remaining:
+                        yield page_index, _ocr_result_section(doc_id, page_index, "", f"OCR worker failure: {closed}")
+                    return
+                logger.warning(f"[Task {doc_id} EasyOCR] {closed}; re-dispatching {len(remaining)} pages.")
+                redispatched = True
+        return
+
     reader = get_easyocr_reader() # Initialize reader if this is the first OCR task
-    num_pages = len(doc)
-    logger.info(f"[Task {doc_id} EasyOCR] Processing {num_pages} pages.")
+    if batched:
+        logger.info(f"[Task {doc_id} EasyOCR] Using batched inference (budget {getattr(settings, 'OCR_BATCH_MEMORY_MB', 1024)} MB).")
+        for page_index, (page_text, page_error) in _iter_ocr_pages_batched(((page_index, doc[page_index]) for page_index in page_indices), budget=budget):
+            yield page_index, _ocr_result_section(doc_id, page_index, page_text, page_error)
+            if budget is not None:
+                budget.check()
+        return
 
-    for i, page in enumerate(doc):
-        page_num = i + 1
-        logger.debug(f"[Task {doc_id} EasyOCR] Getting image for page {page_num}/{num_pages}...")
+    for page_index in page_indices:
+        page_num = page_index + 1
+        logger.debug(f"[Task {doc_id} EasyOCR] Getting image for page {page_num}/{len(doc)}...")
         try:
-            # Render page to image bytes via PyMuPDF
-            pix = page.get_pixmap(dpi=300) # 300 DPI recommended for OCR
-            img_data = pix.tobytes("png") # PNG is lossless
-
-            # Perform OCR with EasyOCR
             logger.debug(f"  [Page {page_num}] Running EasyOCR...")
-            # Read text, joining into paragraphs if possible, detail=0 just gets text list
-            results = reader.readtext(img_data, detail=0, paragraph=True)
-            page_text = "\n".join(results) # Combine results into a single string for the page
-            full_text_ocr += f"\n--- Page {page_num} (EasyOCR) ---\n{page_text}\n"
+            page_text = budget.run_page(page_index, _ocr_page, reader, doc[page_index]) if budget is not None else _ocr_page(reader, doc[page_index])
             logger.debug(f"  [Page {page_num}] EasyOCR successful.")
+            yield page_index, _page_section(page_num, ENGINE_EASYOCR, page_text)
 
+        except ProcessingCancelled as cancel:
+            if budget.abandoned:
+                discard_easyocr_reader() # The abandoned page thread is still using it
+            if isinstance(cancel, PageTimedOut):
+                yield page_index, _page_section(page_num, f"EASYOCR ERROR: {cancel}")
+            raise
         except Exception as page_err:
             logger.warning(f"[Task {doc_id} EasyOCR] WARNING: Error processing page {page_num} with EasyOCR: {page_err}", exc_info=True)
-            full_text_ocr += f"\n--- Page {page_num} (EASYOCR ERROR: {str(page_err)}) ---\n"
+            yield page_index, _page_section(page_num, f"EASYOCR ERROR: {str(page_err)}")
 
-    return full_text_ocr
+# --- Streaming output writer ---
+class _StreamingPageWriter:
+    """
+    Appends page sections to the output file as soon as they are produced.
+
+    Pages may arrive out of order (text layer pages, pool/batch results); they are held
+    only until every earlier page has been written, so the file is always in page order
+    and memory stays bounded by the out-of-order window rather than the document size.
+    """
+
+    def __init__(self, f, pages_total: int, progress_callback: Optional[Callable[[int, int], None]] = None,
+                 memory: Optional[MemoryMonitor] = None):
+        self._f = f
+        self.pages_total = pages_total
+        self.pages_done = 0
+        self.had_errors = False
+        self.added_pages: Set[int] = set()
+        self._next_page = 0
+        self._pending: Dict[int, str] = {}
+        self._progress_callback = progress_callback
+        self._memory = memory # Sampled (and the RSS budget enforced) after every page
+        if progress_callback:
+            progress_callback(0, pages_total)
+
+    def add(self, page_index: int, section: str):
+        self.added_pages.add(page_index)
+        self._pending[page_index] = section
+        self.had_errors = self.had_errors or _is_error_section(section)
+        while self._next_page in self._pending:
+            self._f.write(self._pending.pop(self._next_page))
+            self._next_page += 1
+        self._f.flush() # Make progress visible on disk, not just in the buffer
+        self.pages_done += 1
+        if self._memory is not None:
+            self._memory.sample()
+        if self._progress_callback:
+            self._progress_callback(self.pages_done, self.pages_total)
 
 # --- Main Exposed Function ---
-def perform_text_extract_or_ocr(doc_id: int, pdf_full_path: str, text_output_full_path: str) -> str:
+def perform_text_extract_or_ocr(
+    doc_id: int,
+    pdf_full_path: str,
+    text_output_full_path: str,
+    batched: Optional[bool] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    budget: Optional[OCRBudget] = None,
+    memory: Optional[MemoryMonitor] = None,
+) -> str:
     """
-    Extracts text from PDF: Tries PyMuPDF text layer first, falls back to EasyOCR if needed.
-    Saves the resulting text to text_output_full_path.
+    Extracts text from PDF page by page: pages with a usable PyMuPDF text layer use it,
+    only the remaining pages are rendered and OCR'd with EasyOCR.
+    Each page is appended to text_output_full_path as soon as it (and all earlier pages) is done.
+    batched: OCR pages in batches (default: settings.OCR_BATCHED). Output text is unchanged.
+    progress_callback: Called as (pages_done, pages_total) whenever a page completes.
+    budget: Per-page / per-document time budget and cancellation flag (default: none).
+    memory: Records peak RSS and enforces the worker's RSS budget after each page (default: none).
 
     Returns: Full path to the output text file on success.
-    Raises: Exception on critical failure.
+    Raises: ocr_budget.ProcessingCancelled if the budget ran out or processing was cancelled;
+            Exception on other critical failure.
     """
     logger.info(f"[Task {doc_id}] Starting hybrid text extraction/OCR for: {pdf_full_path}")
     if not os.path.exists(pdf_full_path):
@@ -151,36 +577,99 @@ def perform_text_extract_or_ocr(doc_id: int, pdf_full_path: str, text_output_ful
         raise FileNotFoundError(f"Input PDF not found: {pdf_full_path}")
 
     doc: Optional[fitz.Document] = None
-    final_text = ""
-    extracted_from_layer = False
+    checkpoint = None
+    if batched is None:
+        batched = getattr(settings, "OCR_BATCHED", False)
 
     try:
-        doc = fitz.open(pdf_full_path) # Open PDF document
+        # Step 0: A byte-identical PDF seen before? Reuse its text and skip everything else
+        cache = get_ocr_cache()
+        use_checkpoints = getattr(settings, "OCR_CHECKPOINTS_ENABLED", True)
+        file_sha256 = sha256_file(pdf_full_path) if (cache is not None or use_checkpoints) else None
+        document_key = cache.document_key(file_sha256, _document_settings_fingerprint()) if cache is not None else None
+        if cache is not None:
+            cached_text = cache.get_document(document_key)
+            if cached_text is not None:
+                logger.info(f"[Task {doc_id}] OCR cache hit for file sha256={file_sha256[:12]}...; skipping extraction.")
+                with open(text_output_full_path, "w", encoding="utf-8") as f:
+                    f.write(cached_text)
+                if progress_callback:
+                    cached_pages = cached_text.count("\n--- Page ")
+                    progress_callback(cached_pages, cached_pages)
+                return text_output_full_path
 
-        # Step 1: Attempt text layer extraction
-        extracted_text = _try_text_layer_extraction(doc_id, doc)
+        doc = fitz.open(pdf_full_path) # Open PDF document
+        num_pages = len(doc)
 
-        if extracted_text is not None:
-            final_text = extracted_text
-            extracted_from_layer = True
-        else:
-            # Step 2: Fallback to EasyOCR on images
-            final_text = _perform_easyocr_on_doc(doc_id, doc)
-            # If _perform_easyocr_on_doc fails critically, it raises an exception handled below
+        # Resume from a previous attempt's per-page checkpoint (only if the PDF is unchanged)
+        checkpoint = open_checkpoint(text_output_full_path, file_sha256) if use_checkpoints else None
+        resumed_pages = checkpoint.completed if checkpoint is not None else {}
+        if resumed_pages:
+            logger.info(f"[Task {doc_id}] Resuming from checkpoint: {len(resumed_pages)}/{num_pages} pages already done.")
 
-        # Step 3: Save the final resulting text
-        logger.info(f"[Task {doc_id}] Writing final text (from {'Layer' if extracted_from_layer else 'EasyOCR'}) to {text_output_full_path}")
         with open(text_output_full_path, "w", encoding="utf-8") as f:
-            f.write(final_text)
+            writer = _StreamingPageWriter(f, num_pages, progress_callback, memory=memory)
+            for page_index in sorted(resumed_pages):
+                writer.add(page_index, resumed_pages.pop(page_index))
+            remaining_pages = [i for i in range(num_pages) if i not in writer.added_pages]
+
+            # Step 1: Text layer extraction, decided page by page. Sampled pages are not read again;
+            # outside the all-digital case a page's text is only read if it has fonts at all, so a
+            # scanned document costs one cheap font check per page (a text page in it is still found)
+            layout = text_layer.classify_document(doc, getattr(settings, "TEXT_LAYER_SAMPLE_PAGES", 5), text_layer.MIN_TEXT_LAYER_CHARS)
+            logger.info(f"[Task {doc_id}] Sampled layout: {layout.kind} ({len(layout.sampled_texts)} sampled pages read).")
+            if budget is not None:
+                budget.check()
+            layer_texts = _try_text_layer_extraction(
+                doc_id, doc, remaining_pages,
+                known_texts=layout.sampled_texts,
+                check_fonts=layout.kind != text_layer.DOC_DIGITAL, # Font pre-check only pays off where pages lack text
+                budget=budget,
+            )
+            del layout
+            ocr_page_indices = [i for i in remaining_pages if layer_texts[i] is None]
+            logger.info(f"[Task {doc_id}] Streaming text ({len(remaining_pages) - len(ocr_page_indices)} pages from Layer, {len(ocr_page_indices)} from EasyOCR) to {text_output_full_path}")
+            for page_index in remaining_pages:
+                if layer_texts[page_index] is not None:
+                    section = _page_section(page_index + 1, ENGINE_TEXT_LAYER, layer_texts.pop(page_index))
+                    if checkpoint is not None:
+                        checkpoint.record(page_index, section, durable=False) # Cheap to redo; skip fsync
+                    writer.add(page_index, section)
+            del layer_texts # The writer holds whatever is still waiting on earlier OCR pages
+
+            # Step 2: OCR only the pages whose text layer is deficient, writing each as it completes
+            if ocr_page_indices:
+                for page_index, section in _iter_easyocr_on_doc(doc_id, doc, ocr_page_indices, batched=batched, budget=budget):
+                    if checkpoint is not None and not _is_error_section(section):
+                        checkpoint.record(page_index, section) # Errored pages are retried on resume
+                    writer.add(page_index, section)
+            # If _iter_easyocr_on_doc fails critically, it raises an exception handled below
+        if checkpoint is not None:
+            checkpoint.discard() # Output complete; nothing left to resume
         logger.info(f"[Task {doc_id}] Final text saved successfully.")
+
+        # Step 3: Remember the result for re-uploads of the same file (never cache pages that errored)
+        if cache is not None and not writer.had_errors:
+            with open(text_output_full_path, "r", encoding="utf-8") as f:
+                cache.put_document(document_key, f.read())
         return text_output_full_path # Return success path
 
+    except ProcessingCancelled as cancel:
+        logger.error(f"[Task {doc_id}] Text extraction/OCR stopped ({cancel.reason}): {cancel}")
+        if checkpoint is not None:
+            checkpoint.close() # Pages finished so far are kept for a re-run
+        raise
+
     except Exception as e:
         logger.error(f"[Task {doc_id}] CRITICAL FAILURE in text_extract_or_ocr for {pdf_full_path}: {e}", exc_info=True)
+        if checkpoint is not None:
+            checkpoint.close() # Keep the file: the next attempt resumes from it
         raise # Re-raise the caught exception to signal failure to the background task
 
     finally:
-        if doc: # Ensure PDF document object is closed
+        if doc and budget is not None and budget.abandoned:
+            logger.warning(f"[Task {doc_id}] Not closing PDF: an abandoned page thread may still be reading it.")
+        elif doc: # Ensure PDF document object is closed
             try:
                 doc.close(); logger.debug(f"[Task {doc_id}] Closed PDF document.")
             except Exception as close_err:
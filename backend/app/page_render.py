@@ -0,0 +1,130 @@
+# InsureDocsProject/backend/app/page_render.py
+import logging
+from typing import Optional
+
+import fitz                 # PyMuPDF - For rendering pages
+import numpy as np          # OCR engines accept raw pixel arrays
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+DEFAULT_OCR_DPI = 300 # 300 DPI recommended for OCR
+
+class PageImage:
+    """
+    A rendered page exposed as a NumPy view over the pixmap's own sample buffer.
+
+    No image file format is involved: the array aliases fitz.Pixmap.samples directly,
+    so the pixmap is kept referenced here for as long as the array is in use.
+    Call release() (or drop the object) once the OCR engine is done with it.
+    """
+
+    def __init__(self, pixmap: fitz.Pixmap):
+        self.pixmap: Optional[fitz.Pixmap] = pixmap
+        h, w, n = pixmap.height, pixmap.width, pixmap.n
+        # Wrap the sample buffer without copying; honour the row stride in case of padding
+        view = np.ndarray(shape=(h, w, n), dtype=np.uint8, buffer=pixmap.samples_mv, strides=(pixmap.stride, n, 1))
+        self.array: Optional[np.ndarray] = view[:, :, 0] if n == 1 else view # Grayscale -> 2D (H, W)
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes if self.array is not None else 0
+
+    def as_bgr(self) -> np.ndarray:
+        """Returns a BGR copy for engines (like EasyOCR) that treat 3-channel arrays as BGR."""
+        if self.array.ndim == 2:
+            return self.array
+        return np.ascontiguousarray(self.array[:, :, ::-1])
+
+    def release(self):
+        """Drops the array view and the pixmap so the sample buffer can be freed."""
+        self.array = None
+        self.pixmap = None
+
+def render_page(page: fitz.Page, dpi: int = DEFAULT_OCR_DPI, grayscale: bool = True, clip: Optional[fitz.Rect] = None) -> PageImage:
+    """Renders a page straight to a pixel array (grayscale by default, never alpha)."""
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False, clip=clip)
+    return PageImage(pix)
+
+# =====================================
+# Adaptive render planning (cheap pre-pass before the full OCR render)
+# =====================================
+PROBE_DPI = 72 # At 72 DPI one probe pixel is one PDF point
+INK_THRESHOLD = 200 # Gray level below which a probe pixel counts as content
+CROP_MARGIN_PT = 6 # Breathing room kept around the detected content box
+
+class RenderPlan:
+    """How to render a page for OCR: the DPI to use and the area (page coordinates) to keep."""
+
+    def __init__(self, dpi: int, clip: Optional[fitz.Rect], page_rect: fitz.Rect, text_height_pt: Optional[float]):
+        self.dpi = dpi
+        self.clip = clip
+        self.page_rect = page_rect
+        self.text_height_pt = text_height_pt
+
+    @property
+    def area_fraction(self) -> float:
+        """Share of the page area that will actually be rendered."""
+        rect = self.clip if self.clip is not None else self.page_rect
+        page_area = abs(self.page_rect) or 1.0
+        return abs(rect) / page_area
+
+    def describe(self) -> str:
+        rect = self.clip if self.clip is not None else self.page_rect
+        height = f"{self.text_height_pt:.1f}pt" if self.text_height_pt else "n/a"
+        return (f"dpi={self.dpi}, crop=({rect.x0:.0f},{rect.y0:.0f},{rect.x1:.0f},{rect.y1:.0f}) "
+                f"{self.area_fraction:.0%} of page, est. text height {height}")
+
+def _estimate_line_height_px(ink_rows: np.ndarray) -> Optional[float]:
+    """Median height of runs of inked rows (text lines) in the probe image, in probe pixels."""
+    runs = []
+    run = 0
+    for has_ink in ink_rows:
+        if has_ink:
+            run += 1
+        elif run:
+            runs.append(run); run = 0
+    if run:
+        runs.append(run)
+    # Ignore 1px runs (rules, specks) unless that is all there is
+    line_runs = [r for r in runs if r > 1] or runs
+    return float(np.median(line_runs)) if line_runs else None
+
+def plan_render(page: fitz.Page, min_dpi: int, max_dpi: int, target_text_px: int, max_pixels: int) -> RenderPlan:
+    """
+    Picks the lowest DPI that still gives ~target_text_px tall text lines, and crops away blank margins.
+
+    The pre-pass renders the page once at PROBE_DPI in grayscale (a few hundred KB), finds the
+    bounding box of non-white pixels, and estimates line height from the horizontal projection.
+    The DPI is clamped to [min_dpi, max_dpi] and then lowered further if the cropped render
+    would exceed max_pixels (oversized drawings).
+    """
+    page_rect = page.rect
+    probe = render_page(page, dpi=PROBE_DPI, grayscale=True)
+    try:
+        ink = probe.array < INK_THRESHOLD
+        rows = np.flatnonzero(ink.any(axis=1))
+        cols = np.flatnonzero(ink.any(axis=0))
+        if rows.size == 0: # Blank page: nothing worth rendering at high resolution
+            return RenderPlan(min_dpi, None, page_rect, None)
+        scale = 72.0 / PROBE_DPI
+        clip = None
+        if page.rotation == 0: # Probe pixels map straight onto page coordinates only when unrotated
+            clip = fitz.Rect(
+                page_rect.x0 + cols[0] * scale - CROP_MARGIN_PT, page_rect.y0 + rows[0] * scale - CROP_MARGIN_PT,
+                page_rect.x0 + (cols[-1] + 1) * scale + CROP_MARGIN_PT, page_rect.y0 + (rows[-1] + 1) * scale + CROP_MARGIN_PT,
+            ) & page_rect
+        # Line height measured only inside the content columns, so margins don't dilute it
+        text_height_px = _estimate_line_height_px(ink[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1].mean(axis=1) > 0.01)
+    finally:
+        probe.release()
+
+    text_height_pt = text_height_px * scale if text_height_px else None
+    dpi = max_dpi if not text_height_pt else int(round(target_text_px / text_height_pt * 72))
+    dpi = max(min_dpi, min(max_dpi, dpi))
+    rect = clip if clip is not None else page_rect
+    area_in2 = (rect.width / 72.0) * (rect.height / 72.0)
+    if area_in2 > 0 and area_in2 * dpi * dpi > max_pixels:
+        dpi = max(1, int((max_pixels / area_in2) ** 0.5)) # Pixel cap wins over min_dpi: memory is the hard limit
+    return RenderPlan(dpi, clip, page_rect, text_height_pt)
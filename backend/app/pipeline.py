@@ -0,0 +1,289 @@
+# InsureDocsProject/backend/app/pipeline.py
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud, models, ocr_utils, extraction_utils, ner_utils, job_queue, job_scheduler, memory_budget
+from .ocr_budget import OCRBudget, ProcessingCancelled, REASON_TIMEOUT
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# =====================================
+# Document Processing Pipeline, run by queue workers (see worker.py)
+# Stages with their own job kinds:
+#   ocr     - text layer / OCR -> text file -> queues an extract job
+#   extract - text file -> regex extraction -> extracted_metadata -> queues a ner job (NER_ENABLED)
+#   ner     - text files of several documents -> one batched spaCy pass -> ner_entities / ner_mentions
+# so extraction can be re-run (or scaled) without touching the PDF.
+# =====================================
+PROGRESS_UPDATE_INTERVAL_SECONDS = 1.0 # Throttle for per-page progress commits
+# Statuses the OCR stage records itself when it ends without handing over to extraction
+OCR_FAILURE_STATUSES = {models.DocumentStatus.OCR_FAILED, models.DocumentStatus.OCR_TIMEOUT, models.DocumentStatus.CANCELLED}
+# NER runs on documents whose extraction finished (review decisions don't change the text)
+NER_SOURCE_STATUSES = crud.DEDUP_RESULT_STATUSES
+
+def _make_progress_recorder(db: Session, doc_id: int):
+    """Returns a (pages_done, pages_total) callback that writes progress to the Document row, throttled."""
+    last_update = [0.0]
+    def record(pages_done: int, pages_total: int):
+        now = time.monotonic()
+        # Always record start and finish; in between, at most once per interval
+        if pages_done not in (0, pages_total) and now - last_update[0] < PROGRESS_UPDATE_INTERVAL_SECONDS:
+            return
+        last_update[0] = now
+        try:
+            crud.update_document_progress(db, doc_id=doc_id, pages_done=pages_done, pages_total=pages_total)
+        except Exception as progress_err: # Progress is best-effort; never fail OCR over it
+            logger.warning(f"[BG Task {doc_id}] Could not record progress {pages_done}/{pages_total}: {progress_err}")
+            db.rollback()
+    return record
+
+def run_ocr_stage(doc_id: int, cancel_event: Optional[threading.Event] = None) -> Optional[models.DocumentStatus]:
+    """
+    OCR job: PDF -> text file -> queue extraction. Returns the status it left the document in (None if skipped).
+    Runs under the OCR time budgets; setting cancel_event stops it at the next page (status CANCELLED).
+    """
+    logger.info(f"[BG Task Start doc_id={doc_id}] Starting OCR stage.")
+    db: Optional[Session] = None
+    final_status: Optional[models.DocumentStatus] = models.DocumentStatus.OCR_FAILED # Default unless OCR succeeds
+    memory: Optional[memory_budget.MemoryMonitor] = None
+
+    try:
+        db = SessionLocal()
+        # 1. Get Doc & Validate State
+        db_doc = crud.get_document_by_id(db, doc_id)
+        if not db_doc: logger.error(f"[BG Task {doc_id}] ERROR: Doc not found."); final_status = None; return None
+        valid_start_statuses = [
+            models.DocumentStatus.UPLOADED, models.DocumentStatus.OCR_PENDING,
+            models.DocumentStatus.OCR_FAILED, models.DocumentStatus.EXTRACT_FAILED, # Allow reprocessing
+            models.DocumentStatus.OCR_TIMEOUT, models.DocumentStatus.CANCELLED,
+            # The job lease guarantees no other worker is on this document, so OCR_PROCESSING
+            # here means a previous attempt died mid-way; resume it (per-page checkpoints are reused)
+            models.DocumentStatus.OCR_PROCESSING,
+        ]
+        if db_doc.status not in valid_start_statuses:
+            logger.info(f"[BG Task {doc_id}] INFO: Doc status ({db_doc.status}) not suitable for OCR. Skipping.")
+            final_status = None # Leave the document untouched
+            return None
+        if not db_doc.file_path_on_disk or not db_doc.stored_filename:
+             logger.error(f"[BG Task {doc_id}] ERROR: Doc missing paths. Setting OCR_FAILED.")
+             return None # OCR_FAILED recorded by the final update below
+
+        # 2. Update status to OCR_PROCESSING
+        crud.update_document_status(db, doc_id=doc_id, new_status=models.DocumentStatus.OCR_PROCESSING)
+        logger.info(f"[BG Task {doc_id}] Status -> OCR_PROCESSING.")
+
+        # 3. Determine Paths
+        pdf_full_path = ocr_utils.get_full_pdf_path(db_doc.file_path_on_disk)
+        text_output_full_path = ocr_utils.get_output_text_path(db_doc.stored_filename)
+
+        # 4. Perform OCR
+        # Pages are streamed to the text file as they finish; progress goes to the Document row
+        progress_callback = _make_progress_recorder(db, doc_id)
+        budget = OCRBudget(doc_id, cancel_event=cancel_event) # Page / document limits from settings
+        memory = memory_budget.MemoryMonitor(doc_id, extra_pids=ocr_utils.ocr_pool_worker_pids) # Peak RSS, per-page budget check
+        # ocr_utils.perform_text_extract_or_ocr handles internal errors and raises on failure
+        saved_text_full_path = ocr_utils.perform_text_extract_or_ocr(doc_id, pdf_full_path, text_output_full_path,
+                                                                     progress_callback=progress_callback, budget=budget, memory=memory)
+        extracted_text_relative_path = os.path.basename(saved_text_full_path)
+
+        # 5. Store the text path and hand over to the extraction stage in one commit
+        db_doc = crud.get_document_by_id(db, doc_id)
+        if not db_doc: logger.warning(f"[BG Task {doc_id}] Doc deleted during OCR."); final_status = None; return None
+        db_doc.extracted_text_path = extracted_text_relative_path
+        db_doc.peak_rss_mb = memory.peak_mb
+        db_doc.status = models.DocumentStatus.EXTRACT_PENDING
+        job_queue.enqueue(
+            db, document_id=doc_id, kind=job_queue.JOB_KIND_EXTRACT, commit=False,
+            owner_id=db_doc.owner_id, estimated_cost=settings.JOB_COST_EXTRACT,
+            priority=job_scheduler.priority_for_role(db_doc.owner.role) if db_doc.owner else 0,
+        )
+        db.commit()
+        final_status = models.DocumentStatus.EXTRACT_PENDING
+        logger.info(f"[BG Task {doc_id}] OCR successful. Status -> EXTRACT_PENDING. Text path stored: {extracted_text_relative_path} (peak RSS {memory.peak_mb} MB)")
+
+    except ProcessingCancelled as cancel:
+        final_status = models.DocumentStatus.OCR_TIMEOUT if cancel.reason == REASON_TIMEOUT else models.DocumentStatus.CANCELLED
+        logger.warning(f"[BG Task {doc_id}] OCR stopped: {cancel}. Status -> {final_status.value}.")
+    except FileNotFoundError as fnf_err:
+        logger.error(f"[BG Task {doc_id}] ERROR: File not found during OCR: {fnf_err}", exc_info=True)
+        final_status = models.DocumentStatus.OCR_FAILED
+    except Exception as e:
+        logger.error(f"[BG Task {doc_id}] ERROR: Unhandled exception during OCR: {e}", exc_info=True)
+        final_status = models.DocumentStatus.OCR_FAILED
+
+    finally:
+        # --- Failure DB Update (success was committed together with the extract job) ---
+        if db:
+            try:
+                if final_status in OCR_FAILURE_STATUSES:
+                    db.rollback()
+                    if crud.get_document_by_id(db, doc_id):
+                        logger.info(f"[BG Task Update {doc_id}] Updating final status to {final_status}")
+                        crud.update_document_status(db, doc_id=doc_id, new_status=final_status)
+                        if memory is not None:
+                            db.query(models.Document).filter(models.Document.id == doc_id).update({models.Document.peak_rss_mb: memory.peak_mb}, synchronize_session=False)
+                            db.commit()
+                        crud.copy_results_to_duplicates(db, doc_id) # Duplicate uploads waiting on this document fail too
+                    else:
+                        logger.warning(f"[BG Task Update {doc_id}] Doc deleted before final update.")
+            except Exception as db_update_err:
+                logger.critical(f"[BG Task Update {doc_id}] CRITICAL ERROR on final DB update: {db_update_err}", exc_info=True)
+            finally:
+                 db.close()
+        else: logger.error(f"[BG Task End {doc_id}] ERROR: No DB Session available.")
+        try:
+            ocr_utils.recycle_ocr_pool_if_needed(memory_budget.limit_bytes()) # Between documents, never mid-page
+        except Exception as recycle_err:
+            logger.warning(f"[BG Task End {doc_id}] Could not check/recycle the OCR pool: {recycle_err}")
+        logger.info(f"[BG Task End {doc_id}] OCR cache (this process): {ocr_utils.get_ocr_cache_metrics()}")
+        logger.info(f"[BG Task End doc_id={doc_id}] OCR stage finished.")
+    return final_status
+
+def run_extraction_stage(doc_id: int, cancel_event: Optional[threading.Event] = None) -> Optional[models.DocumentStatus]:
+    """
+    Extraction job: stored text file -> regex extraction -> extracted_metadata and document_entities rows.
+    Returns the final status (None if skipped).
+    Extraction is short, so cancel_event is only checked before it starts.
+    """
+    logger.info(f"[BG Task Start doc_id={doc_id}] Starting extraction stage.")
+    db: Optional[Session] = None
+    final_status: Optional[models.DocumentStatus] = models.DocumentStatus.EXTRACT_FAILED # Default unless extraction succeeds
+    extracted_metadata = None
+    entity_rows: List[Dict[str, Any]] = []
+
+    try:
+        db = SessionLocal()
+        db_doc = crud.get_document_by_id(db, doc_id)
+        if not db_doc: logger.error(f"[BG Task {doc_id}] ERROR: Doc not found."); final_status = None; return None
+        valid_start_statuses = [
+            models.DocumentStatus.OCR_COMPLETED, models.DocumentStatus.EXTRACT_PENDING,
+            models.DocumentStatus.EXTRACT_PROCESSING, # Previous attempt died mid-way
+            models.DocumentStatus.EXTRACT_FAILED, models.DocumentStatus.EXTRACT_COMPLETED, # Re-extraction
+        ]
+        if db_doc.status not in valid_start_statuses:
+            logger.info(f"[BG Task {doc_id}] INFO: Doc status ({db_doc.status}) not suitable for extraction. Skipping.")
+            final_status = None
+            return None
+        if not db_doc.extracted_text_path:
+            logger.error(f"[BG Task {doc_id}] ERROR: No extracted text to run extraction on.")
+            return None # EXTRACT_FAILED recorded by the final update below
+        if cancel_event is not None and cancel_event.is_set():
+            logger.warning(f"[BG Task {doc_id}] Extraction cancelled before it started.")
+            final_status = models.DocumentStatus.CANCELLED
+            return None # CANCELLED recorded by the final update below
+
+        # 1. Set status to EXTRACT_PROCESSING
+        crud.update_document_status(db, doc_id=doc_id, new_status=models.DocumentStatus.EXTRACT_PROCESSING)
+        logger.info(f"[BG Task {doc_id}] Status -> EXTRACT_PROCESSING.")
+
+        # 2. Read the extracted text and apply regex extraction
+        text_full_path = os.path.join(ocr_utils.TEXT_OUTPUT_DIR, db_doc.extracted_text_path)
+        logger.info(f"[BG Task {doc_id}] Applying regex extraction to {text_full_path}")
+        extracted_metadata, entity_rows = extraction_utils.extract_information_and_entities_from_file(text_full_path)
+        final_status = models.DocumentStatus.EXTRACT_COMPLETED
+        logger.info(f"[BG Task {doc_id}] Regex extraction successful. Status -> {final_status}. Metadata keys: {list(extracted_metadata.keys()) if extracted_metadata else 'None'}, {len(entity_rows)} entity rows")
+
+    except FileNotFoundError as fnf_err:
+        logger.error(f"[BG Task {doc_id}] ERROR: Text file not found: {fnf_err}")
+        final_status = models.DocumentStatus.EXTRACT_FAILED
+    except Exception as e:
+        logger.error(f"[BG Task {doc_id}] ERROR: Unhandled exception during extraction: {e}", exc_info=True)
+        final_status = models.DocumentStatus.EXTRACT_FAILED
+
+    finally:
+        # --- Final DB Update ---
+        if db:
+            try:
+                 final_check_doc = crud.get_document_by_id(db, doc_id)
+                 if final_status is None:
+                    pass # Skipped: nothing to record
+                 elif final_check_doc:
+                    logger.info(f"[BG Task Update {doc_id}] Updating final status to {final_status}")
+                    if final_status == models.DocumentStatus.EXTRACT_COMPLETED:
+                         if settings.NER_ENABLED: # Committed together with the results below
+                             job_queue.enqueue(
+                                 db, document_id=doc_id, kind=job_queue.JOB_KIND_NER, commit=False,
+                                 owner_id=final_check_doc.owner_id, estimated_cost=settings.JOB_COST_NER,
+                                 priority=job_scheduler.priority_for_role(final_check_doc.owner.role) if final_check_doc.owner else 0,
+                             )
+                         crud.replace_document_entities(db, doc_id, entity_rows) # Also committed with the results below
+                         crud.update_document_extraction_results(db, doc_id=doc_id, metadata=extracted_metadata, new_status=final_status)
+                    else:
+                         # Update status only, leave metadata as is (likely None or old value)
+                         crud.update_document_status(db, doc_id=doc_id, new_status=final_status)
+                    crud.copy_results_to_duplicates(db, doc_id) # Duplicate uploads waiting on this document
+                 else:
+                     logger.warning(f"[BG Task Update {doc_id}] Doc deleted before final update.")
+            except Exception as db_update_err:
+                logger.critical(f"[BG Task Update {doc_id}] CRITICAL ERROR on final DB update: {db_update_err}", exc_info=True)
+            finally:
+                 db.close()
+        else: logger.error(f"[BG Task End {doc_id}] ERROR: No DB Session available.")
+        logger.info(f"[BG Task End doc_id={doc_id}] Extraction stage finished.")
+    return final_status
+
+def run_ner_batch(doc_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    NER jobs for several documents: their stored text files go through one batched spaCy pass
+    (ner_utils.extract_entity_mentions_batch) and the results - mentions with page numbers and
+    offsets, plus the {label: [values]} summary - are written in one commit.
+    Returns {doc_id: error or None}; documents no longer eligible are skipped without an error.
+    """
+    logger.info(f"[BG Task Start doc_ids={doc_ids}] Starting NER stage.")
+    outcome: Dict[int, Optional[str]] = {doc_id: None for doc_id in doc_ids}
+    db = SessionLocal()
+    try:
+        rows = db.query(models.Document.id, models.Document.status, models.Document.extracted_text_path).filter(
+            models.Document.id.in_(doc_ids)
+        ).all()
+        texts, text_doc_ids = [], []
+        for doc_id, doc_status, text_path in rows:
+            if doc_status not in NER_SOURCE_STATUSES or not text_path:
+                logger.info(f"[BG Task {doc_id}] INFO: Doc status ({doc_status}) not suitable for NER. Skipping.")
+                continue
+            try:
+                with open(os.path.join(ocr_utils.TEXT_OUTPUT_DIR, text_path), "r", encoding="utf-8") as f:
+                    texts.append(f.read())
+                text_doc_ids.append(doc_id)
+            except OSError as read_err:
+                logger.error(f"[BG Task {doc_id}] ERROR: Could not read text for NER: {read_err}")
+                outcome[doc_id] = f"{type(read_err).__name__}: {read_err}"
+        if texts:
+            mentions = dict(zip(text_doc_ids, ner_utils.extract_entity_mentions_batch(texts)))
+            crud.store_ner_entities(
+                db,
+                {doc_id: ner_utils.entities_from_mentions(found) for doc_id, found in mentions.items()},
+                {doc_id: [mention._asdict() for mention in found] for doc_id, found in mentions.items()},
+            )
+            logger.info(f"[BG Task doc_ids={text_doc_ids}] NER results stored.")
+    except Exception as e:
+        logger.error(f"[BG Task doc_ids={doc_ids}] ERROR: Unhandled exception during NER: {e}", exc_info=True)
+        db.rollback()
+        for doc_id in doc_ids:
+            outcome[doc_id] = outcome[doc_id] or f"{type(e).__name__}: {e}"
+    finally:
+        db.close()
+        logger.info(f"[BG Task End doc_ids={doc_ids}] NER stage finished.")
+    return outcome
+
+def run_ner_stage(doc_id: int, cancel_event: Optional[threading.Event] = None) -> Optional[models.DocumentStatus]:
+    """NER job for one document (workers normally batch them, see QueueWorker). The document status is left as is."""
+    error = run_ner_batch([doc_id])[doc_id]
+    if error:
+        raise RuntimeError(error) # The worker records it on the job and retries
+    return None
+
+# Job kind -> stage function (the legacy combined "process" kind now starts at the OCR stage)
+STAGE_RUNNERS = {
+    job_queue.JOB_KIND_OCR: run_ocr_stage,
+    job_queue.JOB_KIND_EXTRACT: run_extraction_stage,
+    job_queue.JOB_KIND_NER: run_ner_stage,
+    job_queue.JOB_KIND_PROCESS: run_ocr_stage,
+}
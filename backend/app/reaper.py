@@ -0,0 +1,246 @@
+# InsureDocsProject/backend/app/reaper.py
+# Stuck-job reaper: recovers work whose worker died, so documents never stay in *_PROCESSING forever.
+#
+# Each pass (run periodically by the API process, or `python -m app.reaper`):
+#   1. Expired leases (no heartbeat within the visibility timeout): re-queue the job after an
+#      exponential backoff, or - once max_attempts is used up - fail the job and its document.
+#   2. Orphaned documents (pending/processing status but no active job, e.g. queued before the job
+#      table existed or left behind by a crash): queue a job for the stage they are in, unless that
+#      stage already failed for good, in which case the document is marked failed.
+#   3. Duplicate uploads still waiting on a canonical document that has already finished get its result.
+# All changes are conditional UPDATEs, so several reapers can run at once without double-acting.
+import sys
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, exists, func
+from sqlalchemy.orm import Session, aliased
+
+from .config import settings
+from .database import SessionLocal
+from . import crud, models, job_queue, job_scheduler
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+# Document status -> (job kinds that process it, status to set when that stage fails for good)
+STAGE_BY_STATUS = {
+    models.DocumentStatus.OCR_PENDING: ((job_queue.JOB_KIND_OCR, job_queue.JOB_KIND_PROCESS), models.DocumentStatus.OCR_FAILED),
+    models.DocumentStatus.OCR_PROCESSING: ((job_queue.JOB_KIND_OCR, job_queue.JOB_KIND_PROCESS), models.DocumentStatus.OCR_FAILED),
+    models.DocumentStatus.EXTRACT_PENDING: ((job_queue.JOB_KIND_EXTRACT,), models.DocumentStatus.EXTRACT_FAILED),
+    models.DocumentStatus.EXTRACT_PROCESSING: ((job_queue.JOB_KIND_EXTRACT,), models.DocumentStatus.EXTRACT_FAILED),
+}
+FAILED_STATUS_BY_KIND = {
+    job_queue.JOB_KIND_OCR: models.DocumentStatus.OCR_FAILED,
+    job_queue.JOB_KIND_PROCESS: models.DocumentStatus.OCR_FAILED,
+    job_queue.JOB_KIND_EXTRACT: models.DocumentStatus.EXTRACT_FAILED,
+    job_queue.JOB_KIND_NER: None, # NER only enriches a finished document; its failure leaves the status alone
+}
+
+# --- Metrics (per process, cumulative since start) ---
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, float] = {
+    "runs": 0,
+    "leases_expired": 0,         # Expired leases found
+    "jobs_requeued": 0,          # ...re-queued with backoff
+    "jobs_failed": 0,            # ...failed for good (attempts exhausted)
+    "orphans_requeued": 0,       # Documents without an active job that got a new one
+    "orphans_failed": 0,         # Documents whose stage had already failed for good
+    "duplicates_synced": 0,      # Duplicate uploads given their canonical document's late result
+    "last_run_at": 0.0,          # Unix time of the last completed pass
+    "last_run_seconds": 0.0,
+}
+
+def _bump(name: str, value: float = 1):
+    with _metrics_lock:
+        _metrics[name] += value
+
+def get_metrics() -> Dict[str, float]:
+    with _metrics_lock:
+        return dict(_metrics)
+
+def _mark_document_failed(db: Session, doc_id: int, failed_status: models.DocumentStatus):
+    """Fails a document only if it is still waiting on / in the stage (never overwrites a finished result)."""
+    db.query(models.Document).filter(
+        models.Document.id == doc_id,
+        models.Document.status.in_(list(STAGE_BY_STATUS.keys())),
+    ).update({models.Document.status: failed_status}, synchronize_session=False)
+
+# =====================================
+# Reaper passes
+# =====================================
+def reap_expired_leases(db: Session, now: Optional[datetime] = None, limit: int = 500) -> Dict[str, int]:
+    """Re-queues (with backoff) or fails jobs whose lease expired without a heartbeat."""
+    now = now or datetime.utcnow()
+    expired = db.query(models.ProcessingJob).filter(
+        models.ProcessingJob.status == models.JobStatus.LEASED,
+        models.ProcessingJob.lease_expires_at < now,
+    ).order_by(models.ProcessingJob.lease_expires_at).limit(limit).all()
+    counts = {"leases_expired": 0, "jobs_requeued": 0, "jobs_failed": 0}
+    for job in expired:
+        still_expired = and_( # Guard: the worker may have heartbeated, or another reaper acted, since the SELECT
+            models.ProcessingJob.id == job.id,
+            models.ProcessingJob.status == models.JobStatus.LEASED,
+            models.ProcessingJob.lease_expires_at < now,
+        )
+        error = f"Lease expired at {job.lease_expires_at:%Y-%m-%d %H:%M:%S} UTC (worker {job.lease_owner}, attempt {job.attempts}/{job.max_attempts})"
+        if job.attempts < job.max_attempts:
+            delay = job_queue.retry_backoff_seconds(job.attempts)
+            changed = db.query(models.ProcessingJob).filter(still_expired).update({
+                models.ProcessingJob.status: models.JobStatus.QUEUED,
+                models.ProcessingJob.lease_owner: None,
+                models.ProcessingJob.lease_expires_at: None,
+                models.ProcessingJob.available_at: now + timedelta(seconds=delay),
+                models.ProcessingJob.last_error: error,
+            }, synchronize_session=False)
+            outcome = "jobs_requeued"
+            log_msg = f"[Task {job.document_id}] {error}; re-queued job {job.id} in {delay}s."
+        else:
+            changed = db.query(models.ProcessingJob).filter(still_expired).update({
+                models.ProcessingJob.status: models.JobStatus.FAILED,
+                models.ProcessingJob.lease_expires_at: None,
+                models.ProcessingJob.last_error: error,
+                models.ProcessingJob.finished_at: now,
+            }, synchronize_session=False)
+            failed_status = FAILED_STATUS_BY_KIND.get(job.kind, models.DocumentStatus.OCR_FAILED)
+            if changed and failed_status is not None:
+                _mark_document_failed(db, job.document_id, failed_status)
+            outcome = "jobs_failed"
+            log_msg = f"[Task {job.document_id}] {error}; out of attempts, job {job.id} and document failed."
+        db.commit()
+        if changed:
+            counts["leases_expired"] += 1
+            counts[outcome] += 1
+            logger.warning(log_msg)
+    return counts
+
+def _orphan_filter():
+    """SQL condition: document waits on / is in a pipeline stage but has no queued or leased job."""
+    active_job = exists().where(
+        models.ProcessingJob.document_id == models.Document.id,
+        models.ProcessingJob.status.in_(job_queue.ACTIVE_JOB_STATUSES),
+    )
+    return and_(
+        models.Document.status.in_(list(STAGE_BY_STATUS.keys())),
+        models.Document.duplicate_of_id.is_(None), # Duplicates wait on their canonical document's job
+        ~active_job,
+    )
+
+def reap_orphaned_documents(db: Session, limit: int = 500) -> Dict[str, int]:
+    """Gives pending/processing documents without an active job a new one, or fails them if their stage already failed."""
+    orphans = db.query(models.Document.id, models.Document.status, models.Document.owner_id, models.User.role).outerjoin(
+        models.User, models.User.id == models.Document.owner_id
+    ).filter(_orphan_filter()).order_by(models.Document.id).limit(limit).all()
+    counts = {"orphans_requeued": 0, "orphans_failed": 0}
+    for doc_id, doc_status, owner_id, owner_role in orphans:
+        kinds, failed_status = STAGE_BY_STATUS[doc_status]
+        stage_failed = db.query(func.count(models.ProcessingJob.id)).filter(
+            models.ProcessingJob.document_id == doc_id,
+            models.ProcessingJob.kind.in_(kinds),
+            models.ProcessingJob.status == models.JobStatus.FAILED,
+        ).scalar()
+        if stage_failed:
+            _mark_document_failed(db, doc_id, failed_status)
+            counts["orphans_failed"] += 1
+            logger.warning(f"[Task {doc_id}] Stuck in {doc_status.value} after its {kinds[0]} job failed; marked {failed_status.value}.")
+        else:
+            job_queue.enqueue(db, document_id=doc_id, kind=kinds[0], owner_id=owner_id, commit=False,
+                              estimated_cost=settings.JOB_COST_EXTRACT if kinds[0] == job_queue.JOB_KIND_EXTRACT else None,
+                              priority=job_scheduler.priority_for_role(owner_role) if owner_role else 0) # Same tier as at upload
+            counts["orphans_requeued"] += 1
+            logger.warning(f"[Task {doc_id}] In {doc_status.value} with no active job; queued a new {kinds[0]} job.")
+        db.commit()
+    return counts
+
+def reap_stale_duplicates(db: Session, limit: int = 500) -> Dict[str, int]:
+    """Copies results to duplicates still waiting on a canonical document that already finished (upload raced its completion)."""
+    canonical = aliased(models.Document)
+    canonical_ids = db.query(canonical.id).join(models.Document, models.Document.duplicate_of_id == canonical.id).filter(
+        models.Document.status.in_(crud.DUPLICATE_WAITING_STATUSES),
+        canonical.status.in_(list(crud.DEDUP_RESULT_STATUSES | crud.DEDUP_FAILED_STATUSES)),
+        models.Document.status != canonical.status,
+    ).distinct().limit(limit).all()
+    updated = 0
+    for (canonical_id,) in canonical_ids:
+        updated += crud.copy_results_to_duplicates(db, canonical_id)
+    return {"duplicates_synced": updated}
+
+def get_backlog_gauges(db: Session) -> Dict[str, int]:
+    """Current recovery backlog: leases already expired (not yet reaped) and orphaned documents."""
+    return {
+        "expired_leases": db.query(func.count(models.ProcessingJob.id)).filter(
+            models.ProcessingJob.status == models.JobStatus.LEASED,
+            models.ProcessingJob.lease_expires_at < datetime.utcnow(),
+        ).scalar() or 0,
+        "orphaned_documents": db.query(func.count(models.Document.id)).filter(_orphan_filter()).scalar() or 0,
+    }
+
+def run_reaper_once() -> Dict[str, int]:
+    """One full reaper pass in its own session; updates the metrics."""
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        counts = reap_expired_leases(db)
+        counts.update(reap_orphaned_documents(db))
+        counts.update(reap_stale_duplicates(db))
+    finally:
+        db.close()
+    for name, value in counts.items():
+        _bump(name, value)
+    _bump("runs")
+    with _metrics_lock:
+        _metrics["last_run_at"] = time.time()
+        _metrics["last_run_seconds"] = round(time.perf_counter() - started, 3)
+    if any(counts.values()):
+        logger.info(f"Reaper pass: {counts}")
+    return counts
+
+# --- Periodic reaper thread (started by the API process) ---
+_reaper_stop = threading.Event()
+_reaper_thread: Optional[threading.Thread] = None
+
+def _reaper_loop(interval_seconds: float):
+    while not _reaper_stop.wait(interval_seconds):
+        try:
+            run_reaper_once()
+        except Exception as reap_err: # Keep reaping on the next tick (e.g. DB briefly locked)
+            logger.error(f"Reaper pass failed: {reap_err}", exc_info=True)
+
+def start_reaper_thread():
+    """Runs a reaper pass every JOB_REAPER_INTERVAL_SECONDS on a daemon thread (0 disables)."""
+    global _reaper_thread
+    if _reaper_thread is not None or settings.JOB_REAPER_INTERVAL_SECONDS <= 0:
+        return
+    _reaper_stop.clear()
+    _reaper_thread = threading.Thread(target=_reaper_loop, args=(settings.JOB_REAPER_INTERVAL_SECONDS,), name="job-reaper", daemon=True)
+    _reaper_thread.start()
+
+def stop_reaper_thread():
+    global _reaper_thread
+    if _reaper_thread is None:
+        return
+    _reaper_stop.set()
+    _reaper_thread.join(timeout=5)
+    _reaper_thread = None
+
+# --- CLI entry point (cron / manual recovery) ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recover processing jobs whose worker died.")
+    parser.add_argument("--loop", action="store_true", help="Keep running every JOB_REAPER_INTERVAL_SECONDS")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    logger.info(f"Reaper pass: {run_reaper_once()}")
+    if args.loop:
+        _reaper_loop(max(1.0, settings.JOB_REAPER_INTERVAL_SECONDS))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# InsureDocsProject/backend/app/reextract.py
+# Admin bulk re-extraction: `python -m app.reextract` (run from backend/).
+#
+# Re-runs the regex extractors over every stored text file (no PDF access, no OCR) and writes
+# extracted_metadata back in batched UPDATEs. Documents are read in id-ordered chunks (keyset
+# pagination), each chunk is extracted in parallel by a process pool while the previous chunk's
+# results are written, so memory stays bounded and neither the DB nor the CPUs sit idle.
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from .config import settings
+from .database import SessionLocal
+from . import models, extraction_utils
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+TEXT_OUTPUT_DIR = os.path.join(settings.UPLOAD_DIR, "extracted_text") # Same location as ocr_utils.TEXT_OUTPUT_DIR
+
+# Documents whose metadata is (re)written; anything else (e.g. still in OCR) is left to the pipeline
+REEXTRACT_STATUSES = [
+    models.DocumentStatus.OCR_COMPLETED, models.DocumentStatus.EXTRACT_PENDING,
+    models.DocumentStatus.EXTRACT_COMPLETED, models.DocumentStatus.EXTRACT_FAILED,
+    models.DocumentStatus.APPROVED, models.DocumentStatus.REJECTED,
+]
+# Statuses moved to EXTRACT_COMPLETED once extraction succeeds (reviewed documents keep theirs)
+PROMOTE_STATUSES = {
+    models.DocumentStatus.OCR_COMPLETED, models.DocumentStatus.EXTRACT_PENDING, models.DocumentStatus.EXTRACT_FAILED,
+}
+
+def _init_pool_worker():
+    logging.getLogger("app.extraction_utils").setLevel(logging.WARNING) # Per-document match counts would flood the log
+
+def _extract_one(item: Tuple[int, str]) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+    """Pool worker: (doc_id, text path) -> (doc_id, metadata, error)."""
+    doc_id, text_path = item
+    try:
+        return doc_id, extraction_utils.extract_information_from_file(text_path), None
+    except Exception as extract_err:
+        return doc_id, None, f"{type(extract_err).__name__}: {extract_err}"
+
+def _iter_chunks(chunk_size: int, start_after_id: int, status_filter: List[models.DocumentStatus]) -> Iterator[List[Tuple[int, str, models.DocumentStatus]]]:
+    """Yields (doc_id, text path, status) chunks in id order without holding more than one chunk in memory."""
+    last_id = start_after_id
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.query(models.Document.id, models.Document.extracted_text_path, models.Document.status).filter(
+                models.Document.id > last_id,
+                models.Document.extracted_text_path.isnot(None),
+                models.Document.status.in_(status_filter),
+            ).order_by(models.Document.id).limit(chunk_size).all()
+        finally:
+            db.close()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield [(r.id, os.path.join(TEXT_OUTPUT_DIR, r.extracted_text_path), r.status) for r in rows]
+
+def _write_results(chunk, results, dry_run: bool) -> Tuple[int, int]:
+    """Writes one chunk's metadata with a single executemany UPDATE; returns (updated, failed)."""
+    statuses = {doc_id: status for doc_id, _, status in chunk}
+    params, failed = [], 0
+    for doc_id, metadata, error in results:
+        if error is not None:
+            logger.warning(f"[Task {doc_id}] Re-extraction failed: {error}")
+            failed += 1
+            continue
+        row = {"id": doc_id, "extracted_metadata": metadata}
+        if statuses[doc_id] in PROMOTE_STATUSES:
+            row["status"] = models.DocumentStatus.EXTRACT_COMPLETED
+        params.append(row)
+    if params and not dry_run:
+        db = SessionLocal()
+        try:
+            # Rows with and without a status change go in separate batches (executemany needs uniform keys)
+            for batch in ([p for p in params if "status" in p], [p for p in params if "status" not in p]):
+                if batch:
+                    db.execute(update(models.Document), batch) # Bulk UPDATE ... WHERE id = :id
+            db.commit()
+        finally:
+            db.close()
+    return len(params), failed
+
+def reextract_all(workers: int, chunk_size: int, start_after_id: int = 0, status_filter: Optional[List[models.DocumentStatus]] = None, dry_run: bool = False) -> Dict[str, float]:
+    """Re-extracts metadata for all matching documents. Returns counters (documents, updated, failed, seconds)."""
+    started = time.perf_counter()
+    totals = {"documents": 0, "updated": 0, "failed": 0}
+    pending = None # (chunk, result iterator) submitted but not yet written
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_worker) as pool:
+        for chunk in _iter_chunks(chunk_size, start_after_id, status_filter or REEXTRACT_STATUSES):
+            # Submit this chunk before writing the previous one, so extraction and DB writes overlap
+            submitted = (chunk, pool.map(_extract_one, [(doc_id, path) for doc_id, path, _ in chunk], chunksize=max(1, len(chunk) // (workers * 4))))
+            if pending is not None:
+                _account(totals, pending, dry_run, started)
+            pending = submitted
+        if pending is not None:
+            _account(totals, pending, dry_run, started)
+
+    totals["seconds"] = round(time.perf_counter() - started, 2)
+    return totals
+
+def _account(totals, pending, dry_run: bool, started: float):
+    chunk, result_iter = pending
+    updated, failed = _write_results(chunk, list(result_iter), dry_run)
+    totals["documents"] += len(chunk); totals["updated"] += updated; totals["failed"] += failed
+    elapsed = time.perf_counter() - started
+    logger.info(f"Re-extracted {totals['documents']} documents up to id {chunk[-1][0]} "
+                f"({totals['documents'] / elapsed:.0f} docs/s, {totals['failed']} failed)")
+
+# --- CLI entry point ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run regex extraction over stored text for all processed documents.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Documents per read / UPDATE batch")
+    parser.add_argument("--start-after-id", type=int, default=0, help="Resume after this document id")
+    parser.add_argument("--status", action="append", default=None, help="Only documents in this status (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Extract but do not write")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    _init_pool_worker()
+    status_filter = [models.DocumentStatus(s) for s in args.status] if args.status else None
+    totals = reextract_all(args.workers, args.chunk_size, args.start_after_id, status_filter, args.dry_run)
+    rate = totals["documents"] / totals["seconds"] if totals["seconds"] else 0.0
+    logger.info(f"Re-extraction done: {totals['documents']} documents, {totals['updated']} updated, "
+                f"{totals['failed']} failed in {totals['seconds']}s ({rate:.0f} docs/s){' [dry run]' if args.dry_run else ''}")
+
+if __name__ == "__main__":
+    main()
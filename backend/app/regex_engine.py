@@ -0,0 +1,213 @@
+# InsureDocsProject/backend/app/regex_engine.py
+# Single-pass multi-pattern scanner: all configured (label, regex) patterns are merged into one
+# compiled alternation, so a document is scanned once instead of once per pattern.
+#
+# Each alternative starts by consuming one character from the set its pattern can start with (derived
+# from the pattern itself); sre rejects such an alternative with a single character-class test, so at
+# most positions the whole alternation costs a few table lookups. The pattern itself then runs from
+# that position inside a lookbehind/lookahead pair, which captures the full match without consuming it.
+#
+# Results are exactly what one findall per pattern returns (per label: leftmost, non-overlapping),
+# with offsets. Matches of different labels may overlap, e.g. an amount inside a date.
+import re
+import sys
+import logging
+import functools
+from typing import Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    from re import _parser as _sre_parse # Python 3.11+
+    from re import _constants as _sre_const
+except ImportError: # pragma: no cover - Python < 3.11
+    import sre_parse as _sre_parse
+    import sre_constants as _sre_const
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+PatternLike = Union[str, "re.Pattern[str]"]
+
+class ScanMatch(NamedTuple):
+    """One labeled match. value is the pattern's first capture group (whole match if it has none); start/end are its offsets."""
+    label: str
+    value: str
+    start: int
+    end: int
+
+# Flags that can be scoped to one alternative as (?flags:...)
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"), (re.ASCII, "a"))
+
+_LEADING_GLOBAL_FLAGS = re.compile(r"^(?:\(\?[aiLmsux]+\))+") # Already in pattern.flags; only allowed at the very start
+
+_CATEGORY_CLASSES = {
+    _sre_const.CATEGORY_DIGIT: r"\d", _sre_const.CATEGORY_NOT_DIGIT: r"\D",
+    _sre_const.CATEGORY_SPACE: r"\s", _sre_const.CATEGORY_NOT_SPACE: r"\S",
+    _sre_const.CATEGORY_WORD: r"\w", _sre_const.CATEGORY_NOT_WORD: r"\W",
+}
+
+# =====================================
+# First-character analysis
+# =====================================
+_ANY = None # Fragment marker: the pattern can start with (almost) any character here
+
+_MAX_IGNORECASE_RANGE = 256 # Larger case-insensitive ranges are not expanded (treated as unbounded)
+
+@functools.lru_cache(maxsize=1)
+def _case_fold_groups() -> Dict[str, FrozenSet[str]]:
+    """
+    char -> every char IGNORECASE may treat as equal to it (only chars that have any), e.g. 's' -> {s, S, ſ}
+    and 'k' -> {k, K, K}. Built once, on first use, from lower/upper/casefold over all code points (about a second).
+    Multi-character mappings join their first character ('İ'.lower() is 'i' + a combining dot), so the
+    groups are a superset of sre's simple case folding: a wider first-character class only costs speed.
+    """
+    parent: Dict[str, str] = {}
+    def root(char: str) -> str:
+        while parent.get(char, char) != char:
+            char = parent[char]
+        return char
+    for code in range(sys.maxunicode + 1):
+        char = chr(code)
+        for mapped in (char.lower(), char.upper(), char.casefold()):
+            if mapped and mapped != char:
+                a, b = root(char), root(mapped[0])
+                if a != b:
+                    parent.setdefault(b, b)
+                    parent[a] = b
+    groups: Dict[str, set] = {}
+    for char in parent:
+        groups.setdefault(root(char), set()).add(char)
+    return {char: frozenset(group) for group in groups.values() for char in group}
+
+def _case_variants(char: str) -> List[str]:
+    return sorted(_case_fold_groups().get(char, (char,)))
+
+def _class_items(op, av, ignorecase: bool) -> List[Optional[str]]:
+    """Character-class fragments for one parsed single-character item (case-expanded when ignorecase)."""
+    if op is _sre_const.LITERAL:
+        chars = _case_variants(chr(av)) if ignorecase else [chr(av)]
+        return [re.escape(char) for char in chars]
+    if op is _sre_const.RANGE:
+        low, high = av
+        fragments = [f"{re.escape(chr(low))}-{re.escape(chr(high))}"]
+        if ignorecase:
+            if high - low > _MAX_IGNORECASE_RANGE:
+                return [_ANY]
+            extra = {variant for code in range(low, high + 1) for variant in _case_variants(chr(code))}
+            fragments += [re.escape(char) for char in sorted(extra) if not low <= ord(char) <= high]
+        return fragments
+    if op is _sre_const.CATEGORY and av in _CATEGORY_CLASSES:
+        return [_CATEGORY_CLASSES[av]]
+    if op is _sre_const.IN:
+        if any(item_op is _sre_const.NEGATE for item_op, _ in av):
+            return [_ANY]
+        return [fragment for item_op, item_av in av for fragment in _class_items(item_op, item_av, ignorecase)]
+    return [_ANY] # ANY, NOT_LITERAL, backreferences, ...
+
+def _first_chars(items, ignorecase: bool) -> Tuple[List[Optional[str]], bool]:
+    """(class fragments a match of this sequence can start with, whether the sequence can match empty)."""
+    fragments: List[Optional[str]] = []
+    for op, av in items:
+        if op in (_sre_const.AT, _sre_const.ASSERT, _sre_const.ASSERT_NOT):
+            continue # Zero-width: the first consumed character comes after it
+        if op is _sre_const.SUBPATTERN:
+            add_flags, del_flags = av[1], av[2]
+            scoped_ignorecase = (ignorecase or bool(add_flags & re.IGNORECASE)) and not del_flags & re.IGNORECASE
+            sub, nullable = _first_chars(av[-1], scoped_ignorecase)
+        elif op in (_sre_const.MAX_REPEAT, _sre_const.MIN_REPEAT, getattr(_sre_const, "POSSESSIVE_REPEAT", None)):
+            sub, nullable = _first_chars(av[2], ignorecase)
+            nullable = nullable or av[0] == 0
+        elif op is getattr(_sre_const, "ATOMIC_GROUP", None):
+            sub, nullable = _first_chars(av, ignorecase)
+        elif op is _sre_const.BRANCH:
+            sub, nullable = [], False
+            for branch in av[1]:
+                branch_fragments, branch_nullable = _first_chars(branch, ignorecase)
+                sub.extend(branch_fragments)
+                nullable = nullable or branch_nullable
+        else:
+            sub, nullable = _class_items(op, av, ignorecase), False
+        fragments.extend(sub)
+        if not nullable:
+            return fragments, False
+    return fragments, True
+
+def first_char_class(pattern: "re.Pattern[str]") -> Tuple[Optional[str], bool]:
+    """(character class like '[\\d$]' every match starts with - None if unbounded, whether the pattern can match empty)."""
+    fragments, nullable = _first_chars(_sre_parse.parse(pattern.pattern, pattern.flags), bool(pattern.flags & re.IGNORECASE))
+    if nullable or not fragments or _ANY in fragments:
+        return None, nullable
+    return "[" + "".join(dict.fromkeys(fragments)) + "]", False
+
+# =====================================
+# Scanner
+# =====================================
+class RegexScanner:
+    """
+    Compiles (label, pattern) pairs into one pattern and returns labeled matches with offsets in a single pass.
+    Patterns must not be able to match an empty string or use numbered backreferences (groups are renumbered).
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, PatternLike]]):
+        self.labels: List[str] = []
+        self._compiled: List["re.Pattern[str]"] = []
+        self._guards: List[Optional["re.Pattern[str]"]] = [] # First-character test, used when another label matched first
+        self._alternative_by_group: Dict[int, Tuple[int, int]] = {} # Wrapper group index -> (pattern index, value group index)
+        alternatives = []
+        group_index = 0
+        for index, (label, pattern) in enumerate(patterns):
+            compiled = pattern if isinstance(pattern, re.Pattern) else re.compile(pattern)
+            first_class, nullable = first_char_class(compiled)
+            if nullable:
+                raise ValueError(f"Pattern for '{label}' can match an empty string: {compiled.pattern!r}")
+            scoped = "".join(letter for flag, letter in _SCOPED_FLAGS if compiled.flags & flag)
+            source = _LEADING_GLOBAL_FLAGS.sub("", compiled.pattern) + ("\n" if compiled.flags & re.VERBOSE else "") # Ends a trailing comment
+            capture = f"(?{scoped}:(?=({source})))" if scoped else f"(?=({source}))"
+            consume = first_class or "(?s:.)"
+            # Consume the first character (cheap rejection), then step back over it and capture the real match
+            alternatives.append(f"{consume}(?<={capture}{consume})")
+            group_index += 1
+            self._alternative_by_group[group_index] = (index, group_index + 1 if compiled.groups else group_index)
+            group_index += compiled.groups
+            self.labels.append(label)
+            self._compiled.append(compiled)
+            self._guards.append(re.compile(first_class) if first_class else None)
+            if first_class is None:
+                logger.debug(f"Regex scanner: no first-character class for '{label}'; it is tried at every position.")
+        self.pattern = re.compile("|".join(alternatives))
+
+    def finditer(self, text: str) -> Iterator[ScanMatch]:
+        """Yields labeled matches ordered by start (ties in configuration order)."""
+        labels, compiled, guards = self.labels, self._compiled, self._guards
+        count = len(labels)
+        resume = [0] * count # Per label: where its findall would continue (end of its previous match)
+        for hit in self.pattern.finditer(text):
+            position = hit.start()
+            index, value_group = self._alternative_by_group[hit.lastindex] # The wrapper group closes last
+            if position >= resume[index]:
+                resume[index] = hit.end(hit.lastindex)
+                yield self._to_match(labels[index], hit, value_group, hit.lastindex)
+            # The alternation stops at the first pattern matching here; later ones may match here too
+            for other in range(index + 1, count):
+                if position < resume[other] or (guards[other] is not None and not guards[other].match(text, position)):
+                    continue
+                match = compiled[other].match(text, position)
+                if match:
+                    resume[other] = match.end()
+                    yield self._to_match(labels[other], match, 1 if compiled[other].groups else 0, 0)
+
+    @staticmethod
+    def _to_match(label: str, match: "re.Match[str]", value_group: int, whole_group: int) -> ScanMatch:
+        start, end = match.span(value_group)
+        if start < 0: # Optional first group that did not take part (findall reports '')
+            return ScanMatch(label, "", *match.span(whole_group))
+        return ScanMatch(label, match.string[start:end], start, end)
+
+    def scan(self, text: str) -> List[ScanMatch]:
+        return list(self.finditer(text))
+
+    def values_by_label(self, text: str) -> Dict[str, List[str]]:
+        """Matched values per label in text order (every label present, possibly empty) - what findall returns per pattern."""
+        found: Dict[str, List[str]] = {label: [] for label in self.labels}
+        for match in self.finditer(text):
+            found[match.label].append(match.value)
+        return found
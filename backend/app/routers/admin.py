@@ -1,12 +1,14 @@
 # InsureDocsProject/backend/app/routers/admin.py
-from fastapi import APIRouter, Depends
-# from .. import schemas, models, dependencies, crud
-# from ..database import get_db
-# from sqlalchemy.orm import Session
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status
+from .. import crud, models, dependencies, job_queue, ner_utils, ocr_utils, reaper
+from ..database import get_db
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
-    # dependencies=[Depends(dependencies.get_current_admin_user)], # Secure all routes here
-    # tags=["Admin Actions"] # Optional: If you include this router in main.py
+    dependencies=[Depends(dependencies.get_current_admin_user)], # Secure all routes here
 )
 
 # Example placeholder:
@@ -16,7 +18,74 @@ async def get_admin_dashboard_summary(
 ):
     return {"message": "Admin dashboard summary data will go here."}
 
+# --- Job Recovery (Reaper) ---
+@router.get("/reaper/metrics", summary="Stuck-job reaper metrics")
+def get_reaper_metrics(db: Session = Depends(get_db)):
+    """
+    Reaper counters for this API process (cumulative since start), the current recovery
+    backlog (expired leases, orphaned documents) and job counts by status.
+    """
+    return {
+        "reaper": reaper.get_metrics(),
+        "backlog": reaper.get_backlog_gauges(db),
+        "jobs": job_queue.get_job_status_counts(db),
+    }
+
+@router.post("/reaper/run", summary="Run a reaper pass now")
+def run_reaper_now():
+    """Re-queues expired leases / orphaned documents immediately instead of waiting for the next tick."""
+    return reaper.run_reaper_once()
+
+# --- NER Stage ---
+@router.get("/ner/metrics", summary="NER stage throughput")
+def get_ner_metrics():
+    """
+    Batched NER throughput of this process (cumulative since start: batches, docs, chars, seconds,
+    docs/sec). Standalone workers log the same figures per batch.
+    """
+    return {"ner": ner_utils.get_metrics()}
+
+# --- OCR Result Cache ---
+@router.get("/ocr-cache/metrics", summary="OCR result cache hit rates")
+def get_ocr_cache_metrics():
+    """
+    Document/page hits and misses and evictions of this process's OCR cache (cumulative since start),
+    with its current and maximum size in bytes (total_bytes is -1 until this process first writes).
+    Standalone workers log the same figures after each document.
+    """
+    return {"ocr_cache": ocr_utils.get_ocr_cache_metrics()}
+
+# --- Processing Cancellation ---
+CANCELLABLE_STATUSES = [ # Waiting on / in a pipeline stage
+    models.DocumentStatus.UPLOADED, models.DocumentStatus.OCR_PENDING, models.DocumentStatus.OCR_PROCESSING,
+    models.DocumentStatus.OCR_COMPLETED, models.DocumentStatus.EXTRACT_PENDING, models.DocumentStatus.EXTRACT_PROCESSING,
+]
+
+@router.post("/documents/{doc_id}/cancel", summary="Cancel a document's processing")
+def cancel_document_processing(doc_id: int, db: Session = Depends(get_db)):
+    """
+    Queued jobs are cancelled immediately (document -> cancelled). A running job is flagged; its worker
+    stops it within JOB_CANCEL_POLL_SECONDS plus the current page, and records the cancelled status itself.
+    """
+    db_doc = crud.get_document_by_id(db, doc_id)
+    if not db_doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    counts = job_queue.request_cancel(db, doc_id)
+    if not any(counts.values()):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Document has no queued or running job (status {db_doc.status.value}).")
+    if not counts["running_flagged"]:
+        # Nothing is running that would record the outcome, so do it here
+        db.query(models.Document).filter(
+            models.Document.id == doc_id,
+            models.Document.status.in_(CANCELLABLE_STATUSES),
+        ).update({models.Document.status: models.DocumentStatus.CANCELLED}, synchronize_session=False)
+        db.commit()
+        crud.copy_results_to_duplicates(db, doc_id)
+    logger.warning(f"[Task {doc_id}] Processing cancelled by admin: {counts}")
+    db.refresh(db_doc)
+    return {"document_id": doc_id, "status": db_doc.status, **counts}
+
 # You would add endpoints here like:
 # - Approve/Reject documents
 # - View audit logs (if implemented)
-# - More detailed user management actions
\ No newline at end of file
+# - More detailed user management actions
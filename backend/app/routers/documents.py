@@ -4,7 +4,8 @@ import uuid
 import os
 import traceback
 import logging
-import pytesseract
+import zipfile
+import hashlib
 
 from fastapi import (
     APIRouter,
@@ -14,16 +15,18 @@ from fastapi import (
     File,
     status,
     Response,
-    BackgroundTasks
+    Request
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Tuple
 
 # Use relative imports
 try:
-    from .. import crud, schemas, models, dependencies, ocr_utils, extraction_utils
-    from ..database import get_db, SessionLocal
+    from .. import crud, schemas, models, dependencies, ocr_utils, ocr_checkpoint, job_queue, job_scheduler, admission, extraction_utils, upload_stream
+    from ..database import get_db
     from ..config import settings
 except ImportError as import_err:
     print(f"CRITICAL IMPORT ERROR in documents.py: {import_err}")
@@ -34,150 +37,272 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # =====================================
-# Background Task Function (OCR + Extraction)
+# API Endpoint Definitions
 # =====================================
-def run_ocr_and_extraction_task(doc_id: int):
-    """Background task: OCR -> Read Text -> Regex Extract -> Update DB"""
-    logger.info(f"[BG Task Start doc_id={doc_id}] Starting OCR & Extraction process.")
-    db: Optional[Session] = None
-    ocr_success = False
-    extraction_success = False
-    final_status = models.DocumentStatus.EXTRACT_FAILED # Default unless completely successful
-    extracted_text_relative_path = None
-    extracted_metadata = None
 
-    try:
-        # --- Phase 1: OCR ---
-        db = SessionLocal()
-        # 1a. Get Doc & Validate State
-        db_doc = crud.get_document_by_id(db, doc_id)
-        if not db_doc: logger.error(f"[BG Task {doc_id}] ERROR: Doc not found."); return
-        valid_start_statuses = [
-            models.DocumentStatus.UPLOADED, models.DocumentStatus.OCR_PENDING,
-            models.DocumentStatus.OCR_FAILED, models.DocumentStatus.EXTRACT_FAILED # Allow reprocessing
-        ]
-        if db_doc.status not in valid_start_statuses: logger.info(f"[BG Task {doc_id}] INFO: Doc status ({db_doc.status}) not suitable for reprocessing. Skipping."); return
-        if not db_doc.file_path_on_disk or not db_doc.stored_filename:
-             logger.error(f"[BG Task {doc_id}] ERROR: Doc missing paths. Setting OCR_FAILED.");
-             crud.update_document_status(db, doc_id, models.DocumentStatus.OCR_FAILED); return
-
-        # 1b. Update status to OCR_PROCESSING
-        crud.update_document_status(db, doc_id=doc_id, new_status=models.DocumentStatus.OCR_PROCESSING)
-        logger.info(f"[BG Task {doc_id}] Status -> OCR_PROCESSING.")
-
-        # 1c. Determine Paths
-        pdf_full_path = ocr_utils.get_full_pdf_path(db_doc.file_path_on_disk)
-        text_output_full_path = ocr_utils.get_output_text_path(db_doc.stored_filename)
-
-        # --- 1d. Perform OCR ---
-        # ocr_utils.perform_ocr_on_pdf handles internal errors and raises on failure
-        saved_text_full_path = ocr_utils.perform_text_extract_or_ocr(doc_id, pdf_full_path, text_output_full_path)
-        extracted_text_relative_path = os.path.basename(saved_text_full_path)
-        ocr_success = True
-        # Update status immediately after successful OCR (ready for extraction)
-        crud.update_document_ocr_results(db, doc_id=doc_id, text_path=extracted_text_relative_path, new_status=models.DocumentStatus.OCR_COMPLETED)
-        logger.info(f"[BG Task {doc_id}] OCR successful. Status -> OCR_COMPLETED. Text path stored: {extracted_text_relative_path}")
-
-        # === Phase 2: Extraction (Regex) ===
-        # 2a. Set status to EXTRACT_PROCESSING
-        crud.update_document_status(db, doc_id=doc_id, new_status=models.DocumentStatus.EXTRACT_PROCESSING)
-        logger.info(f"[BG Task {doc_id}] Status -> EXTRACT_PROCESSING.")
-
-        # 2b. Read the extracted text content
-        logger.info(f"[BG Task {doc_id}] Reading text file for extraction: {text_output_full_path}")
-        with open(text_output_full_path, "r", encoding="utf-8") as f:
-            ocr_text_content = f.read()
-
-        # 2c. Apply Regex Extraction
-        logger.info(f"[BG Task {doc_id}] Applying regex extraction...")
-        # Calls your function in extraction_utils.py
-        extracted_metadata = extraction_utils.extract_information_with_regex(ocr_text_content)
-        extraction_success = True
-        # Assuming successful extraction is the final "good" state for now
-        final_status = models.DocumentStatus.EXTRACT_COMPLETED
-        logger.info(f"[BG Task {doc_id}] Regex extraction successful. Status -> {final_status}. Metadata keys: {list(extracted_metadata.keys()) if extracted_metadata else 'None'}")
-
-    except FileNotFoundError as fnf_err:
-        logger.error(f"[BG Task {doc_id}] ERROR: File not found during process: {fnf_err}", exc_info=True)
-        final_status = models.DocumentStatus.OCR_FAILED if not ocr_success else models.DocumentStatus.EXTRACT_FAILED
-    except pytesseract.TesseractNotFoundError as tess_err:
-        logger.critical(f"[BG Task {doc_id}] CRITICAL ERROR: Tesseract engine misconfiguration: {tess_err}")
-        final_status = models.DocumentStatus.OCR_FAILED
-    except Exception as e:
-        logger.error(f"[BG Task {doc_id}] ERROR: Unhandled exception during processing: {e}", exc_info=True)
-        # Determine failure point based on flags
-        final_status = models.DocumentStatus.OCR_FAILED if not ocr_success else models.DocumentStatus.EXTRACT_FAILED
+# --- Copying to disk (bulk upload: plain files and ZIP members, already spooled by Starlette) ---
+UPLOAD_COPY_CHUNK_BYTES = 1024 * 1024
 
-    finally:
-        # --- Final DB Update ---
-        if db:
-            try:
-                 final_check_doc = crud.get_document_by_id(db, doc_id)
-                 if final_check_doc:
-                    logger.info(f"[BG Task Update {doc_id}] Updating final status to {final_status}")
-                    if extraction_success:
-                         crud.update_document_extraction_results(db, doc_id=doc_id, metadata=extracted_metadata, new_status=final_status)
-                    else:
-                         # Update status only, leave metadata as is (likely None or old value)
-                         crud.update_document_status(db, doc_id=doc_id, new_status=final_status)
-                         # If OCR succeeded but extraction failed, text_path should still be there from previous update
-                 else:
-                     logger.warning(f"[BG Task Update {doc_id}] Doc deleted before final update.")
-            except Exception as db_update_err:
-                logger.critical(f"[BG Task Update {doc_id}] CRITICAL ERROR on final DB update: {db_update_err}", exc_info=True)
-            finally:
-                 db.close()
-        else: logger.error(f"[BG Task End {doc_id}] ERROR: No DB Session available.")
-        logger.info(f"[BG Task End doc_id={doc_id}] Processing finished.")
+def _stream_to_disk(source, dest_path: str, max_bytes: int) -> Tuple[int, str]:
+    """Streams source to dest_path in chunks; returns (bytes written, SHA-256 hex). Raises UploadTooLarge above max_bytes (0 = no limit)."""
+    written = 0
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as out:
+        while chunk := source.read(UPLOAD_COPY_CHUNK_BYTES):
+            written += len(chunk)
+            if max_bytes and written > max_bytes: # Declared sizes (headers, ZIP directory) can lie; enforce on the actual bytes
+                raise upload_stream.UploadTooLarge("File too large.")
+            digest.update(chunk)
+            out.write(chunk)
+    return written, digest.hexdigest()
 
-# =====================================
-# API Endpoint Definitions
-# =====================================
+def _link_duplicate(db: Session, canonical: models.Document, original_filename: str, content_type: Optional[str], owner: models.User) -> models.Document:
+    """
+    Creates a Document for a re-upload of canonical's bytes (no commit, no job for it). If canonical's
+    processing had failed, canonical is queued once more; the duplicate picks up whatever it produces.
+    """
+    db_doc = crud.create_duplicate_document(db, canonical, original_filename, content_type, owner.id)
+    if canonical.status in crud.DEDUP_FAILED_STATUSES and canonical.status not in crud.DEDUP_NO_RETRY_STATUSES:
+        retry_extract = canonical.status == models.DocumentStatus.EXTRACT_FAILED and canonical.extracted_text_path
+        canonical.status = models.DocumentStatus.EXTRACT_PENDING if retry_extract else models.DocumentStatus.OCR_PENDING
+        job_queue.enqueue(
+            db, document_id=canonical.id, commit=False,
+            kind=job_queue.JOB_KIND_EXTRACT if retry_extract else job_queue.JOB_KIND_OCR,
+            owner_id=canonical.owner_id,
+            estimated_cost=settings.JOB_COST_EXTRACT if retry_extract else job_scheduler.estimate_processing_cost(ocr_utils.get_full_pdf_path(canonical.file_path_on_disk)),
+            priority=job_scheduler.priority_for_role(owner.role),
+        )
+        logger.info(f"Duplicate upload of failed doc_id={canonical.id}: re-queued it ({canonical.status})")
+    return db_doc
 
-@router.post("/", response_model=schemas.Document, status_code=status.HTTP_201_CREATED)
+# The single upload endpoint reads the body itself (upload_stream), so its form is declared for the OpenAPI docs by hand
+SINGLE_UPLOAD_OPENAPI = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary", "description": "The PDF document file to upload."}},
+}}}}}
+
+@router.post("/", response_model=schemas.Document, status_code=status.HTTP_201_CREATED, openapi_extra=SINGLE_UPLOAD_OPENAPI)
 async def upload_new_document(
-    file: UploadFile = File(..., description="The PDF document file to upload."),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
+    request: Request,
     current_user: models.User = Depends(dependencies.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Uploads PDF, saves file, creates DB record, queues background processing."""
-    logger.info(f"User {current_user.email} starting upload for file: {file.filename or 'Unknown'}")
-    if not file.filename: raise HTTPException(status_code=400, detail="Filename missing.")
-    original_fn = file.filename; stored_fn_on_disk, file_path_on_disk_full = None, None # Init
+    """
+    Uploads PDF, saves file, creates DB record, queues a processing job for the workers.
+    The multipart body is streamed straight to its final path (hashed on the way, 413 as soon as it
+    exceeds MAX_UPLOAD_MB); the PDF inspection and DB work then run in the threadpool, not on the event loop.
+    """
+    logger.info(f"User {current_user.email} starting upload")
+    max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
+    stored_fn_on_disk = f"{uuid.uuid4()}.pdf"
+    file_path_on_disk_full = ocr_utils.get_full_pdf_path(stored_fn_on_disk)
+    try:
+        upload = await upload_stream.receive_file_upload(request, "file", file_path_on_disk_full, max_bytes)
+    except upload_stream.UploadTooLarge:
+        logger.warning(f"Upload by {current_user.email} aborted: exceeds {settings.MAX_UPLOAD_MB} MB")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File too large (limit {settings.MAX_UPLOAD_MB} MB).")
+    except upload_stream.InvalidUpload as invalid:
+        raise HTTPException(status_code=400, detail=str(invalid))
+    logger.info(f"File '{upload.filename}' saved to {file_path_on_disk_full} ({upload.size_bytes} bytes, sha256 {upload.sha256})")
+    return await run_in_threadpool(_register_upload, db, current_user, upload, stored_fn_on_disk, file_path_on_disk_full)
+
+def _register_upload(db: Session, current_user: models.User, upload: upload_stream.StreamedUpload, stored_fn_on_disk: str, file_path_on_disk_full: str):
+    """Creates the Document (or a duplicate of the canonical one) for a file already on disk and queues its job. Removes the file on failure."""
+    original_fn = upload.filename
     try:
-        _, file_extension = os.path.splitext(original_fn); file_extension = file_extension.lower()
-        if file_extension != ".pdf": raise HTTPException(status_code=400, detail="Invalid file type (PDF only).")
-        stored_fn_on_disk = f"{uuid.uuid4()}{file_extension}"
-        file_path_on_disk_full = ocr_utils.get_full_pdf_path(stored_fn_on_disk)
-        logger.info(f"Saving '{original_fn}' as '{stored_fn_on_disk}'")
-        with open(file_path_on_disk_full, "wb") as buffer:
-            while content := await file.read(1024 * 1024): buffer.write(content)
-        logger.info(f"File saved to {file_path_on_disk_full}")
-        file_size_kb = round(os.path.getsize(file_path_on_disk_full) / 1024)
-        doc_create_data = schemas.DocumentCreate(original_filename=original_fn, content_type=file.content_type or "application/pdf", size_kb=file_size_kb)
-        db_doc_created = crud.create_document_db(db, doc_create_data, current_user.id, stored_fn_on_disk, stored_fn_on_disk)
+        file_size_kb = round(upload.size_bytes / 1024)
+        content_type = upload.content_type or "application/pdf"
+        content_sha256 = upload.sha256
+        # Same bytes uploaded before: reuse that document's file and results instead of processing again
+        canonical = crud.get_canonical_document_by_sha256(db, content_sha256)
+        db_doc_created = None
+        if canonical is None:
+            # Admission control: only new content adds processing work (a duplicate reuses canonical's results)
+            try:
+                admission.check_upload(db, owner_id=current_user.id, incoming_bytes=upload.size_bytes)
+            except admission.AdmissionRejected as rejected:
+                logger.warning(f"Upload by {current_user.email} rejected: {rejected.reason} Retry-After {rejected.retry_after_seconds}s")
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=rejected.reason,
+                                    headers={"Retry-After": str(rejected.retry_after_seconds)})
+            doc_create_data = schemas.DocumentCreate(original_filename=original_fn, content_type=content_type, size_kb=file_size_kb)
+            try:
+                db_doc_created = crud.create_document_db(db, doc_create_data, current_user.id, stored_fn_on_disk, stored_fn_on_disk, content_sha256=content_sha256)
+            except IntegrityError: # A concurrent upload of the same bytes committed first
+                db.rollback()
+                canonical = crud.get_canonical_document_by_sha256(db, content_sha256)
+                if canonical is None: raise
+        if canonical is not None:
+            os.remove(file_path_on_disk_full); stored_fn_on_disk = None
+            db_doc_dup = _link_duplicate(db, canonical, original_fn, content_type, current_user)
+            db.commit()
+            db.refresh(db_doc_dup)
+            logger.info(f"Upload '{original_fn}' is a duplicate of doc_id={canonical.id}; doc_id={db_doc_dup.id} created with status {db_doc_dup.status}, nothing queued")
+            return db_doc_dup
         if not db_doc_created or not db_doc_created.id: raise HTTPException(status_code=500, detail="Failed to save document record.")
         created_doc_id = db_doc_created.id
         logger.info(f"DB record created ID: {created_doc_id}, Status: {db_doc_created.status}")
-        # Add combined task to background
-        background_tasks.add_task(run_ocr_and_extraction_task, doc_id=created_doc_id)
-        logger.info(f"Background task queued for doc_id={created_doc_id}")
-        # Update status to PENDING right away (DB commit is handled by CRUD func)
-        db_doc_updated = crud.update_document_status(db, doc_id=created_doc_id, new_status=models.DocumentStatus.OCR_PENDING)
+        # Update status to PENDING and queue the processing job in one commit; a worker picks it up
+        db_doc_created.status = models.DocumentStatus.OCR_PENDING
+        job_queue.enqueue(
+            db, document_id=created_doc_id, commit=False,
+            owner_id=current_user.id,
+            estimated_cost=job_scheduler.estimate_processing_cost(file_path_on_disk_full), # Shortest jobs lease first
+            priority=job_scheduler.priority_for_role(current_user.role),
+        )
+        db.commit()
+        db.refresh(db_doc_created)
+        db_doc_updated = db_doc_created
+        logger.info(f"Processing job queued for doc_id={created_doc_id}")
         response_doc = db_doc_updated if db_doc_updated else db_doc_created
         logger.info(f"Upload endpoint finished for doc_id={created_doc_id}. Returning status: {response_doc.status if response_doc else 'Unknown'}")
         return response_doc
     except Exception as e:
-        logger.error(f"Exception during upload by user {current_user.email}: {e}", exc_info=True)
         if stored_fn_on_disk and os.path.exists(file_path_on_disk_full):
              try: os.remove(file_path_on_disk_full); logger.info(f"Cleaned up file: {file_path_on_disk_full}")
              except OSError as rm_err: logger.error(f"Error cleaning up file {file_path_on_disk_full}: {rm_err}")
+        if isinstance(e, HTTPException): raise
+        logger.error(f"Exception during upload by user {current_user.email}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Server error during upload.")
+
+
+
+# --- Bulk Upload ---
+class _BulkEntry:
+    """One PDF to ingest from a bulk request: a plain uploaded file or a member of an uploaded ZIP."""
+    def __init__(self, display_name: str, original_filename: str, open_stream):
+        self.display_name = display_name
+        self.original_filename = original_filename
+        self.open_stream = open_stream # () -> binary file object positioned at the start of the PDF
+
+def _plan_bulk_entries(files: List[UploadFile], results: List[schemas.BulkUploadItem], archives: List[zipfile.ZipFile]) -> List["_BulkEntry"]:
+    """Lists the PDFs in the request (reading only ZIP central directories); non-PDFs are reported as skipped."""
+    entries = []
+    max_member_bytes = settings.BULK_MAX_MEMBER_MB * 1024 * 1024
+    for upload in files:
+        name = upload.filename or "unnamed"
+        extension = os.path.splitext(name)[1].lower()
+        if extension == ".pdf":
+            def open_upload(upload=upload):
+                upload.file.seek(0)
+                return upload.file
+            entries.append(_BulkEntry(name, name, open_upload))
+        elif extension == ".zip":
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile:
+                results.append(schemas.BulkUploadItem(filename=name, status="failed", detail="Not a valid ZIP archive.")); continue
+            archives.append(archive)
+            for info in archive.infolist():
+                member_name = f"{name}/{info.filename}"
+                base_name = os.path.basename(info.filename)
+                if info.is_dir() or info.filename.startswith("__MACOSX/") or base_name.startswith("."):
+                    continue # Directory entries and OS metadata files
+                if os.path.splitext(base_name)[1].lower() != ".pdf":
+                    results.append(schemas.BulkUploadItem(filename=member_name, status="skipped", detail="Not a PDF.")); continue
+                if info.file_size > max_member_bytes:
+                    results.append(schemas.BulkUploadItem(filename=member_name, status="failed", detail="File too large.")); continue
+                entries.append(_BulkEntry(member_name, base_name, lambda archive=archive, info=info: archive.open(info)))
+        else:
+            results.append(schemas.BulkUploadItem(filename=name, status="skipped", detail="Not a PDF or ZIP file."))
+    return entries
+
+@router.post("/bulk", response_model=schemas.BulkUploadResponse, status_code=status.HTTP_201_CREATED)
+def upload_documents_bulk(
+    files: List[UploadFile] = File(..., description="PDF files and/or ZIP archives of PDFs."),
+    current_user: models.User = Depends(dependencies.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Ingests many PDFs in one request: ZIPs are unpacked straight to disk member by member, all
+    Document rows and their processing jobs are inserted in one transaction, and per-file results are returned.
+    (Sync endpoint: runs in the threadpool, so the disk work does not block the event loop.)
+    """
+    results: List[schemas.BulkUploadItem] = []
+    archives: List[zipfile.ZipFile] = []
+    written_paths: List[str] = []
+    try:
+        entries = _plan_bulk_entries(files, results, archives)
+        logger.info(f"User {current_user.email} bulk upload: {len(files)} uploads, {len(entries)} PDFs")
+        if len(entries) > settings.BULK_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"Too many PDFs in one request ({len(entries)} > {settings.BULK_MAX_FILES}).")
+
+        # 1. Write every PDF to disk (per-file failures are reported, not fatal)
+        max_bytes = settings.BULK_MAX_MEMBER_MB * 1024 * 1024
+        priority = job_scheduler.priority_for_role(current_user.role)
+        staged = [] # (entry, document dict, job dict without document_id)
+        duplicates = [] # (entry, canonical Document, or index into staged for a repeat within this request)
+        staged_by_sha256 = {}
+        for entry in entries:
+            stored_fn = f"{uuid.uuid4()}.pdf"
+            full_path = ocr_utils.get_full_pdf_path(stored_fn)
+            try:
+                with entry.open_stream() as source:
+                    size_bytes, content_sha256 = _stream_to_disk(source, full_path, max_bytes)
+            except Exception as write_err:
+                if os.path.exists(full_path): os.remove(full_path)
+                logger.warning(f"Bulk upload: could not store '{entry.display_name}': {write_err}")
+                results.append(schemas.BulkUploadItem(filename=entry.display_name, status="failed", detail=str(write_err)))
+                continue
+            # Bytes seen before (earlier upload or earlier in this request): keep no second copy, queue nothing
+            canonical = staged_by_sha256.get(content_sha256)
+            if canonical is None:
+                canonical = crud.get_canonical_document_by_sha256(db, content_sha256)
+            if canonical is not None:
+                os.remove(full_path)
+                duplicates.append((entry, canonical))
+                continue
+            written_paths.append(full_path)
+            staged_by_sha256[content_sha256] = len(staged)
+            staged.append((
+                entry,
+                {"original_filename": entry.original_filename, "content_type": "application/pdf",
+                 "size_kb": round(size_bytes / 1024), "stored_filename": stored_fn, "content_sha256": content_sha256},
+                {"owner_id": current_user.id, "priority": priority,
+                 "estimated_cost": job_scheduler.estimate_processing_cost(full_path)},
+            ))
+
+        # 2. Admission control on the new content only (duplicates queue nothing); the finally removes the written files
+        if staged:
+            try:
+                admission.check_upload(db, owner_id=current_user.id, incoming_documents=len(staged),
+                                       incoming_bytes=sum(doc["size_kb"] * 1024 for _, doc, _ in staged))
+            except admission.AdmissionRejected as rejected:
+                logger.warning(f"Bulk upload by {current_user.email} rejected: {rejected.reason} Retry-After {rejected.retry_after_seconds}s")
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=rejected.reason,
+                                    headers={"Retry-After": str(rejected.retry_after_seconds)})
+
+        # 3. One transaction for all Document rows and their jobs
+        if staged or duplicates:
+            db_docs = crud.create_documents_bulk(db, [doc for _, doc, _ in staged], owner_id=current_user.id) if staged else []
+            jobs = [dict(job, document_id=db_doc.id) for (_, _, job), db_doc in zip(staged, db_docs)]
+            if jobs:
+                job_queue.enqueue_many(db, jobs, commit=False)
+            db_dups = [
+                _link_duplicate(db, db_docs[canonical] if isinstance(canonical, int) else canonical, entry.original_filename, "application/pdf", current_user)
+                for entry, canonical in duplicates
+            ]
+            db.commit()
+            for (entry, doc, _), db_doc in zip(staged, db_docs):
+                results.append(schemas.BulkUploadItem(filename=entry.display_name, status="queued", document_id=db_doc.id, size_kb=doc["size_kb"]))
+            for (entry, _), db_doc in zip(duplicates, db_dups):
+                results.append(schemas.BulkUploadItem(filename=entry.display_name, status="deduplicated", document_id=db_doc.id, size_kb=db_doc.size_kb,
+                                                      detail=f"Same content as document {db_doc.duplicate_of_id}."))
+        written_paths = [] # Committed: keep the files
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Exception during bulk upload by user {current_user.email}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Server error during bulk upload.")
     finally:
-        if file and hasattr(file, 'close') and callable(file.close):
-            try: await file.close()
-            except Exception as close_err: logger.warning(f"Error closing upload file handle: {close_err}")
+        for archive in archives: archive.close()
+        for path in written_paths: # Only non-empty if the request failed before commit
+            try: os.remove(path)
+            except OSError as rm_err: logger.error(f"Error cleaning up file {path}: {rm_err}")
+
+    counts = {state: sum(1 for r in results if r.status == state) for state in ("queued", "deduplicated", "skipped", "failed")}
+    logger.info(f"Bulk upload by {current_user.email} finished: {counts}")
+    return schemas.BulkUploadResponse(**counts, results=results)
 
 
 # --- Other Document Endpoints ---
@@ -203,6 +328,20 @@ async def get_dashboard_statistics(current_user: models.User=Depends(dependencie
     needs_review_count = crud.get_needs_review_doc_count(db, owner_id=owner_id_filter)
     return schemas.DashboardStats(total_documents=total_docs, recent_uploads_30_days=recent_uploads, pending_ocr_count=pending_ocr, processing_ocr_count=processing_ocr, pending_extraction_count=pending_extraction, processing_extraction_count=processing_extraction, needs_review_count=needs_review_count, approved_count=approved_count)
 
+@router.get("/entities/search", response_model=List[schemas.EntityMatch])
+async def search_documents_by_entity(label: str, value: str, skip: int=0, limit: int=50, current_user: models.User=Depends(dependencies.get_current_active_user), db: Session=Depends(get_db)):
+    """
+    Documents mentioning an extracted value, e.g. ?label=POLICY_NUMBER&value=ABC-123456 (one result per document page).
+    value is normalized like stored values (extraction_utils.normalize_entity_value), so 'abc_123456' matches too.
+    """
+    label = label.strip().upper()
+    if label not in extraction_utils.ENTITY_LABELS.values():
+        raise HTTPException(status_code=400, detail=f"Unknown entity label. Use one of: {', '.join(extraction_utils.ENTITY_LABELS.values())}")
+    if not 0 < limit <= 500: raise HTTPException(status_code=400, detail="limit must be between 1 and 500.")
+    owner_id_filter = current_user.id if current_user.role != models.UserRole.ADMIN else None
+    normalized = extraction_utils.normalize_entity_value(label, value)
+    return crud.find_entity_matches(db, label=label, normalized_value=normalized, owner_id=owner_id_filter, skip=max(skip, 0), limit=limit)
+
 @router.get("/{doc_id}", response_model=schemas.Document)
 async def read_single_document_details(doc_id: int, current_user: models.User=Depends(dependencies.get_current_active_user), db: Session=Depends(get_db)):
     db_doc = crud.get_document_by_id(db, doc_id=doc_id)
@@ -210,6 +349,15 @@ async def read_single_document_details(doc_id: int, current_user: models.User=De
     if current_user.role != models.UserRole.ADMIN and db_doc.owner_id != current_user.id: raise HTTPException(status_code=403, detail="Not authorized")
     return db_doc # Response model 'Document' includes extracted_metadata
 
+@router.get("/{doc_id}/progress", response_model=schemas.DocumentProgress)
+async def read_document_progress(doc_id: int, current_user: models.User=Depends(dependencies.get_current_active_user), db: Session=Depends(get_db)):
+    """Pages processed so far for a document's text extraction (for progress bars / polling)."""
+    db_doc = crud.get_document_by_id(db, doc_id=doc_id)
+    if not db_doc: raise HTTPException(status_code=404, detail="Document not found")
+    if current_user.role != models.UserRole.ADMIN and db_doc.owner_id != current_user.id: raise HTTPException(status_code=403, detail="Not authorized")
+    percent = round(100.0 * db_doc.pages_done / db_doc.pages_total, 1) if db_doc.pages_total else None
+    return schemas.DocumentProgress(id=db_doc.id, status=db_doc.status, pages_done=db_doc.pages_done, pages_total=db_doc.pages_total, percent_complete=percent)
+
 @router.get("/{doc_id}/download", response_class=FileResponse)
 async def download_document_file(doc_id: int, current_user: models.User=Depends(dependencies.get_current_active_user), db: Session=Depends(get_db)):
     db_doc = crud.get_document_by_id(db, doc_id=doc_id)
@@ -234,13 +382,21 @@ async def delete_single_document_by_admin(doc_id: int, db: Session=Depends(get_d
     logger.info(f"Admin {current_admin_user.email} attempting delete for doc_id={doc_id}")
     db_doc = crud.get_document_by_id(db, doc_id)
     if not db_doc: raise HTTPException(status_code=404, detail="Document not found.")
-    pdf_path = ocr_utils.get_full_pdf_path(db_doc.file_path_on_disk)
-    txt_path = None
-    if db_doc.extracted_text_path: txt_path = os.path.join(ocr_utils.TEXT_OUTPUT_DIR, db_doc.extracted_text_path)
+    pdf_rel_path, txt_rel_path = db_doc.file_path_on_disk, db_doc.extracted_text_path
+    ckpt_path = ocr_checkpoint.checkpoint_path_for(ocr_utils.get_output_text_path(db_doc.stored_filename))
+    # Deduplicated uploads share files: a canonical document hands them (and its role) to its oldest duplicate
+    successor = crud.detach_duplicates(db, db_doc) if db_doc.duplicate_of_id is None else None
     deleted_db = crud.delete_document_db(db, doc_id=doc_id)
     if not deleted_db: raise HTTPException(status_code=500, detail="DB delete failed.")
     logger.info(f"Deleted DB record for doc_id={doc_id}")
-    for file_path in [pdf_path, txt_path]: # Attempt to delete both files
+    if successor is not None and successor.status == models.DocumentStatus.OCR_PENDING:
+        # It was waiting on the deleted document's processing (whose jobs went with it): process it itself
+        job_queue.enqueue(db, document_id=successor.id, owner_id=successor.owner_id,
+                          estimated_cost=job_scheduler.estimate_processing_cost(ocr_utils.get_full_pdf_path(successor.file_path_on_disk)))
+    pdf_path = None if crud.is_file_referenced(db, file_path_on_disk=pdf_rel_path) else ocr_utils.get_full_pdf_path(pdf_rel_path)
+    txt_path = None
+    if txt_rel_path and not crud.is_file_referenced(db, extracted_text_path=txt_rel_path): txt_path = os.path.join(ocr_utils.TEXT_OUTPUT_DIR, txt_rel_path)
+    for file_path in [pdf_path, txt_path, ckpt_path]: # Attempt to delete unshared files (incl. any leftover OCR checkpoint)
         if file_path and os.path.exists(file_path):
             try: os.remove(file_path); logger.info(f"Deleted file: {file_path}")
             except OSError as e: logger.error(f"Error deleting file {file_path}: {e}")
@@ -50,6 +50,13 @@ class DocumentCreate(DocumentBase):
 class DocumentUpdate(BaseModel): # Primarily for updating status
     status: Optional[DocumentStatus] = None
 
+class NERMention(BaseModel): # One NER occurrence; start/end are character offsets in the document's text file
+    label: str
+    value: str
+    page: Optional[int] = None
+    start: int
+    end: int
+
 class Document(DocumentBase): # Detailed Document response
     id: int
     stored_filename: str
@@ -59,6 +66,45 @@ class Document(DocumentBase): # Detailed Document response
     owner_id: int
     extracted_text_path: Optional[str] = None # Relative filename
     extracted_metadata: Optional[Dict[str, Any]] = None # NER results included
+    pages_total: Optional[int] = None
+    pages_done: Optional[int] = None
+    content_sha256: Optional[str] = None
+    duplicate_of_id: Optional[int] = None # Set when the upload matched an earlier document's content
+    peak_rss_mb: Optional[int] = None # Peak worker memory during OCR
+    ner_entities: Optional[Dict[str, List[str]]] = None # NER stage output (None until it has run)
+    ner_mentions: Optional[List[NERMention]] = None # Same, per occurrence with page number and character offsets
+    model_config = {"from_attributes": True}
+
+class DocumentProgress(BaseModel): # Lightweight polling response for text extraction progress
+    id: int
+    status: DocumentStatus
+    pages_done: Optional[int] = None
+    pages_total: Optional[int] = None
+    percent_complete: Optional[float] = None
+    model_config = {"from_attributes": True}
+
+class BulkUploadItem(BaseModel): # Per-file outcome of a bulk upload
+    filename: str # Upload filename, or "archive.zip/member.pdf" for ZIP members
+    status: str # "queued", "deduplicated" (same content as an existing document), "skipped" (not a PDF) or "failed"
+    document_id: Optional[int] = None
+    size_kb: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    queued: int
+    deduplicated: int = 0
+    skipped: int
+    failed: int
+    results: List[BulkUploadItem]
+
+class EntityMatch(BaseModel): # One document_entities row found by an entity lookup
+    document_id: int
+    original_filename: str
+    status: DocumentStatus
+    label: str
+    normalized_value: str
+    raw_value: str
+    page: Optional[int] = None
     model_config = {"from_attributes": True}
 
 class DocumentMinimal(BaseModel): # For list views
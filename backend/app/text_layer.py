@@ -0,0 +1,85 @@
+# InsureDocsProject/backend/app/text_layer.py
+import logging
+from typing import Dict, List, Optional
+
+import fitz                 # PyMuPDF - page resources, image placement and text
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+# --- Classification labels ---
+PAGE_DIGITAL = "digital"   # Real text layer with enough characters
+PAGE_SCANNED = "scanned"   # Image-covered page without a usable text layer
+PAGE_SPARSE = "sparse"     # Neither: little text and little image (cover sheets, blank pages)
+
+DOC_DIGITAL = "digital"    # Every sampled page digital -> text layer everywhere (OCR only as per-page fallback)
+DOC_SCANNED = "scanned"    # No sampled page has a text layer -> expect OCR; other pages are only font-checked
+DOC_MIXED = "mixed"        # Anything else -> decide page by page
+
+MIN_TEXT_LAYER_CHARS = 30 # A page needs more than this many text-layer chars to skip OCR (pipeline and cost estimates)
+SCANNED_IMAGE_COVERAGE = 0.5 # Share of the page covered by images for a text-less page to count as scanned
+
+def sample_page_indices(num_pages: int, sample_size: int) -> List[int]:
+    """Evenly spaced page indices (always including the first and last page)."""
+    if num_pages <= 0:
+        return []
+    if num_pages <= sample_size:
+        return list(range(num_pages))
+    if sample_size <= 1:
+        return [0]
+    step = (num_pages - 1) / (sample_size - 1)
+    return sorted({round(i * step) for i in range(sample_size)})
+
+def page_has_fonts(page: fitz.Page) -> bool:
+    """Cheap resource check: a page without fonts cannot have a text layer."""
+    return bool(page.get_fonts())
+
+def page_image_coverage(page: fitz.Page) -> float:
+    """Fraction of the page area covered by placed images (overlaps are not de-duplicated, capped at 1)."""
+    page_area = abs(page.rect) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info["bbox"]) & page.rect)
+    return min(1.0, covered / page_area)
+
+class DocumentLayout:
+    """Result of sampling a document: its layout label plus the text already pulled from sampled pages."""
+
+    def __init__(self, kind: str, sampled_texts: Dict[int, str], page_labels: Optional[List[str]] = None):
+        self.kind = kind
+        self.sampled_texts = sampled_texts # page_index -> stripped text (only pages whose spans were read)
+        self.page_labels = page_labels or [] # PAGE_* label of each sampled page
+
+    @property
+    def ocr_fraction(self) -> float:
+        """Estimated share of pages that will need OCR (sampled pages without a usable text layer)."""
+        if not self.page_labels:
+            return 1.0
+        return sum(1 for label in self.page_labels if label != PAGE_DIGITAL) / len(self.page_labels)
+
+def classify_page(page: fitz.Page, min_chars: int, texts_out: Optional[Dict[int, str]] = None) -> str:
+    """Classifies one page from its fonts, text spans and image coverage."""
+    if page_has_fonts(page):
+        # Count characters in text spans; only sampled pages pay for this
+        text = page.get_text("text").strip()
+        if texts_out is not None:
+            texts_out[page.number] = text
+        if len(text) > min_chars:
+            return PAGE_DIGITAL
+    return PAGE_SCANNED if page_image_coverage(page) >= SCANNED_IMAGE_COVERAGE else PAGE_SPARSE
+
+def classify_document(doc: fitz.Document, sample_size: int, min_chars: int) -> DocumentLayout:
+    """
+    Decides from a handful of sampled pages whether a document is digital, scanned or mixed,
+    so that text is only extracted where it is likely to be used. Text read while sampling is
+    returned so the extraction pass does not read those pages twice.
+    """
+    sampled_texts: Dict[int, str] = {}
+    labels = [classify_page(doc[i], min_chars, sampled_texts) for i in sample_page_indices(len(doc), sample_size)]
+    if labels and all(label == PAGE_DIGITAL for label in labels):
+        kind = DOC_DIGITAL
+    elif PAGE_SCANNED in labels and all(label != PAGE_DIGITAL for label in labels):
+        kind = DOC_SCANNED
+    else:
+        kind = DOC_MIXED
+    return DocumentLayout(kind, sampled_texts, labels)
@@ -0,0 +1,162 @@
+# InsureDocsProject/backend/app/upload_stream.py
+# Streams a multipart/form-data upload straight from the request body to its final path on disk.
+#
+# FastAPI's UploadFile parameters make Starlette read the whole body into a spooled temporary file
+# before the endpoint runs: the file is then copied (and hashed) a second time, and a size limit
+# can only be enforced once every byte has arrived. Here the body is parsed incrementally with
+# python-multipart: the PDF part is hashed and written as it arrives, and the request is refused
+# as soon as the bytes received so far exceed the limit (an oversized Content-Length is already
+# refused by main.UploadSizeLimitMiddleware before anything is read).
+import os
+import hashlib
+import logging
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError: # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+UPLOAD_WRITE_CHUNK_BYTES = 1024 * 1024 # Body bytes per parse/hash/write round in the threadpool
+
+class UploadTooLarge(ValueError):
+    """Raised while streaming when the actual bytes exceed the size limit."""
+
+class InvalidUpload(ValueError):
+    """Raised for a body that is not a multipart form with one PDF file in the expected field."""
+
+class StreamedUpload:
+    """The file part of a streamed upload, as written to dest_path."""
+    def __init__(self, filename: str, content_type: Optional[str], size_bytes: int, sha256: str):
+        self.filename = filename
+        self.content_type = content_type
+        self.size_bytes = size_bytes
+        self.sha256 = sha256
+
+class _FilePartWriter:
+    """python-multipart callbacks: writes and hashes the data of the `field_name` file part, skips every other part."""
+
+    def __init__(self, field_name: str, dest_path: str, max_bytes: int, allowed_extensions):
+        self.field_name = field_name
+        self.dest_path = dest_path
+        self.max_bytes = max_bytes
+        self.allowed_extensions = allowed_extensions
+        self.upload: Optional[StreamedUpload] = None
+        self._digest = hashlib.sha256()
+        self._out = None
+        self._header_name = b""
+        self._header_value = b""
+        self._part_headers = {}
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._part_headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._part_headers[self._header_name.lower()] = self._header_value
+        self._header_name, self._header_value = b"", b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._part_headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("latin-1") != self.field_name or b"filename" not in options:
+            return # Another form field: its data is skipped
+        if self.upload is not None:
+            raise InvalidUpload("Only one file can be uploaded per request.")
+        filename = options[b"filename"].decode("utf-8", errors="replace")
+        if not filename: raise InvalidUpload("Filename missing.")
+        if os.path.splitext(filename)[1].lower() not in self.allowed_extensions:
+            raise InvalidUpload("Invalid file type (PDF only).") # Refused before the file's data is read
+        content_type = self._part_headers.get(b"content-type")
+        self.upload = StreamedUpload(filename, content_type.decode("latin-1") if content_type else None, 0, "")
+        self._out = open(self.dest_path, "wb")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._out is None:
+            return
+        chunk = memoryview(data)[start:end] # Hashed and written without another copy
+        self.upload.size_bytes += len(chunk)
+        if self.max_bytes and self.upload.size_bytes > self.max_bytes:
+            raise UploadTooLarge("File too large.")
+        self._digest.update(chunk)
+        self._out.write(chunk)
+
+    def on_part_end(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+            self.upload.sha256 = self._digest.hexdigest()
+
+    def close(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+
+async def receive_file_upload(request: Request, field_name: str, dest_path: str, max_bytes: int, allowed_extensions=(".pdf",)) -> StreamedUpload:
+    """
+    Streams the `field_name` file part of a multipart/form-data request to dest_path (max_bytes 0 = no limit).
+    Parsing, hashing and disk writes run in the threadpool, UPLOAD_WRITE_CHUNK_BYTES at a time.
+    Raises UploadTooLarge or InvalidUpload; dest_path is removed on any failure.
+    """
+    content_type = request.headers.get("content-type", "")
+    mime, params = parse_options_header(content_type)
+    if mime != b"multipart/form-data" or b"boundary" not in params:
+        raise InvalidUpload("Expected a multipart/form-data upload.")
+
+    writer = _FilePartWriter(field_name, dest_path, max_bytes, allowed_extensions)
+    parser = multipart.MultipartParser(params[b"boundary"], writer.callbacks())
+
+    def write(view: memoryview):
+        parser.write(view.tobytes())
+
+    async def feed(data: bytes):
+        # At most UPLOAD_WRITE_CHUNK_BYTES per threadpool round, so the event loop gets the GIL back between
+        # rounds even when a client delivers the whole body as one chunk
+        view = memoryview(data)
+        for offset in range(0, len(view), UPLOAD_WRITE_CHUNK_BYTES):
+            await run_in_threadpool(write, view[offset:offset + UPLOAD_WRITE_CHUNK_BYTES])
+
+    pending, pending_bytes = [], 0
+    try:
+        async for chunk in request.stream():
+            pending.append(chunk); pending_bytes += len(chunk)
+            if pending_bytes >= UPLOAD_WRITE_CHUNK_BYTES:
+                await feed(b"".join(pending)) # A single chunk is passed on without a copy
+                pending, pending_bytes = [], 0
+        if pending:
+            await feed(b"".join(pending))
+        parser.finalize()
+        if writer.upload is None: raise InvalidUpload(f"No file in form field '{field_name}'.")
+        if not writer.upload.sha256: raise InvalidUpload("Upload ended before the file was complete.")
+        return writer.upload
+    except Exception as stream_err:
+        writer.close()
+        if os.path.exists(dest_path):
+            try: os.remove(dest_path)
+            except OSError as rm_err: logger.error(f"Error cleaning up partial upload {dest_path}: {rm_err}")
+        if isinstance(stream_err, multipart.exceptions.MultipartParseError):
+            raise InvalidUpload(f"Malformed multipart body: {stream_err}") from stream_err
+        raise
@@ -0,0 +1,272 @@
+# InsureDocsProject/backend/app/worker.py
+# Standalone queue worker: `python -m app.worker` (run from backend/, scale by starting more processes).
+import os
+import sys
+import socket
+import signal
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+from .database import SessionLocal
+from . import job_queue, memory_budget, models, ner_utils, ocr_budget, ocr_utils, pipeline
+
+# Exit code of a standalone worker that stopped to be replaced by a fresh process: a page thread
+# abandoned past its time budget is still running (stuck in native code), it went over its RSS
+# budget, or it reached WORKER_MAX_TASKS. The supervisor should restart it.
+EXIT_CODE_RECLAIM = 75
+
+# Job kinds run by the OCR stage (the legacy "process" kind starts there too)
+OCR_JOB_KINDS = [job_queue.JOB_KIND_OCR, job_queue.JOB_KIND_PROCESS]
+
+# Final document statuses that end the job for good (a retry would hit the same limit / undo the cancel)
+TERMINAL_STAGE_STATUSES = {models.DocumentStatus.OCR_TIMEOUT: "Time budget exceeded", models.DocumentStatus.CANCELLED: "Cancelled by admin"}
+
+# --- Get Logger ---
+logger = logging.getLogger(__name__)
+
+class QueueWorker:
+    """
+    Leases processing jobs from the database queue and runs the pipeline on them, one at a time
+    (NER jobs in batches of up to NER_BATCH_DOCS, which share one nlp.pipe pass; in batched OCR
+    mode up to OCR_CONCURRENT_DOCS OCR jobs at once on their own threads, whose pages share batches).
+
+    While a job runs, a heartbeat thread keeps extending its lease; if this process dies the lease
+    expires after JOB_VISIBILITY_TIMEOUT_SECONDS and the reaper re-queues the job for another worker.
+    The same thread polls for an admin cancel and signals the running stage.
+    With recycle=True the worker stops between jobs when its process should be replaced (see EXIT_CODE_RECLAIM).
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, poll_interval: Optional[float] = None, kinds: Optional[List[str]] = None,
+                 recycle: bool = False):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.kinds = kinds # Job kinds this worker leases (None = all), e.g. ["extract"] for a dedicated extraction worker
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOB_POLL_INTERVAL_SECONDS
+        self.stop_event = threading.Event()
+        self.recycle = recycle # Stop for a process restart when recycle_reason() says so
+        self.reclaim_requested = False
+        self.jobs_done = 0
+
+    def stop(self):
+        """Asks the loop to exit once the current job (if any) has finished."""
+        self.stop_event.set()
+
+    def run(self, burst: bool = False):
+        """Processes jobs until stop() is called (or, with burst=True, until the queue is empty)."""
+        logger.info(f"Worker {self.worker_id} started (kinds: {', '.join(self.kinds) if self.kinds else 'all'}; poll every {self.poll_interval}s).")
+        while not self.stop_event.is_set():
+            try:
+                worked = self.run_once()
+            except Exception as loop_err: # DB unavailable etc.: back off and keep the worker alive
+                logger.error(f"Worker {self.worker_id} loop error: {loop_err}", exc_info=True)
+                worked = False
+            reason = self.recycle_reason() if worked else None
+            if reason is not None:
+                if self.recycle:
+                    logger.warning(f"Worker {self.worker_id}: {reason}; stopping so the process can be restarted.")
+                    self.reclaim_requested = True
+                    break
+                logger.warning(f"Worker {self.worker_id}: {reason} (in-process worker; not recycled).")
+            if not worked:
+                if burst:
+                    break
+                self.stop_event.wait(self.poll_interval)
+        logger.info(f"Worker {self.worker_id} stopped.")
+
+    def recycle_reason(self) -> Optional[str]:
+        """Why this process should be replaced by a fresh one, or None."""
+        abandoned = ocr_budget.abandoned_thread_count()
+        if abandoned:
+            return f"{abandoned} page thread(s) still stuck past their time budget"
+        if memory_budget.over_limit(): # Releases memory first; only persistent growth (fragmentation, leaks) counts
+            return f"RSS {memory_budget.rss_bytes() // memory_budget.MB} MB over the {memory_budget.limit_bytes() // memory_budget.MB} MB budget"
+        if self.recycle and settings.WORKER_MAX_TASKS and self.jobs_done >= settings.WORKER_MAX_TASKS:
+            return f"reached WORKER_MAX_TASKS ({self.jobs_done} jobs)"
+        return None
+
+    def run_once(self) -> bool:
+        """
+        Leases and runs one job (or one batch of NER jobs, or several OCR jobs at once - see
+        ocr_utils.ocr_concurrent_documents). Returns False if the queue had nothing leasable.
+        """
+        db = SessionLocal()
+        try:
+            job = job_queue.lease_next(db, self.worker_id, settings.JOB_VISIBILITY_TIMEOUT_SECONDS, kinds=self.kinds)
+            if job is None:
+                return False
+            job_id, doc_id, kind = job.id, job.document_id, job.kind
+            batch = {job_id: doc_id}
+            if kind == job_queue.JOB_KIND_NER: # NER is batched through nlp.pipe: take more queued NER jobs along
+                while len(batch) < settings.NER_BATCH_DOCS:
+                    more = job_queue.lease_next(db, self.worker_id, settings.JOB_VISIBILITY_TIMEOUT_SECONDS, kinds=[job_queue.JOB_KIND_NER])
+                    if more is None:
+                        break
+                    batch[more.id] = more.document_id
+            jobs = {job_id: (doc_id, kind)}
+            if kind in OCR_JOB_KINDS: # Documents OCR'd side by side share the pool / batches: take more queued OCR jobs along
+                ocr_kinds = [k for k in OCR_JOB_KINDS if self.kinds is None or k in self.kinds]
+                while len(jobs) < ocr_utils.ocr_concurrent_documents():
+                    more = job_queue.lease_next(db, self.worker_id, settings.JOB_VISIBILITY_TIMEOUT_SECONDS, kinds=ocr_kinds)
+                    if more is None:
+                        break
+                    jobs[more.id] = (more.document_id, more.kind)
+        finally:
+            db.close()
+        if kind == job_queue.JOB_KIND_NER:
+            self._run_ner_batch(batch)
+            return True
+
+        if len(jobs) == 1:
+            outcomes = {job_id: self._run_job(job_id, doc_id, kind)}
+        else:
+            logger.info(f"Worker {self.worker_id}: running {len(jobs)} OCR jobs at once ({list(jobs)}).")
+            outcomes = {}
+            def run(job_id: int, doc_id: int, kind: str):
+                outcomes[job_id] = self._run_job(job_id, doc_id, kind)
+            threads = [threading.Thread(target=run, args=(job_id, doc_id, kind), name=f"job-{job_id}")
+                       for job_id, (doc_id, kind) in jobs.items()]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.jobs_done += len(jobs)
+        self._record_outcomes(outcomes)
+        return True
+
+    def _run_job(self, job_id: int, doc_id: int, kind: str) -> Tuple[Optional[str], bool]:
+        """Runs one leased job's stage under its own heartbeat / cancel watch. Returns (error or None, retry)."""
+        heartbeat_stop = threading.Event()
+        cancel_event = threading.Event()
+        heartbeat_thread = self._start_heartbeat([job_id], heartbeat_stop, cancel_event)
+        error: Optional[str] = None
+        retry = True
+        try:
+            run_stage = pipeline.STAGE_RUNNERS.get(kind)
+            if run_stage is None:
+                raise ValueError(f"Unknown job kind '{kind}'")
+            final_status = run_stage(doc_id, cancel_event=cancel_event)
+            logger.info(f"[Task {doc_id}] Job {job_id} ({kind}) finished with document status {final_status}.")
+            if final_status in TERMINAL_STAGE_STATUSES:
+                error, retry = TERMINAL_STAGE_STATUSES[final_status], False
+        except Exception as job_err: # The pipeline records its own failures; anything escaping it is unexpected
+            logger.error(f"[Task {doc_id}] Job {job_id} raised: {job_err}", exc_info=True)
+            error = f"{type(job_err).__name__}: {job_err}"
+        finally:
+            heartbeat_stop.set()
+            heartbeat_thread.join()
+        return error, retry
+
+    def _run_ner_batch(self, batch: Dict[int, int]):
+        """Runs leased NER jobs ({job_id: doc_id}) through one batched NER pass and records each job's outcome."""
+        heartbeat_stop = threading.Event()
+        heartbeat_thread = self._start_heartbeat(list(batch), heartbeat_stop, threading.Event())
+        try:
+            errors = pipeline.run_ner_batch(list(batch.values()))
+        except Exception as batch_err:
+            logger.error(f"NER batch (jobs {list(batch)}) raised: {batch_err}", exc_info=True)
+            errors = {doc_id: f"{type(batch_err).__name__}: {batch_err}" for doc_id in batch.values()}
+        finally:
+            heartbeat_stop.set()
+            heartbeat_thread.join()
+            self.jobs_done += len(batch)
+        self._record_outcomes({job_id: (errors.get(doc_id), True) for job_id, doc_id in batch.items()})
+
+    def _record_outcomes(self, outcomes: Dict[int, Tuple[Optional[str], bool]]):
+        """Completes or fails leased jobs: {job_id: (error or None, retry)}."""
+        db = SessionLocal()
+        try:
+            for job_id, (error, retry) in outcomes.items():
+                if error is None:
+                    job_queue.complete(db, job_id, self.worker_id)
+                else:
+                    job_queue.fail(db, job_id, self.worker_id, error, retry=retry)
+        finally:
+            db.close()
+
+    def _start_heartbeat(self, job_ids: List[int], stop: threading.Event, cancel_event: threading.Event) -> threading.Thread:
+        thread = threading.Thread(target=self._heartbeat_loop, args=(job_ids, stop, cancel_event), name=f"job-{job_ids[0]}-heartbeat", daemon=True)
+        thread.start()
+        return thread
+
+    def _heartbeat_loop(self, job_ids: List[int], stop: threading.Event, cancel_event: threading.Event):
+        """Extends the leases every JOB_HEARTBEAT_INTERVAL_SECONDS and polls for a cancel every JOB_CANCEL_POLL_SECONDS."""
+        tick = min(settings.JOB_HEARTBEAT_INTERVAL_SECONDS, settings.JOB_CANCEL_POLL_SECONDS)
+        next_heartbeat = time.monotonic() + settings.JOB_HEARTBEAT_INTERVAL_SECONDS
+        held = list(job_ids)
+        while held and not stop.wait(tick):
+            db = SessionLocal()
+            try:
+                if not cancel_event.is_set() and any(job_queue.is_cancel_requested(db, job_id) for job_id in held):
+                    logger.warning(f"Worker {self.worker_id}: job(s) {held} were cancelled; stopping.")
+                    cancel_event.set()
+                if time.monotonic() >= next_heartbeat:
+                    next_heartbeat = time.monotonic() + settings.JOB_HEARTBEAT_INTERVAL_SECONDS
+                    for job_id in list(held):
+                        if not job_queue.heartbeat(db, job_id, self.worker_id, settings.JOB_VISIBILITY_TIMEOUT_SECONDS):
+                            logger.warning(f"Worker {self.worker_id} lost the lease on job {job_id}.")
+                            held.remove(job_id)
+            except Exception as hb_err: # Missed heartbeats are tolerated until the lease actually expires
+                logger.warning(f"Heartbeat for job(s) {held} failed: {hb_err}")
+                db.rollback()
+            finally:
+                db.close()
+
+# --- In-process worker (RUN_INPROCESS_WORKER) ---
+_inprocess_worker: Optional[QueueWorker] = None
+_inprocess_thread: Optional[threading.Thread] = None
+
+def start_inprocess_worker():
+    """Runs one worker on a daemon thread inside the API process (dev / single-node deployments)."""
+    global _inprocess_worker, _inprocess_thread
+    if _inprocess_thread is not None:
+        return
+    _inprocess_worker = QueueWorker()
+    _inprocess_thread = threading.Thread(target=_inprocess_worker.run, name="queue-worker", daemon=True)
+    _inprocess_thread.start()
+
+def stop_inprocess_worker(timeout: Optional[float] = None):
+    global _inprocess_worker, _inprocess_thread
+    if _inprocess_worker is None:
+        return
+    _inprocess_worker.stop()
+    _inprocess_thread.join(timeout)
+    _inprocess_worker, _inprocess_thread = None, None
+
+# --- CLI entry point ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process queued documents (OCR, extraction, NER).")
+    parser.add_argument("--worker-id", default=None, help="Lease owner name (default: host:pid:thread)")
+    parser.add_argument("--poll-interval", type=float, default=None, help="Seconds between polls when idle")
+    parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty")
+    parser.add_argument("--kinds", default=None, help="Comma-separated job kinds to process (default: all), e.g. 'extract'")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()] if args.kinds else None
+    worker = QueueWorker(worker_id=args.worker_id, poll_interval=args.poll_interval, kinds=kinds, recycle=True)
+    # SIGTERM/SIGINT: finish the current job, then exit (an interrupted job would only be retried later)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    if settings.OCR_PRELOAD_MODELS and (kinds is None or job_queue.JOB_KIND_OCR in kinds):
+        ocr_utils.warm_up_ocr_models()
+    if settings.NER_ENABLED and settings.NER_PRELOAD_MODEL and (kinds is None or job_queue.JOB_KIND_NER in kinds):
+        ner_utils.preload_nlp()
+    try:
+        worker.run(burst=args.burst)
+    finally:
+        ocr_utils.shutdown_ocr_pool()
+        ocr_utils.shutdown_ocr_batcher()
+    if worker.reclaim_requested:
+        logging.shutdown()
+        os._exit(EXIT_CODE_RECLAIM) # Skip interpreter teardown: it could block on the stuck thread
+
+if __name__ == "__main__":
+    main()
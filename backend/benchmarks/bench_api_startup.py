@@ -0,0 +1,58 @@
+# InsureDocsProject/backend/benchmarks/bench_api_startup.py
+"""
+Benchmark: API process start-up time and idle RSS with the lazily loaded spaCy model vs loading it
+at import (what ner_utils did before get_nlp()).
+
+Each run is a fresh interpreter that imports app.main (the API's import graph) and reports the wall
+time and RSS afterwards. The "eager" variant additionally calls ner_utils.preload_nlp() right after
+the import, which costs exactly what the old module-level spacy.load() did. Median of --runs runs.
+Without spaCy / the model installed both variants are the same (the report says whether it loaded).
+
+Usage (from backend/):
+    python -m benchmarks.bench_api_startup [--runs 5] [--model en_core_web_sm]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = """
+import json, logging, sys, time
+logging.disable(logging.CRITICAL)
+started = time.perf_counter()
+import app.main
+from app import memory_budget, ner_utils
+loaded = ner_utils.preload_nlp() if {eager} else False
+print(json.dumps({{"seconds": time.perf_counter() - started, "rss": memory_budget.rss_bytes(),
+                  "spacy_imported": "spacy" in sys.modules, "model_loaded": loaded}}))
+"""
+
+def _run(eager: bool, model: str) -> dict:
+    env = dict(os.environ, NER_MODEL_NAME=model)
+    output = subprocess.run([sys.executable, "-c", CHILD.format(eager=eager)], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--model", default="en_core_web_sm")
+    args = parser.parse_args()
+
+    results = {}
+    for name, eager in (("lazy (get_nlp on first NER job)", False), ("eager (model loaded at import)", True)):
+        runs = [_run(eager, args.model) for _ in range(args.runs)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss_mb = statistics.median(run["rss"] for run in runs) / (1024 * 1024)
+        results[name] = (seconds, rss_mb)
+        print(f"  {name:34s} start-up {seconds:6.2f}s   idle RSS {rss_mb:7.1f} MB   "
+              f"spaCy imported: {runs[-1]['spacy_imported']}, model loaded: {runs[-1]['model_loaded']}")
+    (lazy_s, lazy_mb), (eager_s, eager_mb) = results.values()
+    print(f"  lazy saves {eager_s - lazy_s:.2f}s and {eager_mb - lazy_mb:.1f} MB per API process")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# InsureDocsProject/backend/benchmarks/bench_entity_lookup.py
+"""
+Benchmark: "which documents mention policy X" through the indexed document_entities table
+(crud.find_entity_matches) vs loading every document's extracted_metadata JSON and scanning it.
+
+Fills a scratch SQLite database (--db, recreated) with --docs documents, each with extracted_metadata
+and its document_entities rows stored the way the extraction stage does (crud.replace_document_entities).
+Then times --lookups random policy-number lookups through the index (median and worst) and a few
+JSON scans, and prints SQLite's query plan for the lookup.
+
+Usage (from backend/):
+    python -m benchmarks.bench_entity_lookup [--docs 100000] [--values-per-label 2] [--lookups 200] [--db /tmp/bench_entities.db]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from sqlalchemy import create_engine, text # noqa: E402
+from sqlalchemy.orm import sessionmaker # noqa: E402
+
+from app import crud, extraction_utils, models # noqa: E402
+from app.database import Base # noqa: E402
+
+def _document(doc_id: int, values_per_label: int, policy_space: int, rng: random.Random):
+    """(documents row, entity rows) for one synthetic document."""
+    found = {
+        "policy_numbers": [f"ABC-{rng.randrange(policy_space):06d}" for _ in range(values_per_label)],
+        "dates": [f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/20{rng.randint(10, 30)}" for _ in range(values_per_label)],
+        "amounts": [f"{rng.randint(1, 99)},{rng.randint(100, 999)}.{rng.randint(10, 99)}" for _ in range(values_per_label)],
+    }
+    row = {"id": doc_id, "original_filename": f"doc{doc_id}.pdf", "stored_filename": f"{doc_id}.pdf",
+           "file_path_on_disk": f"{doc_id}.pdf", "status": "EXTRACT_COMPLETED", "owner_id": 1, "extracted_metadata": found}
+    entities = [{"label": extraction_utils.ENTITY_LABELS[key], "raw_value": value, "page": rng.randint(1, 20),
+                 "normalized_value": extraction_utils.normalize_entity_value(extraction_utils.ENTITY_LABELS[key], value)}
+                for key, values in found.items() for value in values]
+    return row, entities
+
+def _fill(db, docs: int, values_per_label: int, rng: random.Random) -> None:
+    started = time.perf_counter()
+    db.execute(models.User.__table__.insert(), [{"id": 1, "email": "bench@example.com", "hashed_password": "x", "role": "USER"}])
+    for first in range(1, docs + 1, 1000):
+        generated = [_document(doc_id, values_per_label, docs, rng) for doc_id in range(first, min(first + 1000, docs + 1))]
+        db.execute(models.Document.__table__.insert(), [row for row, _ in generated])
+        for row, entities in generated:
+            crud.replace_document_entities(db, row["id"], entities)
+        db.commit()
+    count = db.query(models.DocumentEntity).count()
+    print(f"  filled {docs} documents / {count} entity rows in {time.perf_counter() - started:.1f}s")
+
+def _json_scan(db, policy: str):
+    """The pre-table approach: every document's extracted_metadata, scanned in Python."""
+    return [doc_id for doc_id, metadata in db.query(models.Document.id, models.Document.extracted_metadata)
+            if policy in ((metadata or {}).get("policy_numbers") or [])]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--values-per-label", type=int, default=2, help="Policy numbers, dates and amounts per document")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--db", default="/tmp/bench_entities.db")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    engine = create_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    rng = random.Random(args.seed)
+    _fill(db, args.docs, args.values_per_label, rng)
+
+    policies = [f"ABC-{rng.randrange(args.docs):06d}" for _ in range(args.lookups)]
+    plan = db.execute(text("EXPLAIN QUERY PLAN SELECT document_id FROM document_entities WHERE label = :l AND normalized_value = :v"),
+                      {"l": "POLICY_NUMBER", "v": "ABC000001"}).fetchall()
+    print(f"  query plan: {' / '.join(str(row[-1]) for row in plan)}")
+
+    timings, hits = [], 0
+    for policy in policies:
+        started = time.perf_counter()
+        found = crud.find_entity_matches(db, "POLICY_NUMBER", extraction_utils.normalize_entity_value("POLICY_NUMBER", policy))
+        timings.append(time.perf_counter() - started)
+        hits += len(found)
+    print(f"  indexed lookup   median {statistics.median(timings) * 1000:8.2f} ms   max {max(timings) * 1000:8.2f} ms   "
+          f"({args.lookups} lookups, {hits} rows)")
+
+    scans = []
+    for policy in policies[:3]:
+        started = time.perf_counter()
+        _json_scan(db, policy)
+        scans.append(time.perf_counter() - started)
+    print(f"  JSON scan        median {statistics.median(scans) * 1000:8.2f} ms   ({len(scans)} lookups)")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# InsureDocsProject/backend/benchmarks/bench_memory_ceiling.py
+"""
+Benchmark: worker memory while OCR'ing one very long scanned PDF.
+
+Builds a --pages page PDF of scanned-looking pages (one full-page image each, no text layer),
+runs ocr_utils.perform_text_extract_or_ocr on it with a MemoryMonitor, and prints the process
+RSS every --every pages plus the document's peak. RSS should level off after the first pages
+(pixmaps are released per page, text is streamed to disk) instead of growing with page count;
+the run fails if the peak exceeds --ceiling-mb.
+
+--no-ocr swaps EasyOCR for a reader that returns no text, isolating render/stream memory
+from the model's (useful where EasyOCR weights are not installed).
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory_ceiling [--pages 1000] [--every 100] [--ceiling-mb 1500] [--no-ocr]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench_memory_")
+os.environ.setdefault("UPLOAD_DIR", WORK_DIR)
+os.environ.setdefault("OCR_CACHE_MAX_MB", "0") # Measure the work, not cache hits on identical pages
+os.environ.setdefault("OCR_CHECKPOINTS_ENABLED", "false")
+
+import fitz # noqa: E402
+import numpy as np # noqa: E402
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app import ocr_utils # noqa: E402
+from app.memory_budget import MB, MemoryMonitor, rss_bytes # noqa: E402
+
+class _NullReader:
+    """--no-ocr: accepts the rendered page like EasyOCR would, returns no text."""
+    def readtext(self, image, **kwargs):
+        return [f"{image.shape[1]}x{image.shape[0]}"]
+
+def _make_scanned_pdf(path: str, pages: int):
+    """Letter pages each carrying its own 150 DPI grayscale scan image (decoded and re-rendered at OCR DPI per page)."""
+    width, height = 1275, 1650
+    doc = fitz.open()
+    for page_index in range(pages):
+        scan = np.full((height, width), 255, dtype=np.uint8)
+        for y in range(100, 1600, 40): # Dark bars standing in for text lines, shifted per page so no two images match
+            scan[y:y + 18, 100 + page_index % 50:1175] = 40
+        pixmap = fitz.Pixmap(fitz.csGRAY, width, height, scan.tobytes(), False)
+        doc.new_page(width=612, height=792).insert_image(fitz.Rect(0, 0, 612, 792), stream=pixmap.tobytes("png"))
+    doc.save(path, deflate=True)
+    doc.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--every", type=int, default=100, help="Print RSS every N pages")
+    parser.add_argument("--ceiling-mb", type=int, default=1500, help="Fail if the document's peak RSS exceeds this")
+    parser.add_argument("--no-ocr", action="store_true", help="Render and stream pages but skip EasyOCR")
+    args = parser.parse_args()
+
+    pdf_path = os.path.join(WORK_DIR, "long_scan.pdf")
+    _make_scanned_pdf(pdf_path, args.pages)
+    if args.no_ocr:
+        ocr_utils._easyocr_reader = _NullReader()
+    else:
+        ocr_utils.get_easyocr_reader() # Load the model before the baseline reading
+    baseline = rss_bytes()
+    print(f"{args.pages}-page PDF ({os.path.getsize(pdf_path) // MB} MB), baseline RSS {baseline // MB} MB")
+
+    started = time.perf_counter()
+    def progress(pages_done: int, pages_total: int):
+        if pages_done and (pages_done % args.every == 0 or pages_done == pages_total):
+            print(f"  page {pages_done:5d}/{pages_total}  RSS {rss_bytes() // MB:6d} MB  {time.perf_counter() - started:7.1f}s")
+
+    memory = MemoryMonitor(doc_id=0, extra_pids=ocr_utils.ocr_pool_worker_pids)
+    out_path = os.path.join(WORK_DIR, "long_scan.txt")
+    ocr_utils.perform_text_extract_or_ocr(0, pdf_path, out_path, progress_callback=progress, memory=memory)
+    ocr_utils.shutdown_ocr_pool()
+    verdict = "OK" if memory.peak_mb <= args.ceiling_mb else "OVER CEILING"
+    print(f"peak RSS {memory.peak_mb} MB (ceiling {args.ceiling_mb} MB): {verdict}; "
+          f"output {os.path.getsize(out_path) // 1024} KB in {time.perf_counter() - started:.1f}s")
+    sys.exit(0 if verdict == "OK" else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# InsureDocsProject/backend/benchmarks/bench_ner_memory.py
+"""
+Benchmark: peak RSS of NER over one long OCR-like document vs its length, page-chunked
+(ner_utils.extract_entities) vs one nlp(text) call over the whole text (the previous behaviour,
+with the model's max_length raised so long documents run at all).
+
+For every --pages value a fresh process builds a document of that many "--- Page N (ocr) ---" pages
+(about --page-chars characters each), loads the model, and reports the growth of its peak RSS over
+the NER call. Chunked peaks should stay flat as the page count grows. Needs spaCy and the model for
+the comparison to mean anything; without them only the regex patterns run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ner_memory [--pages 10,100,400] [--page-chars 3000] [--model en_core_web_sm]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = """
+import json, logging, time
+logging.disable(logging.CRITICAL)
+from app import memory_budget, ner_utils
+line = "The insured John Smith of Acme Insurance paid $1,234.56 on 01/02/2024 in Chicago. Policy Number: ABC-123456. "
+text = "".join(f"\\n--- Page {{page}} (ocr) ---\\n" + line * ({page_chars} // len(line)) for page in range(1, {pages} + 1))
+nlp = ner_utils.get_nlp()
+memory_budget.release_memory()
+memory_budget._reset_high_water_mark()
+before = memory_budget.rss_bytes()
+started = time.perf_counter()
+if {whole} and nlp is not None:
+    nlp.max_length = max(nlp.max_length, len(text) + 1)
+    entities = ner_utils._spacy_mentions(nlp(text), ner_utils.TextChunk(None, 0, text))
+    count = sum(1 for _ in entities)
+else:
+    count = sum(len(values) for values in ner_utils.extract_entities(text).values())
+seconds = time.perf_counter() - started
+peak = memory_budget._read_high_water_mark() or memory_budget.rss_bytes()
+print(json.dumps({{"chars": len(text), "seconds": seconds, "growth": peak - before, "model": nlp is not None, "count": count}}))
+"""
+
+def _run(pages: int, page_chars: int, whole: bool, model: str) -> dict:
+    env = dict(os.environ, NER_MODEL_NAME=model)
+    code = CHILD.format(pages=pages, page_chars=page_chars, whole=whole)
+    output = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="10,100,400", help="Comma-separated document lengths in pages")
+    parser.add_argument("--page-chars", type=int, default=3000)
+    parser.add_argument("--model", default="en_core_web_sm")
+    args = parser.parse_args()
+
+    for pages in [int(count) for count in args.pages.split(",") if count.strip()]:
+        for name, whole in (("page-chunked", False), ("whole text", True)):
+            result = _run(pages, args.page_chars, whole, args.model)
+            if whole and not result["model"]:
+                continue # Without a model the whole-text variant has nothing to measure
+            print(f"  {pages:5d} pages {result['chars'] // 1000:7d} K chars  {name:13s} {result['seconds']:7.2f}s  "
+                  f"peak RSS growth {result['growth'] / (1024 * 1024):8.1f} MB  model: {result['model']}")
+
+if __name__ == "__main__":
+    main()
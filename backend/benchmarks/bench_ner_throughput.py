@@ -0,0 +1,87 @@
+# InsureDocsProject/backend/benchmarks/bench_ner_throughput.py
+"""
+Benchmark: NER throughput (docs/sec), one NLP(text) call per document with the full pipeline
+vs nlp.pipe batches with only the NER components enabled (what the ner job stage does).
+
+Generates --docs synthetic OCR-like documents of about --chars characters and runs both on the
+same texts with the same model. The batched variant is repeated for every --batch-sizes value;
+--n-process > 1 adds worker processes to nlp.pipe. Entity results must be identical.
+Needs spaCy and the model (python -m spacy download en_core_web_sm).
+
+Usage (from backend/):
+    python -m benchmarks.bench_ner_throughput [--docs 200] [--chars 4000] [--batch-sizes 8,32,128] [--n-process 1] [--model en_core_web_sm]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import spacy
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app import ner_utils # noqa: E402
+from app.config import settings # noqa: E402
+
+SENTENCES = [
+    "The insured, {name}, reported a collision on {date} near {city}.",
+    "Policy Number: ABC-{num} issued by {org} covers the vehicle listed below.",
+    "A payment of ${amount} was approved by {org} on {date}.",
+    "{name} visited {org} in {city} for follow-up treatment.",
+    "Claim # CLM{num} remains open pending review by the adjuster.",
+    "Coverage includes liability, collision and comprehensive protection for the policy period.",
+]
+NAMES = ["John Smith", "Maria Garcia", "Wei Chen", "Aisha Khan", "Robert Brown"]
+ORGS = ["Acme Insurance", "General Hospital", "Northwind Mutual", "Blue Shield"]
+CITIES = ["Chicago", "Austin", "Seattle", "Boston", "Denver"]
+
+def _make_docs(count: int, chars: int, rng: random.Random):
+    docs = []
+    for _ in range(count):
+        parts, size = [], 0
+        while size < chars:
+            sentence = rng.choice(SENTENCES).format(
+                name=rng.choice(NAMES), org=rng.choice(ORGS), city=rng.choice(CITIES),
+                date=f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2024", num=rng.randint(100000, 999999),
+                amount=f"{rng.randint(100, 9999):,}.{rng.randint(10, 99)}")
+            parts.append(sentence)
+            size += len(sentence) + 1
+        docs.append(" ".join(parts))
+    return docs
+
+def _entities(doc):
+    return sorted((ent.label_, ent.text) for ent in doc.ents)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--chars", type=int, default=4000, help="Approximate characters per document")
+    parser.add_argument("--batch-sizes", default="8,32,128", help="Comma-separated nlp.pipe batch sizes to try")
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--model", default=settings.NER_MODEL_NAME)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    texts = _make_docs(args.docs, args.chars, random.Random(args.seed))
+    full = spacy.load(args.model)
+    print(f"{len(texts)} docs, {sum(map(len, texts)) // 1000} K chars; model {args.model}, full pipeline {full.pipe_names}")
+
+    started = time.perf_counter()
+    expected = [_entities(full(text)) for text in texts]
+    baseline = time.perf_counter() - started
+    print(f"  per-document nlp(text), all components   {baseline:7.2f}s  {len(texts) / baseline:8.1f} docs/sec")
+
+    ner_only = ner_utils._select_ner_pipes(spacy.load(args.model))
+    ok = True
+    for batch_size in [int(size) for size in args.batch_sizes.split(",") if size.strip()]:
+        started = time.perf_counter()
+        found = [_entities(doc) for doc in ner_only.pipe(texts, batch_size=batch_size, n_process=args.n_process)]
+        elapsed = time.perf_counter() - started
+        same = found == expected
+        ok &= same
+        print(f"  nlp.pipe batch_size={batch_size:<4d} n_process={args.n_process}   {elapsed:7.2f}s  {len(texts) / elapsed:8.1f} docs/sec  "
+              f"{baseline / elapsed:5.2f}x  {'same entities' if same else 'ENTITIES DIFFER'}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# InsureDocsProject/backend/benchmarks/bench_pixmap_to_array.py
+"""
+Microbenchmark: per-page cost of handing a rendered page to the OCR engine.
+
+  png    - get_pixmap(dpi) -> tobytes("png") -> decode back to an array (old path)
+  rgb    - get_pixmap(dpi, RGB) -> NumPy view over samples -> BGR copy (EasyOCR channel order)
+  gray   - get_pixmap(dpi, GRAY) -> NumPy view over samples (zero-copy)
+
+OCR itself is not run; only the render/hand-off work differs between paths.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pixmap_to_array [some.pdf] [--dpi 300] [--pages 5]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import fitz
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.page_render import render_page # noqa: E402
+
+def _decode_png(data: bytes) -> np.ndarray:
+    try:
+        import cv2 # What EasyOCR uses internally for bytes input
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    except ImportError:
+        from PIL import Image
+        return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+
+# Each path returns (array handed to the engine, owner that must stay alive while the array is used)
+def _png_path(page: fitz.Page, dpi: int):
+    arr = _decode_png(page.get_pixmap(dpi=dpi).tobytes("png"))
+    return arr, arr
+
+def _rgb_path(page: fitz.Page, dpi: int):
+    image = render_page(page, dpi=dpi, grayscale=False)
+    return image.as_bgr(), image
+
+def _gray_path(page: fitz.Page, dpi: int):
+    image = render_page(page, dpi=dpi, grayscale=True)
+    return image.as_bgr(), image
+
+def _sample_document() -> fitz.Document:
+    """A letter-size page of dense text, rendered the same way scanned pages are."""
+    doc = fitz.open()
+    page = doc.new_page(width=612, height=792)
+    line = "Policy ABC-123456 effective 01/02/2024, premium $1,234.56, claim CLM-998877. " * 2
+    for row in range(60):
+        page.insert_text((36, 40 + row * 12), line[:110], fontsize=9)
+    return doc
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", help="PDF to render (default: synthetic letter page)")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=5, help="Pages to time (cycled)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    doc = fitz.open(args.pdf) if args.pdf else _sample_document()
+    pages = [doc[i % len(doc)] for i in range(args.pages)]
+    print(f"{len(pages)} page(s) at {args.dpi} DPI, best of {args.repeat}")
+
+    results = {}
+    for name, fn in [("png", _png_path), ("rgb", _rgb_path), ("gray", _gray_path)]:
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for page in pages:
+                arr, owner = fn(page, args.dpi)
+            best = min(best, time.perf_counter() - start)
+        results[name] = best / len(pages)
+        print(f"  {name:5s} {results[name] * 1000:8.1f} ms/page   (array {arr.shape}, {arr.nbytes / 1e6:.1f} MB)")
+    for name in ("rgb", "gray"):
+        print(f"  saving vs png ({name}): {(results['png'] - results[name]) * 1000:.1f} ms/page ({results['png'] / results[name]:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# InsureDocsProject/backend/benchmarks/bench_regex_engine.py
+"""
+Benchmark: one compiled multi-pattern scan (regex_engine.RegexScanner) vs one re.findall per pattern.
+
+Builds --mb MB of synthetic OCR-like text (prose with policy/claim/member numbers, dates, amounts
+and VINs sprinkled in) and times, best of --repeat runs:
+  * extraction_utils.extract_information_with_regex as it was (three findall calls) vs now (one scan),
+  * the raw pattern sets - extraction_utils', ner_utils.REGEX_CONFIG and
+    both together - as findall per pattern vs RegexScanner.values_by_label.
+Every comparison also checks the results are identical; the run fails if any differ.
+
+Usage (from backend/):
+    python -m benchmarks.bench_regex_engine [--mb 4] [--repeat 3] [--seed 1]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app import extraction_utils # noqa: E402
+from app.regex_engine import RegexScanner # noqa: E402
+
+WORDS = ("the insured party agrees coverage premium deductible claim policy vehicle member provider hospital "
+         "service date amount paid total balance due subscriber group statement benefits plan").split()
+
+def _make_text(megabytes: float, rng: random.Random) -> str:
+    lines, size = [], 0
+    while size < megabytes * 1_000_000:
+        roll = rng.random()
+        parts = [rng.choice(WORDS) for _ in range(rng.randint(5, 12))]
+        if roll < 0.05: parts.append(f"Policy Number: ABC-{rng.randint(100000, 999999)}")
+        if roll < 0.08: parts.append(f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/20{rng.randint(10, 30)}")
+        if roll < 0.12: parts.append(f"${rng.randint(1, 99)},{rng.randint(100, 999)}.{rng.randint(10, 99)}")
+        if roll < 0.02: parts.append(f"Claim # CLM{rng.randint(1000000, 9999999)} Member ID: M{rng.randint(100000, 999999)} "
+                                     f"group no: G{rng.randint(10000, 99999)}")
+        if roll < 0.01: parts.append(f"VIN 1HGCM82633A{rng.randint(100000, 999999)} 20{rng.randint(10, 30)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+        line = " ".join(parts)
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+def _extract_with_findall(text: str) -> dict:
+    """extract_information_with_regex before the single-pass scanner: one re.findall per pattern."""
+    policy_numbers = re.findall(extraction_utils.POLICY_NUMBER_PATTERN, text)
+    dates = re.findall(extraction_utils.DATE_PATTERN, text)
+    amounts = [float(amount.replace(",", "")) for amount in re.findall(extraction_utils.AMOUNT_PATTERN, text)]
+    return {
+        "policy_numbers": sorted(set(filter(None, policy_numbers))),
+        "dates": sorted(set(filter(None, dates))),
+        "amounts": sorted(set(amounts)),
+    }
+
+def _best(fn, repeat: int):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def _report(name: str, baseline: float, scanner: float, same: bool) -> bool:
+    print(f"  {name:34s} findall {baseline:7.3f}s   scanner {scanner:7.3f}s   {baseline / scanner:5.2f}x   "
+          f"{'identical' if same else 'RESULTS DIFFER'}")
+    return same
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=4.0, help="Size of the synthetic text in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    text = _make_text(args.mb, random.Random(args.seed))
+    print(f"{len(text) / 1_000_000:.1f} MB of text, best of {args.repeat}")
+    ok = True
+
+    old_time, old_result = _best(lambda: _extract_with_findall(text), args.repeat)
+    new_time, new_result = _best(lambda: extraction_utils.extract_information_with_regex(text), args.repeat)
+    ok &= _report("extract_information_with_regex", old_time, new_time, old_result == new_result)
+
+    pattern_sets = {"extraction_utils (3 patterns)": [
+        ("policy_numbers", re.compile(extraction_utils.POLICY_NUMBER_PATTERN)),
+        ("dates", re.compile(extraction_utils.DATE_PATTERN)),
+        ("amounts", re.compile(extraction_utils.AMOUNT_PATTERN)),
+    ]}
+    try:
+        from app.ner_utils import REGEX_CONFIG
+        ner_patterns = [(entry["label"], entry["pattern"]) for entry in REGEX_CONFIG]
+        pattern_sets[f"ner_utils ({len(ner_patterns)} patterns)"] = ner_patterns
+        pattern_sets[f"all ({len(ner_patterns) + 3} patterns)"] = pattern_sets["extraction_utils (3 patterns)"] + ner_patterns
+    except ImportError as import_err:
+        print(f"  (skipping ner_utils.REGEX_CONFIG: {import_err})")
+
+    for name, patterns in pattern_sets.items():
+        scanner = RegexScanner(patterns)
+        baseline_time, expected = _best(lambda: {label: pattern.findall(text) for label, pattern in patterns}, args.repeat)
+        scanner_time, found = _best(lambda: scanner.values_by_label(text), args.repeat)
+        ok &= _report(name, baseline_time, scanner_time, expected == found)
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
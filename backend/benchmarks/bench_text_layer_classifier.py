@@ -0,0 +1,87 @@
+# InsureDocsProject/backend/benchmarks/bench_text_layer_classifier.py
+"""
+Benchmark: deciding text layer vs OCR on all-scanned and all-digital corpora (OCR itself not run).
+
+  baseline - old behaviour: get_text() on every page, then decide for the whole document
+  sampled  - text_layer.classify_document() on a few pages, then text extraction only
+             where it will be used (scanned documents: a font check per unsampled page)
+
+Usage (from backend/):
+    python -m benchmarks.bench_text_layer_classifier [--docs 20] [--pages 40]
+"""
+import argparse
+import os
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app import text_layer # noqa: E402
+
+MIN_CHARS = text_layer.MIN_TEXT_LAYER_CHARS
+LINE = "Claim CLM-554433 for policy ABC-123456, loss date 03/14/2024, reserve $12,500.00."
+
+def _digital_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=612, height=792)
+        for row in range(50):
+            page.insert_text((36, 40 + row * 14), LINE, fontsize=9)
+    return doc.tobytes()
+
+def _scanned_pdf(pages: int) -> bytes:
+    """Each page is one full-page grayscale image of a text page, like a scanner produces."""
+    source = fitz.open("pdf", _digital_pdf(1))
+    scan = source[0].get_pixmap(dpi=150, colorspace=fitz.csGRAY).tobytes("png")
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=612, height=792)
+        page.insert_image(page.rect, stream=scan)
+    return doc.tobytes(garbage=3, deflate=True) # garbage=3 stores the repeated scan once, keeping the corpus small
+
+def _baseline(doc: fitz.Document) -> int:
+    texts = [page.get_text("text").strip() for page in doc]
+    sufficient = sum(1 for t in texts if len(t) > MIN_CHARS)
+    return len(doc) if sufficient / len(doc) > 0.5 else 0 # Pages served from the text layer
+
+def _sampled(doc: fitz.Document) -> int:
+    layout = text_layer.classify_document(doc, 5, MIN_CHARS)
+    check_fonts = layout.kind != text_layer.DOC_DIGITAL
+    used = 0
+    for page in doc:
+        text = layout.sampled_texts.get(page.number)
+        if text is None:
+            if check_fonts and not text_layer.page_has_fonts(page):
+                continue
+            text = page.get_text("text").strip()
+        used += len(text) > MIN_CHARS
+    return used
+
+def _time(fn, corpus):
+    start = time.perf_counter()
+    used = 0
+    for data in corpus:
+        with fitz.open("pdf", data) as doc:
+            used += fn(doc)
+    return time.perf_counter() - start, used
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+
+    corpora = {
+        "all-digital": [_digital_pdf(args.pages)] * args.docs,
+        "all-scanned": [_scanned_pdf(args.pages)] * args.docs,
+    }
+    print(f"{args.docs} docs x {args.pages} pages per corpus")
+    for name, corpus in corpora.items():
+        base_t, base_used = _time(_baseline, corpus)
+        new_t, new_used = _time(_sampled, corpus)
+        print(f"  {name:12s} baseline {base_t * 1000:8.1f} ms   sampled {new_t * 1000:8.1f} ms   "
+              f"({base_t / new_t:.1f}x)   text-layer pages {base_used} -> {new_used}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# InsureDocsProject/backend/benchmarks/bench_upload_concurrency.py
+"""
+Benchmark: latency of a cheap endpoint while large PDFs are being uploaded concurrently.
+
+Runs the real FastAPI app in-process (httpx ASGI transport, temporary SQLite DB and upload dir,
+auth dependency overridden). A pinger hits GET / every few milliseconds, first with no other
+traffic and then while --concurrency clients keep uploading --size-mb PDFs to POST /api/v1/documents/.
+If the upload path blocks the event loop, the "under load" ping latency grows with the upload size;
+"loop lag" is how late the pinger's sleep between pings returned, i.e. blocking the ping itself does not see.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upload_concurrency [--concurrency 4] [--uploads 16] [--size-mb 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench_upload_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(WORK_DIR, "uploads"))
+os.environ.setdefault("JOB_REAPER_INTERVAL_SECONDS", "0")
+
+import fitz # noqa: E402
+import httpx # noqa: E402
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app import models, dependencies # noqa: E402
+from app.database import Base, SessionLocal, engine # noqa: E402
+from app.main import app # noqa: E402
+
+PING_INTERVAL_SECONDS = 0.005
+
+def _make_pdf(size_mb: int) -> bytes:
+    """A valid 3-page text PDF brought to ~size_mb by an incompressible embedded attachment (like scanned image data)."""
+    doc = fitz.open()
+    for i in range(3):
+        doc.new_page().insert_text((72, 72), f"Policy ABC-{123456 + i} dated 01/02/2024, amount $1,234.56")
+    doc.embfile_add("padding.bin", os.urandom(size_mb * 1024 * 1024))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def _setup_user() -> models.User:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = models.User(email="bench@example.com", hashed_password="x", role=models.UserRole.USER)
+        db.add(user); db.commit(); db.refresh(user)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+async def _pinger(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list, lags: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        slept = time.perf_counter()
+        await asyncio.sleep(PING_INTERVAL_SECONDS)
+        lags.append(time.perf_counter() - slept - PING_INTERVAL_SECONDS) # Event loop busy between pings (not seen by the ping itself)
+
+async def _uploader(client: httpx.AsyncClient, queue: asyncio.Queue, pdf: bytes, statuses: list):
+    while True:
+        try:
+            n = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        response = await client.post("/api/v1/documents/", files={"file": (f"bench_{n}.pdf", pdf, "application/pdf")})
+        statuses.append(response.status_code)
+
+async def _measure(client: httpx.AsyncClient, seconds: float = 0.0, uploads: int = 0, concurrency: int = 0, pdf: bytes = b""):
+    latencies, lags, statuses = [], [], []
+    stop = asyncio.Event()
+    ping_task = asyncio.create_task(_pinger(client, stop, latencies, lags))
+    started = time.perf_counter()
+    if uploads:
+        queue = asyncio.Queue()
+        for n in range(uploads): queue.put_nowait(n)
+        await asyncio.gather(*[_uploader(client, queue, pdf, statuses) for _ in range(concurrency)])
+    else:
+        await asyncio.sleep(seconds)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ping_task
+    return latencies, lags, statuses, elapsed
+
+def _summary(values: list) -> str:
+    ms = sorted(v * 1000 for v in values)
+    p95 = ms[min(len(ms) - 1, int(0.95 * (len(ms) - 1)))]
+    return f"p50 {statistics.median(ms):6.1f} ms  p95 {p95:6.1f} ms  max {ms[-1]:6.1f} ms"
+
+def _report(name: str, latencies: list, lags: list):
+    print(f"  {name:11s} pings {len(latencies):5d}  {_summary(latencies)}   loop lag {_summary(lags)}")
+
+async def _main(args):
+    user = _setup_user()
+    app.dependency_overrides[dependencies.get_current_active_user] = lambda: user
+    pdf = _make_pdf(args.size_mb)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        idle, idle_lags, _, _ = await _measure(client, seconds=2.0)
+        loaded, loaded_lags, statuses, elapsed = await _measure(client, uploads=args.uploads, concurrency=args.concurrency, pdf=pdf)
+    print(f"{args.uploads} uploads of {args.size_mb} MB, {args.concurrency} concurrent: {elapsed:.1f}s "
+          f"({args.uploads * args.size_mb / elapsed:.0f} MB/s), statuses {sorted(set(statuses))}")
+    _report("idle", idle, idle_lags)
+    _report("under load", loaded, loaded_lags)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--uploads", type=int, default=16)
+    parser.add_argument("--size-mb", type=int, default=20)
+    asyncio.run(_main(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# InsureDocsProject/backend/tests/test_ocr_batching.py
+# Batched OCR: how OCRBatcher groups pages (with a recording reader), and - when EasyOCR and its
+# models are available - that batched text is identical to per-page readtext on mixed page sizes.
+import threading
+
+import numpy as np
+import pytest
+
+from app.ocr_batcher import OCRBatcher, estimate_page_bytes
+
+class _Image:
+    """Minimal page_render.PageImage stand-in: a uint8 array whose fill value identifies the page."""
+
+    def __init__(self, tag: int, shape=(40, 30, 3)):
+        self.array = np.full(shape, tag, dtype=np.uint8)
+        self.released = False
+
+    def as_bgr(self):
+        return self.array
+
+    def release(self):
+        self.released = True
+
+class _RecordingReader:
+    """Returns each page's fill value as its text and records the pages of every readtext_batched call."""
+
+    def __init__(self, fail_batches: bool = False, bad_tag: int = -1):
+        self.batches = []
+        self.fail_batches = fail_batches
+        self.bad_tag = bad_tag
+
+    def readtext_batched(self, images, detail=0, paragraph=True, batch_size=1):
+        self.batches.append([int(image.flat[0]) for image in images])
+        if self.fail_batches:
+            raise RuntimeError("batch failed")
+        return [[f"page {int(image.flat[0])}"] for image in images]
+
+    def readtext(self, image, detail=0, paragraph=True):
+        if int(image.flat[0]) == self.bad_tag:
+            raise ValueError("bad page")
+        return [f"page {int(image.flat[0])}"]
+
+def _batcher(reader, budget_pages: int = 100, max_wait: float = 5.0) -> OCRBatcher:
+    return OCRBatcher(lambda: reader, budget_bytes=budget_pages * estimate_page_bytes((40, 30, 3)), max_wait_seconds=max_wait)
+
+def test_pages_of_concurrent_documents_share_a_batch():
+    reader = _RecordingReader()
+    batcher = _batcher(reader)
+    futures = {}
+    started = threading.Barrier(2)
+    def document(tags):
+        with batcher.producing():
+            started.wait() # Both documents are rendering before either submits
+            for tag in tags:
+                futures[tag] = batcher.submit(_Image(tag))
+    threads = [threading.Thread(target=document, args=(tags,)) for tags in ([1, 2, 3], [11, 12])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {tag: future.result(timeout=5) for tag, future in futures.items()} == {tag: (f"page {tag}", None) for tag in futures}
+    assert sorted(sum(reader.batches, [])) == [1, 2, 3, 11, 12]
+    assert len(reader.batches) == 1 # One batch across both documents
+    batcher.close()
+
+def test_only_identical_shapes_share_a_batch():
+    reader = _RecordingReader()
+    batcher = _batcher(reader)
+    with batcher.producing():
+        futures = [batcher.submit(_Image(tag, shape)) for tag, shape in
+                   [(1, (40, 30, 3)), (2, (50, 30, 3)), (3, (40, 30, 3)), (4, (40, 30))]]
+    assert [future.result(timeout=5) for future in futures] == [(f"page {tag}", None) for tag in (1, 2, 3, 4)]
+    assert sorted(reader.batches) == [[1, 3], [2], [4]]
+    batcher.close()
+
+def test_memory_budget_bounds_the_batch():
+    reader = _RecordingReader()
+    batcher = _batcher(reader, budget_pages=2)
+    with batcher.producing():
+        futures = [batcher.submit(_Image(tag)) for tag in range(1, 6)] # submit() blocks until a batch makes room
+    for future in futures:
+        future.result(timeout=5)
+    assert max(len(batch) for batch in reader.batches) <= 2
+    assert sorted(sum(reader.batches, [])) == [1, 2, 3, 4, 5]
+    batcher.close()
+
+def test_failed_batch_is_retried_per_page():
+    reader = _RecordingReader(fail_batches=True, bad_tag=2)
+    batcher = _batcher(reader)
+    images = [_Image(tag) for tag in (1, 2, 3)]
+    with batcher.producing():
+        futures = [batcher.submit(image) for image in images]
+    results = [future.result(timeout=5) for future in futures]
+    assert results[0] == ("page 1", None) and results[2] == ("page 3", None)
+    assert results[1] == ("", "bad page")
+    assert all(image.released for image in images)
+    batcher.close()
+
+def test_cancelled_pages_are_skipped():
+    reader = _RecordingReader()
+    batcher = _batcher(reader)
+    with batcher.producing():
+        kept, dropped = batcher.submit(_Image(1)), batcher.submit(_Image(2))
+        assert dropped.cancel() # Still queued: the batch waits for this producer
+    assert kept.result(timeout=5) == ("page 1", None)
+    assert reader.batches == [[1]]
+    batcher.close()
+
+# --- Parity with the per-page path (real EasyOCR only) ---
+PAGE_SIZES = [(612, 792), (612, 1008), (612, 792), (612, 1008), (612, 792)] # Letter and legal, interleaved
+LINE = "Claim CLM-554433 for policy ABC-123456, loss date 03/14/2024, reserve $12,500.00."
+
+@pytest.fixture(scope="module")
+def reader():
+    easyocr = pytest.importorskip("easyocr")
+    if not hasattr(easyocr, "__version__"):
+        pytest.skip("easyocr stand-in without models")
+    from app import ocr_utils
+    try:
+        return ocr_utils.get_easyocr_reader()
+    except Exception as load_err: # Models not downloaded / no network
+        pytest.skip(f"EasyOCR reader unavailable: {load_err}")
+
+def test_batched_text_matches_per_page_readtext(reader, monkeypatch):
+    import fitz
+    from app import ocr_utils
+    from app.config import settings
+    monkeypatch.setattr(settings, "OCR_CACHE_MAX_MB", 0)
+    monkeypatch.setattr(settings, "OCR_ADAPTIVE_RENDER", False)
+    doc = fitz.open()
+    for number, (width, height) in enumerate(PAGE_SIZES):
+        page = doc.new_page(width=width, height=height)
+        for row in range(12):
+            page.insert_text((36, 60 + row * 40), f"{number}: {LINE}", fontsize=11)
+    expected = {}
+    for page in doc:
+        image = ocr_utils._render_for_ocr(page)
+        expected[page.number] = "\n".join(reader.readtext(image.as_bgr(), detail=0, paragraph=True))
+        image.release()
+    batched = dict(ocr_utils._iter_ocr_pages_batched((page.number, page) for page in doc))
+    assert {index: text for index, (text, error) in batched.items()} == expected
+    assert all(error is None for _, error in batched.values())
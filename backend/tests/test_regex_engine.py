@@ -0,0 +1,86 @@
+# InsureDocsProject/backend/tests/test_regex_engine.py
+# Parity of the single-pass scanner with one re.findall per pattern. regex_engine derives each
+# pattern's first-character class from CPython's private re._parser / re._constants, so this also
+# catches a Python upgrade that changes those internals.
+import random
+import re
+
+import pytest
+
+from app import extraction_utils
+from app.ner_utils import REGEX_CONFIG
+from app.regex_engine import RegexScanner, first_char_class
+
+EXTRACTION_PATTERNS = [
+    ("policy_numbers", re.compile(extraction_utils.POLICY_NUMBER_PATTERN)),
+    ("dates", re.compile(extraction_utils.DATE_PATTERN)),
+    ("amounts", re.compile(extraction_utils.AMOUNT_PATTERN)),
+]
+NER_PATTERNS = [(entry["label"], entry["pattern"]) for entry in REGEX_CONFIG]
+
+PATTERN_SETS = {
+    "extraction_utils": EXTRACTION_PATTERNS,
+    "ner_utils": NER_PATTERNS,
+    "all": EXTRACTION_PATTERNS + NER_PATTERNS,
+}
+
+# Pieces that exercise the patterns (and their near misses), glued with random characters
+FRAGMENTS = [
+    "Policy Number: ", "policy no", "POLICY #", "Claim # ", "claim num:", "Member ID: ", "subscriber id",
+    "group no: ", "ABC-123456", "abc_1234", "POL1234567", "INS-987-654", "CLM1234567", "M123456", "G12345",
+    "01/02/2024", "1-2-2024", "2024-01-02", "2024/1/2", "13/45/20245", "$1,234.56", "$ 567", "$1234.5", "1,234,567.89",
+    "1HGCM82633A004352", "1hgcm82633a004352", "VIN ", "\n--- Page 3 (EasyOCR) ---\n",
+    "İ", "ı", "ſ", "\u212a", "ﬀ", # Characters IGNORECASE folds onto ASCII letters (long s, Kelvin sign, ...)
+]
+CHARS = "aAbBcCiIkKlLmMnNoOpPsSyY0123456789 -_/#:$.,\n\tſ\u212a"
+
+def _random_text(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 30)):
+        if rng.random() < 0.5:
+            parts.append(rng.choice(FRAGMENTS))
+        else:
+            parts.append("".join(rng.choice(CHARS) for _ in range(rng.randint(0, 8))))
+    return "".join(parts)
+
+def _findall(patterns, text):
+    return {label: pattern.findall(text) for label, pattern in patterns}
+
+@pytest.mark.parametrize("name", sorted(PATTERN_SETS))
+def test_scanner_matches_findall_on_random_text(name):
+    patterns = PATTERN_SETS[name]
+    scanner = RegexScanner(patterns)
+    rng = random.Random(name)
+    for _ in range(3000):
+        text = _random_text(rng)
+        assert scanner.values_by_label(text) == _findall(patterns, text), text
+
+@pytest.mark.parametrize("name", sorted(PATTERN_SETS))
+def test_scan_offsets_point_at_values(name):
+    scanner = RegexScanner(PATTERN_SETS[name])
+    rng = random.Random(f"offsets-{name}")
+    for _ in range(500):
+        text = _random_text(rng)
+        for match in scanner.scan(text):
+            assert text[match.start:match.end] == match.value
+
+def test_extract_information_with_regex_unchanged():
+    rng = random.Random(7)
+    for _ in range(500):
+        text = _random_text(rng) or "x"
+        expected_amounts = sorted({float(a.replace(",", "")) for a in re.findall(extraction_utils.AMOUNT_PATTERN, text)})
+        result = extraction_utils.extract_information_with_regex(text)
+        assert result["policy_numbers"] == sorted(set(filter(None, re.findall(extraction_utils.POLICY_NUMBER_PATTERN, text))))
+        assert result["dates"] == sorted(set(filter(None, re.findall(extraction_utils.DATE_PATTERN, text))))
+        assert result["amounts"] == expected_amounts
+
+@pytest.mark.parametrize("label,pattern", EXTRACTION_PATTERNS + NER_PATTERNS)
+def test_first_char_class_is_derived(label, pattern):
+    # Every configured pattern gets a bounded first-character class (the scanner's fast rejection)
+    char_class, nullable = first_char_class(pattern)
+    assert not nullable
+    assert char_class is not None, label
+
+def test_nullable_pattern_rejected():
+    with pytest.raises(ValueError):
+        RegexScanner([("empty", r"\d*")])